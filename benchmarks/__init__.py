@@ -0,0 +1,14 @@
+"""
+Offline benchmarks against the Frappe stand-in in `benchmarks/standin`.
+
+Importing the package puts the stand-in first on sys.path, so `import frappe` in the
+harnesses gets it whatever order their imports are sorted in.
+"""
+
+import os
+import sys
+
+STANDIN = os.path.join(os.path.dirname(os.path.abspath(__file__)), "standin")
+
+if STANDIN not in sys.path:
+	sys.path.insert(0, STANDIN)
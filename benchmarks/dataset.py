@@ -0,0 +1,186 @@
+"""Synthetic catalogue: N items x M leaf warehouses under a warehouse tree of a given depth."""
+
+import math
+import random
+from dataclasses import dataclass
+
+import frappe
+
+SCHEMA = """
+CREATE TABLE `tabWarehouse` (
+    name TEXT PRIMARY KEY, warehouse_name TEXT, company TEXT, parent_warehouse TEXT,
+    is_group INTEGER DEFAULT 0, lft INTEGER, rgt INTEGER, email_id TEXT,
+    disabled INTEGER DEFAULT 0, modified TEXT
+);
+CREATE INDEX warehouse_lft_rgt ON `tabWarehouse` (lft, rgt);
+
+CREATE TABLE `tabItem` (
+    name TEXT PRIMARY KEY, item_name TEXT, description TEXT, disabled INTEGER DEFAULT 0,
+    is_stock_item INTEGER DEFAULT 1, end_of_life TEXT, modified TEXT
+);
+
+CREATE TABLE `tabItem Reorder` (
+    name TEXT PRIMARY KEY, parent TEXT, parenttype TEXT DEFAULT 'Item',
+    parentfield TEXT DEFAULT 'reorder_levels', idx INTEGER, warehouse TEXT, warehouse_group TEXT,
+    warehouse_reorder_level REAL DEFAULT 0, warehouse_reorder_qty REAL DEFAULT 0,
+    material_request_type TEXT DEFAULT 'Purchase', modified TEXT
+);
+CREATE INDEX item_reorder_parent ON `tabItem Reorder` (parent);
+CREATE INDEX item_reorder_modified ON `tabItem Reorder` (modified);
+
+CREATE TABLE `tabBin` (
+    name TEXT PRIMARY KEY, item_code TEXT, warehouse TEXT, actual_qty REAL DEFAULT 0,
+    projected_qty REAL DEFAULT 0, modified TEXT
+);
+CREATE UNIQUE INDEX bin_item_warehouse ON `tabBin` (item_code, warehouse);
+CREATE INDEX bin_modified ON `tabBin` (modified);
+
+CREATE TABLE `tabLow Stock Alert State` (
+    name TEXT PRIMARY KEY, creation TEXT, modified TEXT, owner TEXT, modified_by TEXT,
+    item_code TEXT, warehouse TEXT, state TEXT, projected_qty REAL DEFAULT 0,
+    last_alerted_qty REAL, last_alerted_at TEXT
+);
+CREATE UNIQUE INDEX alert_state_item_warehouse ON `tabLow Stock Alert State` (item_code, warehouse);
+
+CREATE TABLE `tabLow Stock Consumption Rate` (
+    name TEXT PRIMARY KEY, creation TEXT, modified TEXT, owner TEXT, modified_by TEXT,
+    item_code TEXT, warehouse TEXT, rate REAL DEFAULT 0, last_date TEXT
+);
+CREATE UNIQUE INDEX consumption_item_warehouse ON `tabLow Stock Consumption Rate` (item_code, warehouse);
+
+CREATE TABLE `tabLow Stock Group Qty` (
+    name TEXT PRIMARY KEY, creation TEXT, modified TEXT, owner TEXT, modified_by TEXT,
+    item_code TEXT, warehouse_group TEXT, projected_qty REAL DEFAULT 0
+);
+CREATE UNIQUE INDEX group_qty_item_group ON `tabLow Stock Group Qty` (item_code, warehouse_group);
+
+CREATE TABLE `tabLow Stock Snapshot` (
+    name TEXT PRIMARY KEY, creation TEXT, modified TEXT, owner TEXT, modified_by TEXT,
+    item_code TEXT, item_name TEXT, warehouse TEXT, state TEXT,
+    projected_qty REAL, reorder_level REAL, reorder_qty REAL, shortfall REAL
+);
+CREATE UNIQUE INDEX snapshot_item_warehouse ON `tabLow Stock Snapshot` (item_code, warehouse);
+CREATE INDEX snapshot_warehouse ON `tabLow Stock Snapshot` (warehouse, item_code);
+
+CREATE TABLE `tabLow Stock Profile Log` (
+    name TEXT PRIMARY KEY, creation TEXT, modified TEXT, owner TEXT, modified_by TEXT,
+    job TEXT, started_at TEXT, duration_ms REAL, query_count INTEGER, query_ms REAL, failed INTEGER,
+    stats TEXT
+);
+CREATE INDEX profile_creation ON `tabLow Stock Profile Log` (creation);
+
+CREATE TABLE `tabEmail Queue` (
+    name TEXT PRIMARY KEY, creation TEXT, modified TEXT, owner TEXT, modified_by TEXT,
+    status TEXT, sender TEXT, message TEXT, message_id TEXT, priority INTEGER, reference_doctype TEXT
+);
+
+CREATE TABLE `tabEmail Queue Recipient` (
+    name TEXT PRIMARY KEY, creation TEXT, modified TEXT, owner TEXT, modified_by TEXT,
+    parent TEXT, parenttype TEXT, parentfield TEXT, idx INTEGER, recipient TEXT, status TEXT
+);
+
+CREATE TABLE `tabLow Stock Monitored Warehouse` (
+    name TEXT PRIMARY KEY, parent TEXT, parenttype TEXT, parentfield TEXT, idx INTEGER, warehouse TEXT
+);
+
+CREATE TABLE `tabLow Stock Throttle Window` (
+    name TEXT PRIMARY KEY, parent TEXT, parenttype TEXT, parentfield TEXT, idx INTEGER, warehouse TEXT,
+    throttle_window INTEGER DEFAULT 0
+);
+"""
+
+MODIFIED = "2024-01-01 00:00:00"
+
+
+@dataclass
+class Dataset:
+	items: list
+	leaves: list
+	groups: list
+	monitored: list
+	reorder_pairs: list
+
+
+def build(items=1000, warehouses=50, depth=3, reorder_per_item=3, low_ratio=0.05, monitor_level=1, seed=42):
+	"""
+	Load a synthetic site into the stand-in database and return what was created.
+	`depth` counts group levels below the root; leaves hang off the deepest groups.
+	"""
+	rng = random.Random(seed)
+	frappe.db.executescript(SCHEMA)
+
+	fanout = max(2, math.ceil(warehouses ** (1 / max(depth, 1))))
+	rows, leaves, groups_by_level = [], [], {}
+	counter = 0
+
+	def add(name, parent, level):
+		nonlocal counter
+		counter += 1
+		lft = counter
+		is_group = level < depth and len(leaves) < warehouses
+		if is_group:
+			groups_by_level.setdefault(level, []).append(name)
+			for i in range(fanout):
+				if len(leaves) >= warehouses:
+					break
+				add(f"{name}-{i}" if level else f"WH-{i}", name, level + 1)
+		else:
+			leaves.append(name)
+		counter += 1
+		rows.append(
+			(
+				name,
+				name,
+				"_Bench",
+				parent,
+				int(is_group),
+				lft,
+				counter,
+				f"{name.lower()}@example.com",
+				MODIFIED,
+			)
+		)
+
+	add("All Warehouses", None, 0)
+	frappe.db.conn.executemany(
+		"INSERT INTO `tabWarehouse` (name, warehouse_name, company, parent_warehouse, is_group, lft, rgt, email_id, modified)"
+		" VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+		rows,
+	)
+
+	item_codes = [f"ITEM-{i:06d}" for i in range(items)]
+	frappe.db.conn.executemany(
+		"INSERT INTO `tabItem` (name, item_name, description, modified) VALUES (?, ?, ?, ?)",
+		[(code, f"Item {code}", f"Synthetic item {code}", MODIFIED) for code in item_codes],
+	)
+
+	reorder_rows, bin_rows, reorder_pairs = [], [], []
+	for code in item_codes:
+		for idx, warehouse in enumerate(rng.sample(leaves, min(reorder_per_item, len(leaves))), 1):
+			level = rng.choice((10, 20, 50, 100))
+			projected = (
+				rng.uniform(0, level) if rng.random() < low_ratio else rng.uniform(level + 1, level * 5)
+			)
+			reorder_rows.append((f"{code}-{idx}", code, idx, warehouse, level, level, MODIFIED))
+			bin_rows.append((f"{code}-{warehouse}", code, warehouse, projected, projected, MODIFIED))
+			reorder_pairs.append((code, warehouse))
+
+	frappe.db.conn.executemany(
+		"INSERT INTO `tabItem Reorder` (name, parent, idx, warehouse, warehouse_reorder_level, warehouse_reorder_qty, modified)"
+		" VALUES (?, ?, ?, ?, ?, ?, ?)",
+		reorder_rows,
+	)
+	frappe.db.conn.executemany(
+		"INSERT INTO `tabBin` (name, item_code, warehouse, actual_qty, projected_qty, modified) VALUES (?, ?, ?, ?, ?, ?)",
+		bin_rows,
+	)
+	frappe.db.conn.commit()
+
+	groups = [name for level in sorted(groups_by_level) for name in groups_by_level[level]]
+	return Dataset(
+		items=item_codes,
+		leaves=leaves,
+		groups=groups,
+		monitored=groups_by_level.get(monitor_level, []),
+		reorder_pairs=reorder_pairs,
+	)
@@ -0,0 +1,306 @@
+"""
+SLE replay load harness for the event path.
+
+Replays a Stock Ledger Entry stream through `on_sle_update` -> commit -> short-queue
+`check_and_alert_low_stock_batch` job -> outbox against the Frappe stand-in, at one or
+more rates, and reports for each rate the enqueue rate, the queue depth over time, the
+p50/p95/p99 time from SLE to decision and emails per second.
+
+The replay is a discrete-event simulation in virtual time. Vouchers arrive on schedule
+and `--workers` short-queue workers take jobs in FIFO order. Every hook and job really
+runs against the stand-in, in virtual-time order, and its measured wall time becomes its
+service time. Rates this process could not replay in real time are still modelled,
+including how pending-check dedup folds pairs into fewer jobs as the queue backs up.
+Bin updates of the voucher are applied before its hook and not timed; they are
+ERPNext's work, not the app's.
+
+    python -m benchmarks.replay --rates 100,200,400,800 --workers 2 --duration 30
+    python -m benchmarks.replay --input sle.jsonl --rates 500 --output replay.json
+
+A recorded stream is a JSON-lines file of SLEs with `voucher_no`, `item_code`,
+`warehouse` and `actual_qty`, in posting order (e.g. exported from `tabStock Ledger
+Entry`). Its (item, warehouse) pairs are mapped onto the synthetic catalogue's reorder
+pairs, keeping their frequencies and the voucher grouping.
+"""
+
+import argparse
+import heapq
+import json
+import math
+import random
+import time
+from collections import deque
+
+import frappe
+
+from benchmarks import dataset
+from benchmarks.run import _emails_queued
+
+
+def percentiles(values, points=(50, 95, 99)):
+	"""Nearest-rank percentiles of `values` in milliseconds, plus the max."""
+	if not values:
+		return {f"p{p}": None for p in points} | {"max": None}
+
+	values = sorted(values)
+	result = {f"p{p}": round(values[max(math.ceil(p * len(values) / 100) - 1, 0)] * 1000, 3) for p in points}
+	result["max"] = round(values[-1] * 1000, 3)
+	return result
+
+
+def synthetic_stream(data, count, voucher_rows, unmonitored_share, rng):
+	"""`count` SLEs in vouchers of up to `voucher_rows`: mostly outflows, some receipts."""
+	reorder_pairs = set(data.reorder_pairs)
+	vouchers, rows = [], []
+	for _i in range(count):
+		if rng.random() < unmonitored_share:
+			pair = (rng.choice(data.items), rng.choice(data.leaves))
+			while pair in reorder_pairs:
+				pair = (rng.choice(data.items), rng.choice(data.leaves))
+		else:
+			pair = rng.choice(data.reorder_pairs)
+		qty = -rng.randint(1, 5) if rng.random() < 0.8 else rng.randint(5, 50)
+		rows.append((*pair, qty))
+		if len(rows) >= voucher_rows:
+			vouchers.append(rows)
+			rows = []
+	if rows:
+		vouchers.append(rows)
+	return vouchers
+
+
+def recorded_stream(path, data, rng):
+	"""Vouchers of a JSON-lines SLE export, with its pairs mapped onto the catalogue."""
+	targets = list(data.reorder_pairs)
+	rng.shuffle(targets)
+	mapping, vouchers, voucher_no = {}, [], object()
+	with open(path) as f:
+		for line in f:
+			if not line.strip():
+				continue
+			sle = json.loads(line)
+			pair = mapping.setdefault(
+				(sle["item_code"], sle["warehouse"]), targets[len(mapping) % len(targets)]
+			)
+			if sle.get("voucher_no") != voucher_no or not vouchers:
+				vouchers.append([])
+				voucher_no = sle.get("voucher_no")
+			vouchers[-1].append((*pair, float(sle["actual_qty"])))
+	return vouchers
+
+
+def replay(vouchers, rate, workers, sample_interval, monitored_pairs):
+	"""Run `vouchers` through the event path at `rate` SLEs per second; return the report of the run."""
+	from low_stock_alerts.api import on_sle_update
+
+	arrivals = deque()
+	sent = 0
+	for rows in vouchers:
+		arrivals.append((sent / rate, rows))
+		sent += len(rows)
+
+	queue = deque()  # (enqueued_at, pairs) waiting for a worker
+	free_at = [0.0] * workers
+	waiting = {}  # pair -> arrival times of SLEs no job has evaluated yet
+	jobs, latencies, hook_times, service_times = [], [], [], []
+	emails = decided_pairs = filtered = 0
+
+	while arrivals or queue:
+		next_arrival = arrivals[0][0] if arrivals else float("inf")
+		next_start = max(free_at[0], queue[0][0]) if queue else float("inf")
+
+		if next_arrival <= next_start:
+			arrived_at, rows = arrivals.popleft()
+			for item_code, warehouse, qty in rows:
+				frappe.db.conn.execute(
+					"UPDATE `tabBin` SET projected_qty = projected_qty + ?, actual_qty = actual_qty + ?"
+					" WHERE item_code = ? AND warehouse = ?",
+					(qty, qty, item_code, warehouse),
+				)
+
+			enqueued = len(frappe.enqueued)
+			start = time.perf_counter()
+			for i, (item_code, warehouse, qty) in enumerate(rows):
+				on_sle_update(
+					frappe._dict(
+						name=f"SLE-{arrived_at}-{i}",
+						voucher_type="Stock Entry",
+						docstatus=1,
+						is_cancelled=0,
+						item_code=item_code,
+						warehouse=warehouse,
+						actual_qty=qty,
+						posting_date=None,
+					),
+					"on_submit",
+				)
+			frappe.db.commit()
+			hook_time = time.perf_counter() - start
+			hook_times.append(hook_time)
+
+			for item_code, warehouse, qty in rows:
+				if qty > 0 or (item_code, warehouse) not in monitored_pairs:
+					filtered += 1
+				else:
+					waiting.setdefault((item_code, warehouse), []).append(arrived_at)
+			for job in frappe.enqueued[enqueued:]:
+				queue.append((arrived_at + hook_time, [tuple(pair) for pair in job.kwargs["pairs"]]))
+			continue
+
+		enqueued_at, pairs = queue.popleft()
+		started_at = max(heapq.heappop(free_at), enqueued_at)
+		decided = [arrived for pair in pairs for arrived in waiting.pop(pair, ())]
+
+		emails_before = _emails_queued()
+		start = time.perf_counter()
+		frappe.get_attr("low_stock_alerts.api.check_and_alert_low_stock_batch")(pairs=pairs)
+		frappe.db.commit()
+		service = time.perf_counter() - start
+		finished_at = started_at + service
+
+		heapq.heappush(free_at, finished_at)
+		service_times.append(service)
+		latencies.extend(finished_at - arrived for arrived in decided)
+		emails += _emails_queued() - emails_before
+		decided_pairs += len(pairs)
+		jobs.append((enqueued_at, started_at, finished_at))
+
+	arrival_span = sent / rate
+	makespan = max([arrival_span] + [finished for _e, _s, finished in jobs])
+	depth_samples = []
+	t = 0.0
+	while t <= makespan:
+		depth = sum(1 for enqueued_at, started_at, _f in jobs if enqueued_at <= t < started_at)
+		depth_samples.append([round(t, 3), depth])
+		t += sample_interval
+
+	return {
+		"rate": rate,
+		"workers": workers,
+		"sles": sent,
+		"vouchers": len(vouchers),
+		"arrival_span_s": round(arrival_span, 3),
+		"makespan_s": round(makespan, 3),
+		"enqueue": {
+			"jobs": len(jobs),
+			"pairs": decided_pairs,
+			"jobs_per_s": round(len(jobs) / arrival_span, 3) if arrival_span else None,
+			"pairs_per_s": round(decided_pairs / arrival_span, 3) if arrival_span else None,
+			"filtered_sles": filtered,
+		},
+		"hook_ms": percentiles(hook_times),
+		"job_ms": percentiles(service_times),
+		"decision_latency_ms": percentiles(latencies),
+		"undecided_sles": sum(len(arrived) for arrived in waiting.values()),
+		"queue_depth": {
+			"max": max((depth for _t, depth in depth_samples), default=0),
+			"at_last_arrival": sum(
+				1 for enqueued_at, started_at, _f in jobs if enqueued_at <= arrival_span < started_at
+			),
+			"samples": depth_samples,
+		},
+		"worker_utilisation": round(sum(service_times) / (workers * makespan), 3) if makespan else None,
+		"emails": emails,
+		"emails_per_s": round(emails / makespan, 3) if makespan else None,
+	}
+
+
+def run(args):
+	import low_stock_alerts.api as api
+	from low_stock_alerts.admission import rebuild_admission_index
+
+	report = {"args": vars(args), "runs": []}
+	for rate in args.rates:
+		# Every rate starts from the same catalogue, stock and alert state
+		frappe.reset()
+		data = dataset.build(
+			items=args.items,
+			warehouses=args.warehouses,
+			depth=args.depth,
+			reorder_per_item=args.reorder_per_item,
+			low_ratio=args.low_ratio,
+			seed=args.seed,
+		)
+		api.monitored_warehouses = data.monitored
+		rebuild_admission_index()
+
+		rng = random.Random(args.seed)
+		if args.input:
+			vouchers = recorded_stream(args.input, data, rng)
+		else:
+			count = int(rate * args.duration)
+			vouchers = synthetic_stream(data, count, args.voucher_rows, args.unmonitored_share, rng)
+
+		result = replay(vouchers, rate, args.workers, args.sample_interval, set(data.reorder_pairs))
+		p99 = result["decision_latency_ms"]["p99"]
+		result["sustained"] = p99 is not None and p99 <= args.slo_ms
+		report["runs"].append(result)
+
+	sustained = [run["rate"] for run in report["runs"] if run["sustained"]]
+	report["max_sustained_rate"] = max(sustained, default=None)
+	return report
+
+
+def _print_report(report):
+	for run in report["runs"]:
+		latency, depth = run["decision_latency_ms"], run["queue_depth"]
+		print(
+			f"rate={run['rate']:<6} sles={run['sles']:<7} jobs/s={run['enqueue']['jobs_per_s']:<9} "
+			f"depth max={depth['max']:<5} end={depth['at_last_arrival']:<5} "
+			f"decision p50={latency['p50']}ms p95={latency['p95']}ms p99={latency['p99']}ms "
+			f"emails/s={run['emails_per_s']:<8} util={run['worker_utilisation']:<6} "
+			+ ("ok" if run["sustained"] else "LAGGING")
+		)
+	print(f"max sustained rate (p99 <= {report['args']['slo_ms']} ms): {report['max_sustained_rate']}")
+
+
+def get_parser():
+	parser = argparse.ArgumentParser(
+		description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+	)
+	parser.add_argument(
+		"--rates",
+		type=lambda value: [float(rate) for rate in value.split(",")],
+		default=[50.0, 200.0, 800.0],
+		help="comma-separated SLEs per second, one run each",
+	)
+	parser.add_argument("--duration", type=float, default=20, help="seconds of synthetic SLEs per rate")
+	parser.add_argument("--input", help="JSON-lines SLE export to replay instead of a synthetic stream")
+	parser.add_argument("--workers", type=int, default=1, help="short-queue workers")
+	parser.add_argument("--voucher-rows", type=int, default=5)
+	parser.add_argument(
+		"--unmonitored-share", type=float, default=0.3, help="share of SLEs without a reorder level"
+	)
+	parser.add_argument(
+		"--slo-ms", type=float, default=1000, help="p99 SLE-to-decision time a rate must meet"
+	)
+	parser.add_argument(
+		"--sample-interval", type=float, default=1.0, help="seconds between queue depth samples"
+	)
+	parser.add_argument("--items", type=int, default=1000)
+	parser.add_argument("--warehouses", type=int, default=50, help="number of leaf warehouses")
+	parser.add_argument("--depth", type=int, default=3, help="group levels between the root and the leaves")
+	parser.add_argument("--reorder-per-item", type=int, default=3)
+	parser.add_argument("--low-ratio", type=float, default=0.05, help="share of reorder rows that are low")
+	parser.add_argument("--seed", type=int, default=42)
+	parser.add_argument("--json", action="store_true", help="print the report as JSON")
+	parser.add_argument("--output", help="also write the JSON report to this file")
+	return parser
+
+
+def main(argv=None):
+	args = get_parser().parse_args(argv)
+	report = run(args)
+
+	if args.output:
+		with open(args.output, "w") as f:
+			json.dump(report, f, indent=2)
+
+	if args.json:
+		print(json.dumps(report, indent=2))
+	else:
+		_print_report(report)
+
+
+if __name__ == "__main__":
+	main()
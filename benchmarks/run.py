@@ -0,0 +1,438 @@
+"""
+Offline benchmarks for the low-stock event path and fallback scan.
+
+Runs the app against the Frappe stand-in in `benchmarks/standin` (SQLite + dict-backed
+Redis, captured sendmail/enqueue) on a synthetic catalogue and reports, per scenario,
+queries and Redis round trips per call, wall time and peak memory.
+
+    python -m benchmarks.run --items 5000 --warehouses 200 --depth 3
+    python -m benchmarks.run --json --output bench_output.json
+"""
+
+import argparse
+import json
+import os
+import random
+import sys
+import time
+import tracemalloc
+from contextlib import contextmanager
+
+STANDIN = os.path.join(os.path.dirname(os.path.abspath(__file__)), "standin")
+sys.path.insert(0, STANDIN)
+sys.path.insert(1, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import frappe
+
+assert frappe.__file__.startswith(STANDIN), "benchmarks must run against the stand-in, not a real site"
+
+from benchmarks import dataset
+
+
+@contextmanager
+def measure(result, calls=1, trace_memory=False):
+	"""Fill `result` with totals and per-call averages of the enclosed block."""
+	queries, round_trips = frappe.db.query_count, frappe.cache().round_trips
+	mails, jobs = _emails_queued(), len(frappe.enqueued)
+	if trace_memory:
+		tracemalloc.start()
+	start = time.perf_counter()
+	try:
+		yield
+	finally:
+		wall = time.perf_counter() - start
+		if trace_memory:
+			result["peak_memory_kb"] = round(tracemalloc.get_traced_memory()[1] / 1024, 1)
+			tracemalloc.stop()
+
+		calls = max(calls, 1)
+		result.update(
+			calls=calls,
+			wall_ms=round(wall * 1000, 3),
+			wall_ms_per_call=round(wall * 1000 / calls, 4),
+			queries=frappe.db.query_count - queries,
+			queries_per_call=round((frappe.db.query_count - queries) / calls, 3),
+			redis_round_trips=frappe.cache().round_trips - round_trips,
+			redis_round_trips_per_call=round((frappe.cache().round_trips - round_trips) / calls, 3),
+			emails=_emails_queued() - mails,
+			jobs_enqueued=len(frappe.enqueued) - jobs,
+		)
+
+
+def _emails_queued():
+	"""Emails written through the outbox plus any sent one by one through `sendmail`."""
+	# Straight on the connection, so the count itself is not reported as a query
+	queued = frappe.db.conn.execute("SELECT COUNT(*) FROM `tabEmail Queue Recipient`").fetchone()[0]
+	return queued + len(frappe.sent_mail)
+
+
+def _forget_alerts():
+	"""Clear throttle keys and alert states so every run starts from the same point."""
+	cache = frappe.cache()
+	cache.delete_keys("low_stock_alert:")
+	cache.delete_keys("low_stock_alerts:pending_check:")
+	frappe.db.sql("DELETE FROM `tabLow Stock Alert State`")
+
+
+def bench_event_single(data, args, rng):
+	"""`check_and_alert_low_stock` called once per pair, cold then warm caches."""
+	from low_stock_alerts.api import check_and_alert_low_stock
+
+	pairs = rng.sample(data.reorder_pairs, min(args.calls, len(data.reorder_pairs)))
+	results = {}
+	for run in ("cold", "warm"):
+		_forget_alerts()
+		results[run] = {}
+		with measure(results[run], calls=len(pairs)):
+			for item_code, warehouse in pairs:
+				check_and_alert_low_stock(item_code, warehouse)
+	return results
+
+
+def bench_event_voucher(data, args, rng):
+	"""
+	One voucher of `--voucher-rows` SLEs: hook, commit, then the enqueued job. A
+	`--unmonitored-share` of the rows are for pairs without a reorder level.
+	"""
+	from low_stock_alerts.api import on_sle_update
+
+	unmonitored = int(args.voucher_rows * args.unmonitored_share)
+	pairs = rng.sample(data.reorder_pairs, min(args.voucher_rows - unmonitored, len(data.reorder_pairs)))
+	reorder_pairs = set(data.reorder_pairs)
+	while unmonitored:
+		pair = (rng.choice(data.items), rng.choice(data.leaves))
+		if pair not in reorder_pairs:
+			pairs.append(pair)
+			unmonitored -= 1
+	_forget_alerts()
+	result = {"hook": {}, "job": {}}
+
+	with measure(result["hook"], calls=len(pairs)):
+		for i, (item_code, warehouse) in enumerate(pairs):
+			on_sle_update(
+				frappe._dict(
+					name=f"SLE-{i}",
+					voucher_type="Stock Entry",
+					docstatus=1,
+					is_cancelled=0,
+					item_code=item_code,
+					warehouse=warehouse,
+					actual_qty=-1,
+				),
+				"on_submit",
+			)
+		frappe.db.commit()
+
+	jobs = (
+		list(frappe.enqueued[-result["hook"]["jobs_enqueued"] :]) if result["hook"]["jobs_enqueued"] else []
+	)
+	with measure(result["job"], calls=len(pairs)):
+		for job in jobs:
+			frappe.get_attr(job.method)(**job.kwargs)
+	return result
+
+
+def bench_order_trigger(data, args, rng):
+	"""
+	Orders of 10 rows through `on_order_update` until `--voucher-rows` rows, after moving
+	each row's Bin by a small decrease or increase as ERPNext would, compared with the
+	pairs a check per row would queue.
+	"""
+	from low_stock_alerts.api import on_order_update
+
+	pairs = rng.sample(data.reorder_pairs, min(args.voucher_rows, len(data.reorder_pairs)))
+	for item_code, warehouse in pairs:
+		frappe.db.sql(
+			"""
+            UPDATE `tabBin` SET projected_qty = projected_qty + %(delta)s
+            WHERE item_code = %(item_code)s AND warehouse = %(warehouse)s
+            """,
+			{"delta": rng.choice((-1, -1, -2, 1, 5)), "item_code": item_code, "warehouse": warehouse},
+		)
+	frappe.db.commit()
+
+	_forget_alerts()
+	frappe.conf.low_stock_alerts_order_trigger = 1
+	result = {}
+	queued = 0
+	try:
+		with measure(result, calls=len(pairs)):
+			for i in range(0, len(pairs), 10):
+				items = [
+					frappe._dict(item_code=item_code, warehouse=wh) for item_code, wh in pairs[i : i + 10]
+				]
+				on_order_update(frappe._dict(items=items), "on_submit")
+				queued += len(frappe.flags.low_stock_pending_checks or {})
+				frappe.db.commit()
+	finally:
+		frappe.conf.pop("low_stock_alerts_order_trigger", None)
+
+	result.update(pairs_queued=queued, row_pairs=len(pairs))
+	return result
+
+
+def bench_fallback(data, args, rng):
+	"""Full fallback scan; timed once plainly and once under tracemalloc for peak memory."""
+	from low_stock_alerts.api import run_low_stock_alerts_fallback
+
+	result, traced = {}, {}
+	_forget_alerts()
+	with measure(result):
+		run_low_stock_alerts_fallback(chunk_size=args.chunk_size)
+	_forget_alerts()
+	with measure(traced, trace_memory=True):
+		run_low_stock_alerts_fallback(chunk_size=args.chunk_size)
+	result["peak_memory_kb"] = traced["peak_memory_kb"]
+	return result
+
+
+def bench_engine(data, args, rng):
+	"""`engine.evaluate` over every reorder pair from in-memory snapshots, no database or Redis."""
+	from low_stock_alerts.engine import ReorderLevel, SnapshotProvider, evaluate
+	from low_stock_alerts.warehouse_tree import get_warehouse_tree
+
+	rows = frappe.db.sql(
+		"""
+        SELECT ir.parent, ir.warehouse, ir.warehouse_reorder_level, ir.warehouse_reorder_qty, b.projected_qty
+        FROM `tabItem Reorder` ir LEFT JOIN `tabBin` b ON b.item_code = ir.parent AND b.warehouse = ir.warehouse
+        """
+	)
+	tree = get_warehouse_tree()
+	provider = SnapshotProvider(
+		reorder_levels={(item, wh): ReorderLevel(level, qty) for item, wh, level, qty, _p in rows},
+		projected_qty={(item, wh): projected or 0 for item, wh, _l, _q, projected in rows},
+		monitored_by_leaf={leaf: tree.get_monitored_for_leaf(leaf, data.monitored) for leaf in data.leaves},
+	)
+
+	result = {}
+	with measure(result, calls=len(data.reorder_pairs)):
+		evaluation = evaluate(data.reorder_pairs, provider)
+	result["alerts"] = len(evaluation.alerts)
+	return result
+
+
+def bench_fallback_sharded(data, args, rng):
+	"""
+	Fallback split into `--shards` subtree shards, run one after another. `critical_path_ms`
+	is the slowest shard: the wall time with one worker per shard.
+	"""
+	from low_stock_alerts.shards import plan_shards, run_sharded_fallback, scan_shard
+
+	plan = plan_shards(args.shards)
+	shard_ms = []
+	for shard in plan:
+		start = time.perf_counter()
+		scan_shard(shard, args.chunk_size)
+		shard_ms.append(round((time.perf_counter() - start) * 1000, 3))
+
+	result = {}
+	_forget_alerts()
+	frappe.run_jobs_inline = True
+	try:
+		with measure(result):
+			run_sharded_fallback(shards=args.shards, chunk_size=args.chunk_size)
+	finally:
+		frappe.run_jobs_inline = False
+	result.update(shards=len(plan), shard_ms=shard_ms, critical_path_ms=max(shard_ms, default=0))
+	return result
+
+
+def bench_fallback_pages(data, args, rng):
+	"""
+	The fallback's keyset scan one chunk at a time (`--chunk-size`, 50 by default), with the
+	`install.add_indexes` index and without it. `first_page_ms`/`last_page_ms` show whether
+	a chunk costs the same wherever it starts.
+	"""
+	from low_stock_alerts.api import iter_low_stock_chunks
+	from low_stock_alerts.install import add_indexes
+
+	chunk_size = args.chunk_size or 50
+	pages = sum(1 for _chunk in iter_low_stock_chunks(chunk_size))
+	results = {}
+	try:
+		for run in ("indexed", "unindexed"):
+			if run == "unindexed":
+				frappe.db.sql("DROP INDEX low_stock_scan_key")
+			page_ms, chunks = [], iter_low_stock_chunks(chunk_size)
+			results[run] = {}
+			with measure(results[run], calls=pages):
+				while True:
+					start = time.perf_counter()
+					if next(chunks, None) is None:
+						break
+					page_ms.append(round((time.perf_counter() - start) * 1000, 3))
+			results[run].update(pages=len(page_ms), first_page_ms=page_ms[0], last_page_ms=page_ms[-1])
+	finally:
+		add_indexes()
+	return results
+
+
+def bench_snapshot(data, args, rng):
+	"""
+	"What is low now" read two ways: `scan` reruns the fallback query over Item Reorder and
+	Bin, `page` walks the Low Stock Snapshot 100 rows at a time through `get_low_stock`.
+	"""
+	from low_stock_alerts.api import iter_low_stock_chunks, run_low_stock_alerts_fallback
+	from low_stock_alerts.snapshot import get_low_stock
+
+	_forget_alerts()
+	run_low_stock_alerts_fallback(chunk_size=args.chunk_size)
+
+	results = {"scan": {}, "page": {}}
+	with measure(results["scan"]):
+		scanned = sum(len(chunk) for chunk in iter_low_stock_chunks(args.chunk_size))
+
+	# Collect the page cursors first, then time fetching each page by its cursor
+	cursors, page = [{}], get_low_stock(limit=100)
+	while page["next"]:
+		cursors.append(page["next"])
+		page = get_low_stock(limit=100, **page["next"])
+
+	paged = 0
+	with measure(results["page"], calls=len(cursors)):
+		for cursor in cursors:
+			paged += len(get_low_stock(limit=100, **cursor)["rows"])
+	results["page"]["rows"] = paged
+	results["scan"]["rows"] = scanned
+	return results
+
+
+def bench_status_poll(data, args, rng):
+	"""
+	`get_low_stock_status` for every monitored warehouse, polled `--calls` times: once
+	uncached, then from the response cache, then sending back the ETag (304).
+	"""
+	from low_stock_alerts.api import get_low_stock_status, run_low_stock_alerts_fallback
+
+	_forget_alerts()
+	run_low_stock_alerts_fallback(chunk_size=args.chunk_size)
+	frappe.db.commit()
+	frappe.cache().delete_keys("low_stock_alerts:status:")
+
+	results = {"cold": {}, "cached": {}, "etag": {}}
+	with measure(results["cold"]):
+		status = get_low_stock_status(data.monitored)
+	with measure(results["cached"], calls=args.calls):
+		for _i in range(args.calls):
+			get_low_stock_status(data.monitored)
+	with measure(results["etag"], calls=args.calls):
+		for _i in range(args.calls):
+			assert get_low_stock_status(data.monitored, etag=status["etag"]) is None
+	frappe.response.pop("http_status_code", None)
+	results["cold"]["items"] = len(status["items"])
+	return results
+
+
+SCENARIOS = {
+	"engine": bench_engine,
+	"event_single": bench_event_single,
+	"event_voucher": bench_event_voucher,
+	"fallback": bench_fallback,
+	"fallback_sharded": bench_fallback_sharded,
+	"fallback_pages": bench_fallback_pages,
+	"order_trigger": bench_order_trigger,
+	"snapshot": bench_snapshot,
+	"status_poll": bench_status_poll,
+}
+
+
+def run(args):
+	import low_stock_alerts.api as api
+	from low_stock_alerts.admission import rebuild_admission_index
+	from low_stock_alerts.install import add_indexes
+
+	frappe.reset()
+	data = dataset.build(
+		items=args.items,
+		warehouses=args.warehouses,
+		depth=args.depth,
+		reorder_per_item=args.reorder_per_item,
+		low_ratio=args.low_ratio,
+		seed=args.seed,
+	)
+	api.monitored_warehouses = data.monitored
+	add_indexes()
+	rebuild_admission_index()
+
+	rng = random.Random(args.seed)
+	report = {
+		"dataset": {
+			"items": len(data.items),
+			"leaf_warehouses": len(data.leaves),
+			"group_warehouses": len(data.groups),
+			"monitored": len(data.monitored),
+			"reorder_rows": len(data.reorder_pairs),
+			"depth": args.depth,
+		},
+		"scenarios": {},
+	}
+	for name in args.scenario or SCENARIOS:
+		report["scenarios"][name] = SCENARIOS[name](data, args, rng)
+	return report
+
+
+def _print_report(report):
+	print("dataset:", ", ".join(f"{k}={v}" for k, v in report["dataset"].items()))
+	for scenario, result in report["scenarios"].items():
+		parts = result.items() if "calls" not in result else [("", result)]
+		for part, values in parts:
+			label = f"{scenario}.{part}" if part else scenario
+			print(
+				f"{label:<22} calls={values['calls']:<6} wall={values['wall_ms']:>10.2f}ms "
+				f"({values['wall_ms_per_call']:.4f}/call) queries/call={values['queries_per_call']:<8} "
+				f"redis/call={values['redis_round_trips_per_call']:<8} emails={values['emails']:<5} "
+				f"jobs={values['jobs_enqueued']}"
+				+ (f" peak_mem={values['peak_memory_kb']}KB" if "peak_memory_kb" in values else "")
+				+ (f" critical_path={values['critical_path_ms']}ms" if "critical_path_ms" in values else "")
+				+ (
+					f" pages={values['pages']} first={values['first_page_ms']}ms last={values['last_page_ms']}ms"
+					if "pages" in values
+					else ""
+				)
+				+ (
+					f" pairs_queued={values['pairs_queued']} (per row: {values['row_pairs']})"
+					if "pairs_queued" in values
+					else ""
+				)
+			)
+
+
+def get_parser():
+	parser = argparse.ArgumentParser(
+		description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+	)
+	parser.add_argument("--items", type=int, default=1000)
+	parser.add_argument("--warehouses", type=int, default=50, help="number of leaf warehouses")
+	parser.add_argument("--depth", type=int, default=3, help="group levels between the root and the leaves")
+	parser.add_argument("--reorder-per-item", type=int, default=3)
+	parser.add_argument("--low-ratio", type=float, default=0.05, help="share of reorder rows that are low")
+	parser.add_argument("--calls", type=int, default=500, help="pairs checked in event_single")
+	parser.add_argument("--voucher-rows", type=int, default=1000)
+	parser.add_argument(
+		"--unmonitored-share", type=float, default=0.5, help="share of voucher rows without a reorder level"
+	)
+	parser.add_argument("--chunk-size", type=int, default=None)
+	parser.add_argument("--shards", type=int, default=4, help="shards in fallback_sharded")
+	parser.add_argument("--seed", type=int, default=42)
+	parser.add_argument("--scenario", action="append", choices=list(SCENARIOS))
+	parser.add_argument("--json", action="store_true", help="print the report as JSON")
+	parser.add_argument("--output", help="also write the JSON report to this file")
+	return parser
+
+
+def main(argv=None):
+	args = get_parser().parse_args(argv)
+	report = run(args)
+
+	if args.output:
+		with open(args.output, "w") as f:
+			json.dump(report, f, indent=2)
+
+	if args.json:
+		print(json.dumps(report, indent=2))
+	else:
+		_print_report(report)
+
+
+if __name__ == "__main__":
+	main()
@@ -0,0 +1,173 @@
+"""
+Lightweight stand-in for the parts of Frappe used by low_stock_alerts.
+
+`frappe.db` runs on in-memory SQLite and `frappe.cache()` on a dict-backed Redis
+replacement. `sendmail` and `enqueue` are captured. Everything counts the work it
+does (queries, Redis round trips, mails, jobs), so the benchmarks can report it.
+Only meant for benchmarks: no permissions, no documents, no hooks.
+"""
+
+import hashlib
+import importlib
+import json
+import logging
+import os
+
+from .database import Database
+from .redis import RedisStandIn
+from .utils import cint, flt, now_datetime, nowdate
+
+
+class _dict(dict):
+	def __getattr__(self, key):
+		return self.get(key)
+
+	def __setattr__(self, key, value):
+		self[key] = value
+
+	def copy(self):
+		return _dict(self)
+
+
+class ValidationError(Exception):
+	pass
+
+
+class DoesNotExistError(ValidationError):
+	pass
+
+
+class PermissionError(Exception):
+	pass
+
+
+flags = _dict()
+conf = _dict()
+local = _dict(flags=flags, conf=conf, site="benchmark.local", sites_path=".")
+session = _dict(user="Administrator")
+request = None
+response = _dict()
+
+db = Database()
+_redis = RedisStandIn()
+
+# Captured side effects
+sent_mail = []
+enqueued = []
+# Run enqueued jobs synchronously instead of only recording them
+run_jobs_inline = False
+
+
+def reset():
+	"""Start from an empty database, cache and capture."""
+	global db
+	db = Database()
+	_redis.flushall()
+	_redis.round_trips = 0
+	flags.clear()
+	conf.clear()
+	sent_mail.clear()
+	enqueued.clear()
+
+
+def cache():
+	return _redis
+
+
+def _(msg, *args, **kwargs):
+	return msg
+
+
+def throw(msg, exc=ValidationError, title=None):
+	raise exc(msg)
+
+
+def whitelist(*args, **kwargs):
+	if args and callable(args[0]):
+		return args[0]
+	return lambda fn: fn
+
+
+def only_for(roles, message=False):
+	pass
+
+
+def has_permission(doctype=None, ptype="read", doc=None, throw=False, **kwargs):
+	return True
+
+
+def get_request_header(key, default=None):
+	return default
+
+
+def logger(module=None, **kwargs):
+	return logging.getLogger(module or "frappe")
+
+
+def as_json(obj, indent=1, **kwargs):
+	return json.dumps(obj, indent=indent, default=str, sort_keys=True)
+
+
+def parse_json(value):
+	return json.loads(value) if isinstance(value, str) else value
+
+
+def safe_decode(value, encoding="utf-8"):
+	return value.decode(encoding) if isinstance(value, bytes) else value
+
+
+def generate_hash(txt=None, length=10):
+	return hashlib.sha1(os.urandom(16)).hexdigest()[:length]
+
+
+def get_attr(method_path):
+	module, attr = method_path.rsplit(".", 1)
+	return getattr(importlib.import_module(module), attr)
+
+
+def get_all(doctype, filters=None, fields=None, **kwargs):
+	return db.get_all(doctype, filters=filters, fields=fields, **kwargs)
+
+
+get_list = get_all
+
+
+def get_meta(doctype):
+	return _dict(has_field=lambda fieldname: db.has_column(doctype, fieldname))
+
+
+def sendmail(recipients=None, subject=None, message=None, **kwargs):
+	sent_mail.append(_dict(recipients=recipients, subject=subject, message=message, **kwargs))
+
+
+def enqueue(method, queue="default", timeout=None, job_id=None, deduplicate=False, **kwargs):
+	enqueued.append(_dict(method=method, queue=queue, job_id=job_id, kwargs=kwargs))
+	if run_jobs_inline:
+		(get_attr(method) if isinstance(method, str) else method)(**kwargs)
+
+
+class _PlainTemplate:
+	def __init__(self, source):
+		self.source = source
+
+	def render(self, **context):
+		return render_template(self.source, context)
+
+
+def get_jenv():
+	try:
+		import jinja2
+	except ImportError:
+		return _dict(from_string=_PlainTemplate)
+
+	return jinja2.Environment()
+
+
+def render_template(template, context):
+	try:
+		import jinja2
+	except ImportError:
+		# Keep the cost proportional to the payload when Jinja is not installed
+		return template + json.dumps(context, default=str)
+
+	return jinja2.Template(template).render(**context)
@@ -0,0 +1,238 @@
+"""`frappe.db` on in-memory SQLite, translating the MariaDB-style SQL the app sends."""
+
+import datetime
+import re
+import sqlite3
+import time
+
+
+class CallbackManager:
+	def __init__(self):
+		self._functions = []
+
+	def add(self, func, *args, **kwargs):
+		self._functions.append((func, args, kwargs))
+
+	def run(self):
+		functions, self._functions = self._functions, []
+		for func, args, kwargs in functions:
+			func(*args, **kwargs)
+
+	def reset(self):
+		self._functions = []
+
+
+def _param(value):
+	if isinstance(value, datetime.datetime | datetime.date):
+		return str(value)
+	return value
+
+
+def _pow(base, exponent):
+	if base is None or exponent is None:
+		return None
+	return pow(base, exponent)
+
+
+def _datediff(end, start):
+	if end is None or start is None:
+		return None
+	return (datetime.date.fromisoformat(str(end)[:10]) - datetime.date.fromisoformat(str(start)[:10])).days
+
+
+class Database:
+	def __init__(self):
+		self.conn = sqlite3.connect(":memory:")
+		self.conn.create_function("GREATEST", -1, max)
+		self.conn.create_function("LEAST", -1, min)
+		self.conn.create_function("POW", 2, _pow)
+		self.conn.create_function("DATEDIFF", 2, _datediff)
+		self.before_commit = CallbackManager()
+		self.after_commit = CallbackManager()
+		self.before_rollback = CallbackManager()
+		self.after_rollback = CallbackManager()
+		self.globals = {}
+		self.query_count = 0
+		self.query_time = 0.0
+
+	def executescript(self, script):
+		self.conn.executescript(script)
+
+	def _translate(self, query, values):
+		"""Turn %s / %(name)s placeholders into SQLite ones, expanding sequences for IN."""
+		params = []
+
+		def bind(value):
+			if isinstance(value, list | tuple | set | frozenset):
+				return "(" + ", ".join(bind(v) for v in value) + ")" if value else "(NULL)"
+			params.append(_param(value))
+			return "?"
+
+		if isinstance(values, dict):
+			query = re.sub(r"%\((\w+)\)s", lambda m: bind(values[m.group(1)]), query)
+		else:
+			positional = iter(values or ())
+			query = re.sub(r"%s", lambda m: bind(next(positional)), query)
+
+		query = re.sub(r"\bFOR UPDATE\b", "", query, flags=re.I)
+		query = re.sub(r"ON DUPLICATE KEY UPDATE", "ON CONFLICT DO UPDATE SET", query, flags=re.I)
+		query = re.sub(r"VALUES\((\w+)\)", r"excluded.\1", query)
+		return query.replace("%%", "%"), params
+
+	def _execute(self, query, params=(), many=False):
+		self.query_count += 1
+		start = time.perf_counter()
+		try:
+			if many:
+				return self.conn.executemany(query, params)
+			return self.conn.execute(query, params)
+		finally:
+			self.query_time += time.perf_counter() - start
+
+	def sql(self, query, values=None, as_dict=False, as_list=False, **kwargs):
+		from . import _dict
+
+		query, params = self._translate(query, values)
+		cursor = self._execute(query, params)
+		if cursor.description is None:
+			return ()
+
+		rows = cursor.fetchall()
+		if as_dict:
+			columns = [c[0] for c in cursor.description]
+			return [_dict(zip(columns, row, strict=True)) for row in rows]
+		return [tuple(row) for row in rows]
+
+	def sql_list(self, query, values=None, **kwargs):
+		return [row[0] for row in self.sql(query, values)]
+
+	def _where(self, filters):
+		if not filters:
+			return "", []
+		if isinstance(filters, str):
+			filters = {"name": filters}
+
+		conditions, params = [], []
+		for field, value in filters.items():
+			if isinstance(value, list | tuple):
+				operator, operand = value[0].lower(), value[1]
+				if operator in ("in", "not in"):
+					operand = list(operand)
+					placeholders = ", ".join("?" * len(operand)) or "NULL"
+					conditions.append(f"`{field}` {operator} ({placeholders})")
+					params.extend(operand)
+				else:
+					conditions.append(f"`{field}` {operator} ?")
+					params.append(_param(operand))
+			else:
+				conditions.append(f"`{field}` = ?")
+				params.append(_param(value))
+		return " WHERE " + " AND ".join(conditions), params
+
+	def get_all(
+		self,
+		doctype,
+		filters=None,
+		fields=None,
+		as_list=False,
+		order_by=None,
+		limit=None,
+		pluck=None,
+		**kwargs,
+	):
+		from . import _dict
+
+		fields = [pluck] if pluck else fields or ["name"]
+		columns = ", ".join(f if not f.isidentifier() else f"`{f}`" for f in fields)
+		where, params = self._where(filters)
+		query = f"SELECT {columns} FROM `tab{doctype}`{where}"
+		if order_by:
+			query += f" ORDER BY {order_by}"
+		if limit:
+			query += f" LIMIT {int(limit)}"
+
+		cursor = self._execute(query, params)
+		rows = cursor.fetchall()
+		if pluck:
+			return [row[0] for row in rows]
+		if as_list:
+			return [tuple(row) for row in rows]
+		columns = [c[0] for c in cursor.description]
+		return [_dict(zip(columns, row, strict=True)) for row in rows]
+
+	def get_value(self, doctype, filters=None, fieldname="name", as_dict=False, **kwargs):
+		fields = list(fieldname) if isinstance(fieldname, list | tuple) else [fieldname]
+		rows = self.get_all(doctype, filters=doctype if filters is None else filters, fields=fields, limit=1)
+		if not rows:
+			return None
+		if as_dict:
+			return rows[0]
+		if isinstance(fieldname, list | tuple):
+			return tuple(rows[0].values())
+		return rows[0][fieldname]
+
+	def exists(self, doctype, filters=None):
+		return self.get_value(doctype, filters or doctype, "name")
+
+	def count(self, doctype, filters=None):
+		where, params = self._where(filters)
+		return self._execute(f"SELECT COUNT(*) FROM `tab{doctype}`{where}", params).fetchone()[0]
+
+	def set_value(self, doctype, name, fieldname, value=None, update_modified=True):
+		values = fieldname if isinstance(fieldname, dict) else {fieldname: value}
+		assignments = ", ".join(f"`{field}` = ?" for field in values)
+		self._execute(
+			f"UPDATE `tab{doctype}` SET {assignments} WHERE name = ?",
+			[*map(_param, values.values()), name],
+		)
+
+	def delete(self, doctype, filters=None):
+		where, params = self._where(filters)
+		self._execute(f"DELETE FROM `tab{doctype}`{where}", params)
+
+	def bulk_insert(self, doctype, fields, values, ignore_duplicates=False, chunk_size=10000):
+		columns = ", ".join(f"`{field}`" for field in fields)
+		verb = "INSERT OR IGNORE" if ignore_duplicates else "INSERT"
+		self._execute(
+			f"{verb} INTO `tab{doctype}` ({columns}) VALUES ({', '.join('?' * len(fields))})",
+			[[_param(v) for v in row] for row in values],
+			many=True,
+		)
+
+	def get_single_value(self, doctype, fieldname):
+		return self.globals.get((doctype, fieldname))
+
+	def get_singles_dict(self, doctype, **kwargs):
+		return {field: value for (dt, field), value in self.globals.items() if dt == doctype}
+
+	def get_global(self, key):
+		return self.globals.get(key)
+
+	def set_global(self, key, value):
+		self.globals[key] = value
+
+	def commit(self):
+		self.before_commit.run()
+		self.conn.commit()
+		self.after_commit.run()
+
+	def savepoint(self, save_point):
+		self._execute(f"SAVEPOINT {save_point}")
+
+	def add_index(self, doctype, fields, index_name=None):
+		index_name = index_name or "_".join(fields) + "_index"
+		self._execute(f"CREATE INDEX IF NOT EXISTS `{index_name}` ON `tab{doctype}` ({', '.join(fields)})")
+
+	def has_column(self, doctype, column):
+		return column in {row[1] for row in self.conn.execute(f"PRAGMA table_info(`tab{doctype}`)")}
+
+	def rollback(self, save_point=None):
+		if save_point:
+			self._execute(f"ROLLBACK TO SAVEPOINT {save_point}")
+			return
+
+		self.before_rollback.run()
+		self.conn.rollback()
+		self.before_commit.reset()
+		self.after_commit.reset()
+		self.after_rollback.run()
@@ -0,0 +1,23 @@
+import frappe
+
+
+class QueueBuilder:
+	"""Builds the Email Queue values of one email; the MIME body is the HTML message as is."""
+
+	def __init__(self, recipients=None, subject=None, message=None, reference_doctype=None, **kwargs):
+		self.recipients = recipients or []
+		self.subject = subject
+		self.message = message
+		self.reference_doctype = reference_doctype
+
+	def as_dict(self, include_recipients=True):
+		d = {
+			"message": f"Subject: {self.subject}\n\n{self.message}",
+			"sender": "alerts@example.com",
+			"reference_doctype": self.reference_doctype,
+			"message_id": frappe.generate_hash(length=20),
+			"priority": 1,
+		}
+		if include_recipients:
+			d["recipients"] = list(self.recipients)
+		return d
@@ -0,0 +1,401 @@
+"""
+Dict-backed stand-in for `frappe.cache()`.
+
+`RawRedis` implements the Redis commands the app uses with Redis semantics (bytes
+values, expiry, NX). `RedisStandIn` adds the `RedisWrapper` helpers, which prefix keys
+with `make_key` and pickle values, for exactly the commands the wrapper overrides.
+Pipelines always run the raw commands. Every call and every pipeline execution
+counts as one round trip. Watched keys are only supported for string values.
+"""
+
+import fnmatch
+import pickle
+import time
+
+from redis.exceptions import WatchError
+
+
+def _b(value):
+	if isinstance(value, bytes):
+		return value
+	if isinstance(value, float) and value.is_integer():
+		value = int(value)
+	return str(value).encode()
+
+
+class RawRedis:
+	def __init__(self):
+		self.data = {}
+		self.expiry = {}
+
+	def _alive(self, key):
+		expires_at = self.expiry.get(key)
+		if expires_at is not None and expires_at <= time.time():
+			self.data.pop(key, None)
+			self.expiry.pop(key, None)
+		return key in self.data
+
+	def _container(self, key, factory):
+		if not self._alive(key):
+			self.data[key] = factory()
+		return self.data[key]
+
+	def flushall(self):
+		self.data.clear()
+		self.expiry.clear()
+
+	# strings
+	def get(self, key):
+		return self.data[key] if self._alive(key) else None
+
+	def mget(self, keys, *args):
+		keys = list(keys) if isinstance(keys, list | tuple) else [keys, *args]
+		return [RawRedis.get(self, key) for key in keys]
+
+	def set(self, key, value, ex=None, px=None, nx=False, xx=False):
+		if nx and self._alive(key):
+			return None
+		if xx and not self._alive(key):
+			return None
+		self.data[key] = _b(value)
+		self.expiry.pop(key, None)
+		if ex or px:
+			self.expiry[key] = time.time() + (ex or px / 1000)
+		return True
+
+	def incrby(self, key, amount=1):
+		value = int(RawRedis.get(self, key) or 0) + amount
+		self.data[key] = _b(value)
+		return value
+
+	incr = incrby
+
+	def decrby(self, key, amount=1):
+		return RawRedis.incrby(self, key, -amount)
+
+	decr = decrby
+
+	def incrbyfloat(self, key, amount=1.0):
+		value = float(RawRedis.get(self, key) or 0) + amount
+		self.data[key] = _b(repr(value))
+		return value
+
+	# keys
+	def delete(self, *keys):
+		removed = sum(1 for key in keys if self._alive(key))
+		for key in keys:
+			self.data.pop(key, None)
+			self.expiry.pop(key, None)
+		return removed
+
+	def exists(self, *keys):
+		return sum(1 for key in keys if self._alive(key))
+
+	def expire(self, key, seconds):
+		if not self._alive(key):
+			return False
+		self.expiry[key] = time.time() + seconds
+		return True
+
+	def persist(self, key):
+		return self.expiry.pop(key, None) is not None
+
+	def ttl(self, key):
+		if not self._alive(key):
+			return -2
+		return int(self.expiry[key] - time.time()) if key in self.expiry else -1
+
+	def rename(self, src, dst):
+		self.data[dst] = self.data.pop(src)
+		self.expiry.pop(dst, None)
+		if src in self.expiry:
+			self.expiry[dst] = self.expiry.pop(src)
+		return True
+
+	def keys(self, pattern="*"):
+		pattern = pattern.decode() if isinstance(pattern, bytes) else pattern
+		return [key for key in list(self.data) if self._alive(key) and fnmatch.fnmatch(key.decode(), pattern)]
+
+	# hashes
+	def hset(self, name, key=None, value=None, mapping=None):
+		h = self._container(name, dict)
+		items = dict(mapping or {})
+		if key is not None:
+			items[key] = value
+		added = 0
+		for field, field_value in items.items():
+			added += _b(field) not in h
+			h[_b(field)] = _b(field_value)
+		return added
+
+	def hsetnx(self, name, key, value):
+		h = self._container(name, dict)
+		if _b(key) in h:
+			return 0
+		h[_b(key)] = _b(value)
+		return 1
+
+	def hget(self, name, key):
+		return self.data[name].get(_b(key)) if self._alive(name) else None
+
+	def hmget(self, name, keys, *args):
+		keys = list(keys) if isinstance(keys, list | tuple) else [keys, *args]
+		return [RawRedis.hget(self, name, key) for key in keys]
+
+	def hgetall(self, name):
+		return dict(self.data[name]) if self._alive(name) else {}
+
+	def hdel(self, name, *keys):
+		if not self._alive(name):
+			return 0
+		return sum(1 for key in keys if self.data[name].pop(_b(key), None) is not None)
+
+	def hlen(self, name):
+		return len(self.data[name]) if self._alive(name) else 0
+
+	def hincrby(self, name, key, amount=1):
+		h = self._container(name, dict)
+		value = int(h.get(_b(key), b"0")) + amount
+		h[_b(key)] = _b(value)
+		return value
+
+	def hincrbyfloat(self, name, key, amount=1.0):
+		h = self._container(name, dict)
+		value = float(h.get(_b(key), b"0")) + amount
+		h[_b(key)] = _b(repr(value))
+		return value
+
+	# sets
+	def sadd(self, name, *values):
+		s = self._container(name, set)
+		added = sum(1 for value in values if _b(value) not in s)
+		s.update(_b(value) for value in values)
+		return added
+
+	def srem(self, name, *values):
+		if not self._alive(name):
+			return 0
+		s = self.data[name]
+		removed = sum(1 for value in values if _b(value) in s)
+		s.difference_update(_b(value) for value in values)
+		return removed
+
+	def sismember(self, name, value):
+		return self._alive(name) and _b(value) in self.data[name]
+
+	def smismember(self, name, values, *args):
+		values = list(values) if isinstance(values, list | tuple) else [values, *args]
+		return [int(RawRedis.sismember(self, name, value)) for value in values]
+
+	def smembers(self, name):
+		return set(self.data[name]) if self._alive(name) else set()
+
+	def scard(self, name):
+		return len(self.data[name]) if self._alive(name) else 0
+
+	# sorted sets
+	def zadd(self, name, mapping, nx=False, xx=False, gt=False, lt=False):
+		z = self._container(name, dict)
+		added = 0
+		for member, score in mapping.items():
+			member = _b(member)
+			exists = member in z
+			if (nx and exists) or (xx and not exists):
+				continue
+			if exists and ((gt and score <= z[member]) or (lt and score >= z[member])):
+				continue
+			added += not exists
+			z[member] = float(score)
+		return added
+
+	def zrangebyscore(self, name, min, max, start=None, num=None, withscores=False):
+		if not self._alive(name):
+			return []
+		low = float("-inf") if min == "-inf" else float(min)
+		high = float("inf") if max in ("+inf", "inf") else float(max)
+		members = sorted((score, member) for member, score in self.data[name].items() if low <= score <= high)
+		if start is not None:
+			members = members[start : start + num]
+		return [(member, score) for score, member in members] if withscores else [m for _s, m in members]
+
+	def zrem(self, name, *members):
+		if not self._alive(name):
+			return 0
+		return sum(1 for member in members if self.data[name].pop(_b(member), None) is not None)
+
+	def zcard(self, name):
+		return len(self.data[name]) if self._alive(name) else 0
+
+	def zscore(self, name, member):
+		return self.data[name].get(_b(member)) if self._alive(name) else None
+
+	# lists
+	def rpush(self, name, *values):
+		values_list = self._container(name, list)
+		values_list.extend(_b(value) for value in values)
+		return len(values_list)
+
+	def lpush(self, name, *values):
+		values_list = self._container(name, list)
+		for value in values:
+			values_list.insert(0, _b(value))
+		return len(values_list)
+
+	def lrange(self, name, start, end):
+		values_list = self.data[name] if self._alive(name) else []
+		return values_list[start : None if end == -1 else end + 1]
+
+	def ltrim(self, name, start, end):
+		if self._alive(name):
+			self.data[name] = self.data[name][start : None if end == -1 else end + 1]
+		return True
+
+	def llen(self, name):
+		return len(self.data[name]) if self._alive(name) else 0
+
+
+class Pipeline:
+	def __init__(self, redis):
+		self.redis = redis
+		self.commands = []
+		# key -> value at `watch`; commands run right away between `watch` and `multi`
+		self.watched = {}
+		self.immediate = False
+
+	def __getattr__(self, name):
+		command = getattr(RawRedis, name)
+
+		def queue(*args, **kwargs):
+			if self.immediate:
+				self.redis.round_trips += 1
+				return command(self.redis, *args, **kwargs)
+			self.commands.append((command, args, kwargs))
+			return self
+
+		return queue
+
+	def watch(self, *keys):
+		self.redis.round_trips += 1
+		self.watched.update((key, RawRedis.get(self.redis, key)) for key in keys)
+		self.immediate = True
+
+	def multi(self):
+		self.immediate = False
+
+	def execute(self):
+		self.redis.round_trips += 1
+		commands, watched = self.commands, self.watched
+		self.reset()
+		if any(RawRedis.get(self.redis, key) != value for key, value in watched.items()):
+			raise WatchError(watched)
+		return [command(self.redis, *args, **kwargs) for command, args, kwargs in commands]
+
+	def reset(self):
+		self.commands = []
+		self.watched = {}
+		self.immediate = False
+
+	def __enter__(self):
+		return self
+
+	def __exit__(self, *exc):
+		self.reset()
+
+
+def _counted(func):
+	def wrapper(self, *args, **kwargs):
+		self.round_trips += 1
+		return func(self, *args, **kwargs)
+
+	wrapper.__name__ = func.__name__
+	return wrapper
+
+
+class RedisStandIn(RawRedis):
+	"""`frappe.cache()`: RedisWrapper helpers on top of the raw commands."""
+
+	def __init__(self):
+		super().__init__()
+		self.round_trips = 0
+
+	def __call__(self):
+		return self
+
+	def make_key(self, key, user=None, shared=False):
+		if isinstance(key, bytes):
+			return key
+		return f"benchmark|{key}".encode()
+
+	def pipeline(self, transaction=True, shard_hint=None):
+		return Pipeline(self)
+
+	@_counted
+	def get_value(self, key, generator=None, user=None, expires=False, shared=False):
+		value = RawRedis.get(self, self.make_key(key))
+		if value is not None:
+			return pickle.loads(value)
+		if generator:
+			value = generator()
+			self.set_value(key, value)
+		return value
+
+	@_counted
+	def set_value(self, key, val, user=None, expires_in_sec=None, shared=False):
+		RawRedis.set(self, self.make_key(key), pickle.dumps(val), ex=expires_in_sec)
+
+	@_counted
+	def delete_value(self, keys, user=None, make_keys=True, shared=False):
+		keys = [keys] if isinstance(keys, str | bytes) else keys
+		RawRedis.delete(self, *[self.make_key(key) if make_keys else key for key in keys])
+
+	delete_key = delete_value
+
+	@_counted
+	def get_keys(self, key):
+		return RawRedis.keys(self, self.make_key(f"{key}*").decode())
+
+	def delete_keys(self, key):
+		self.delete_value(self.get_keys(key), make_keys=False)
+
+	@_counted
+	def hset(self, name, key, value, shared=False):
+		return RawRedis.hset(self, self.make_key(name), key, pickle.dumps(value))
+
+	@_counted
+	def hget(self, name, key, generator=None, shared=False):
+		value = RawRedis.hget(self, self.make_key(name), key)
+		return pickle.loads(value) if value is not None else None
+
+	@_counted
+	def hgetall(self, name):
+		return {k: pickle.loads(v) for k, v in RawRedis.hgetall(self, self.make_key(name)).items()}
+
+	@_counted
+	def hdel(self, name, key, shared=False):
+		return RawRedis.hdel(self, self.make_key(name), *([key] if isinstance(key, str) else key))
+
+	@_counted
+	def sadd(self, name, *values):
+		return RawRedis.sadd(self, self.make_key(name), *values)
+
+	@_counted
+	def srem(self, name, *values):
+		return RawRedis.srem(self, self.make_key(name), *values)
+
+	@_counted
+	def sismember(self, name, value):
+		return RawRedis.sismember(self, self.make_key(name), value)
+
+	@_counted
+	def smembers(self, name):
+		return RawRedis.smembers(self, self.make_key(name))
+
+	@_counted
+	def exists(self, *keys, user=None, shared=False):
+		return RawRedis.exists(self, *[self.make_key(key) for key in keys])
+
+
+# Raw commands the wrapper does not override still cost a round trip each
+for _name, _func in list(vars(RawRedis).items()):
+	if callable(_func) and not _name.startswith("_") and _name not in vars(RedisStandIn):
+		setattr(RedisStandIn, _name, _counted(_func))
@@ -0,0 +1,71 @@
+"""The subset of `frappe.utils` used by the app."""
+
+import datetime
+
+
+def flt(value, precision=None):
+	try:
+		result = float(value or 0)
+	except (TypeError, ValueError):  # fmt: skip
+		result = 0.0
+	return round(result, precision) if precision is not None else result
+
+
+def cint(value):
+	try:
+		return int(float(value or 0))
+	except (TypeError, ValueError):  # fmt: skip
+		return 0
+
+
+def cstr(value):
+	return "" if value is None else str(value)
+
+
+def now_datetime():
+	return datetime.datetime.now()
+
+
+def now():
+	return str(now_datetime())
+
+
+def nowdate():
+	return str(datetime.date.today())
+
+
+def getdate(value=None):
+	if value is None:
+		return datetime.date.today()
+	if isinstance(value, datetime.datetime):
+		return value.date()
+	if isinstance(value, datetime.date):
+		return value
+	return datetime.date.fromisoformat(str(value)[:10])
+
+
+def get_datetime(value=None):
+	if value is None:
+		return now_datetime()
+	if isinstance(value, datetime.datetime):
+		return value
+	if isinstance(value, datetime.date):
+		return datetime.datetime.combine(value, datetime.time())
+	return datetime.datetime.fromisoformat(str(value))
+
+
+def add_to_date(date, days=0, hours=0, minutes=0, seconds=0, as_string=False, **kwargs):
+	result = get_datetime(date) + datetime.timedelta(days=days, hours=hours, minutes=minutes, seconds=seconds)
+	return str(result) if as_string else result
+
+
+def add_days(date, days):
+	return getdate(date) + datetime.timedelta(days=days)
+
+
+def date_diff(a, b):
+	return (getdate(a) - getdate(b)).days
+
+
+def time_diff_in_seconds(a, b):
+	return (get_datetime(a) - get_datetime(b)).total_seconds()
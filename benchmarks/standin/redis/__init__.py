@@ -0,0 +1,6 @@
+"""
+Stand-in for the parts of redis-py the app imports directly; `frappe.cache()` itself
+is `frappe.redis.RedisStandIn`.
+"""
+
+from .exceptions import WatchError
@@ -0,0 +1,6 @@
+class RedisError(Exception):
+	pass
+
+
+class WatchError(RedisError):
+	"""A watched key changed between `watch` and `execute`."""
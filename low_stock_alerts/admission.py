@@ -0,0 +1,128 @@
+"""
+Admission filter for event-driven checks.
+
+A Redis set holds every (item_code, warehouse) pair with a positive reorder level.
+Pairs collected from Stock Ledger Entries are looked up in it, in one round trip per
+voucher, before a check is enqueued; SLEs for pairs nobody monitors never cost a job.
+
+The set is kept current from the Item save hook and rebuilt in full once a day. Every
+build holds a sentinel member, so a set that was never built or that Redis evicted is
+told apart from an empty one: without the sentinel every pair is admitted and a rebuild
+is queued. Clearing `admission_filter` in Low Stock Alert Settings turns it off.
+"""
+
+import frappe
+from frappe.utils import cint, flt
+
+from low_stock_alerts import metrics
+from low_stock_alerts.settings import get_setting
+
+INDEX_KEY = "low_stock_alerts:monitored_pairs"
+BUILDING_KEY = "low_stock_alerts:monitored_pairs:building"
+# Not a valid pair; present in every built set
+SENTINEL = "\x1f"
+REBUILD_BATCH_SIZE = 10000
+
+
+def admit(pairs):
+	"""Return the entries of `pairs` that may need a check, in order."""
+	pairs = list(pairs)
+	if not pairs or not cint(get_setting("admission_filter", 1)):
+		return pairs
+
+	cache = frappe.cache()
+	*monitored, built = cache.smismember(
+		cache.make_key(INDEX_KEY), [*(_member(*pair) for pair in pairs), SENTINEL]
+	)
+
+	if not built:
+		metrics.incr("admission:not_built")
+		enqueue_rebuild()
+		return pairs
+
+	return [pair for pair, is_monitored in zip(pairs, monitored, strict=True) if is_monitored]
+
+
+def on_item_update(doc, method=None):
+	"""Doc event hook: add and remove the item's pairs once the transaction commits."""
+	monitored = set()
+	if method != "on_trash":
+		monitored = {
+			(doc.name, d.warehouse)
+			for d in doc.get("reorder_levels") or []
+			if d.warehouse and flt(d.warehouse_reorder_level) > 0
+		}
+
+	previous = set()
+	before = doc.get_doc_before_save()
+	if before:
+		previous = {(doc.name, d.warehouse) for d in before.get("reorder_levels") or [] if d.warehouse}
+	if method == "on_trash":
+		previous.update((doc.name, d.warehouse) for d in doc.get("reorder_levels") or [] if d.warehouse)
+
+	frappe.db.after_commit.add(_apply, monitored, previous - monitored)
+
+
+def _apply(added, removed):
+	if not (added or removed):
+		return
+
+	cache = frappe.cache()
+	pipe = cache.pipeline(transaction=False)
+	# Also apply to a set being rebuilt, so the swap does not undo this change
+	for key in (INDEX_KEY, BUILDING_KEY):
+		if added:
+			pipe.sadd(cache.make_key(key), *(_member(*pair) for pair in added))
+		if removed:
+			pipe.srem(cache.make_key(key), *(_member(*pair) for pair in removed))
+	pipe.expire(cache.make_key(BUILDING_KEY), 60 * 60)
+	pipe.execute()
+
+
+def enqueue_rebuild():
+	frappe.enqueue(
+		"low_stock_alerts.admission.rebuild_admission_index",
+		queue="long",
+		job_id="low_stock_alerts_admission_rebuild",
+		deduplicate=True,
+	)
+
+
+def rebuild_admission_index():
+	"""Scheduler job: rebuild the set from Item Reorder and swap it in atomically."""
+	cache = frappe.cache()
+	building_key = cache.make_key(BUILDING_KEY)
+	cache.delete_value(BUILDING_KEY)
+	cache.sadd(BUILDING_KEY, SENTINEL)
+
+	last_name, total = "", 0
+	while True:
+		rows = frappe.db.sql(
+			"""
+            SELECT name, parent, warehouse
+            FROM `tabItem Reorder`
+            WHERE parenttype = 'Item' AND warehouse_reorder_level > 0 AND name > %(last_name)s
+            ORDER BY name
+            LIMIT %(limit)s
+            """,
+			{"last_name": last_name, "limit": REBUILD_BATCH_SIZE},
+		)
+		if rows:
+			pipe = cache.pipeline(transaction=False)
+			pipe.sadd(building_key, *(_member(item_code, warehouse) for _name, item_code, warehouse in rows))
+			pipe.execute()
+			total += len(rows)
+
+		if len(rows) < REBUILD_BATCH_SIZE:
+			break
+		last_name = rows[-1][0]
+
+	pipe = cache.pipeline(transaction=True)
+	pipe.persist(building_key)
+	pipe.rename(building_key, cache.make_key(INDEX_KEY))
+	pipe.execute()
+	metrics.get_logger().info("Rebuilt low-stock admission index with %s pairs", total)
+
+
+def _member(item_code, warehouse):
+	return f"{item_code}\x1f{warehouse}"
@@ -0,0 +1,201 @@
+"""
+Persistent alert state per (item, warehouse), kept in `Low Stock Alert State`.
+
+Only pairs that are LOW or CRITICAL have a row; a missing row means OK, so the table is
+as small as the set of pairs that are currently short. Transitions are decided by
+`low_stock_alerts.engine`; this module reads and writes them in bulk.
+
+Every committed transaction that changed a state bumps a version in Redis, which
+`api.get_low_stock_status` uses as the ETag of its cached responses.
+"""
+
+import frappe
+from frappe.utils import flt, now
+
+from low_stock_alerts.engine import OK, AlertState
+from low_stock_alerts.settings import get_setting
+
+DOCTYPE = "Low Stock Alert State"
+WRITE_CHUNK_SIZE = 1000
+VERSION_KEY = "low_stock_alerts:alert_state_version"
+
+
+def get_recovery_band():
+	"""Fraction above the reorder level a LOW pair must reach before it counts as OK again."""
+	return flt(get_setting("recovery_band", 0.1))
+
+
+def get_critical_ratio():
+	"""Fraction of the reorder level at or below which a pair is CRITICAL (0: out of stock)."""
+	return flt(get_setting("critical_ratio", 0))
+
+
+def get_states(pairs):
+	"""Return {(item_code, warehouse): AlertState} for the pairs that are not OK."""
+	pairs = set(pairs)
+	if not pairs:
+		return {}
+
+	rows = frappe.db.sql(
+		f"""
+        SELECT item_code, warehouse, state, last_alerted_qty, last_alerted_at
+        FROM `tab{DOCTYPE}`
+        WHERE item_code IN %(items)s AND warehouse IN %(warehouses)s
+        """,
+		{
+			"items": tuple({item_code for item_code, _w in pairs}),
+			"warehouses": tuple({warehouse for _i, warehouse in pairs}),
+		},
+	)
+	return {
+		(item_code, warehouse): AlertState(state, last_alerted_qty, last_alerted_at)
+		for item_code, warehouse, state, last_alerted_qty, last_alerted_at in rows
+		if (item_code, warehouse) in pairs
+	}
+
+
+def get_states_in(ranges):
+	"""
+	Return the LOW and CRITICAL rows of warehouses inside any of the `(lft, rgt)` ranges
+	as dicts ordered by warehouse and item, with the item name.
+	"""
+	if not ranges:
+		return []
+
+	values, conditions = {}, []
+	for i, (lft, rgt) in enumerate(ranges):
+		conditions.append(f"(w.lft >= %(lft_{i})s AND w.rgt <= %(rgt_{i})s)")
+		values[f"lft_{i}"], values[f"rgt_{i}"] = lft, rgt
+
+	return frappe.db.sql(
+		f"""
+        SELECT s.item_code, i.item_name, s.warehouse, s.state, s.projected_qty, s.last_alerted_at
+        FROM `tab{DOCTYPE}` s
+        INNER JOIN `tabWarehouse` w ON w.name = s.warehouse
+        LEFT JOIN `tabItem` i ON i.name = s.item_code
+        WHERE s.state != 'OK' AND ({" OR ".join(conditions)})
+        ORDER BY s.warehouse, s.item_code
+        """,
+		values,
+		as_dict=True,
+	)
+
+
+def get_state_version():
+	"""Version of the alert states; it changes after every commit that changed one."""
+	version = frappe.cache().get_value(VERSION_KEY)
+	if version is None:
+		version = _bump_version()
+	return version
+
+
+def save_states(changes):
+	"""Persist `engine.StateChange`s: recovered pairs are deleted, the rest upserted."""
+	if changes:
+		_mark_changed()
+
+	recovered = [(c.item_code, c.warehouse) for c in changes if c.state == OK]
+	for start in range(0, len(recovered), WRITE_CHUNK_SIZE):
+		frappe.db.sql(
+			f"DELETE FROM `tab{DOCTYPE}` WHERE (item_code, warehouse) IN %(pairs)s",
+			{"pairs": tuple(recovered[start : start + WRITE_CHUNK_SIZE])},
+		)
+
+	# Only alerts move the last-alerted qty and time
+	_upsert([c for c in changes if c.state != OK and c.alerted], alerted=True)
+	_upsert([c for c in changes if c.state != OK and not c.alerted], alerted=False)
+
+
+def _upsert(changes, alerted):
+	timestamp, user = now(), frappe.session.user
+	updates = "state = VALUES(state), projected_qty = VALUES(projected_qty), modified = VALUES(modified)"
+	if alerted:
+		updates += ", last_alerted_qty = VALUES(last_alerted_qty), last_alerted_at = VALUES(last_alerted_at)"
+
+	for start in range(0, len(changes), WRITE_CHUNK_SIZE):
+		chunk = changes[start : start + WRITE_CHUNK_SIZE]
+		values = []
+		for c in chunk:
+			values.extend(
+				(
+					frappe.generate_hash(length=10),
+					timestamp,
+					timestamp,
+					user,
+					user,
+					c.item_code,
+					c.warehouse,
+					c.state,
+					c.projected_qty,
+					c.projected_qty if alerted else None,
+					timestamp if alerted else None,
+				)
+			)
+
+		frappe.db.sql(
+			f"""
+            INSERT INTO `tab{DOCTYPE}` (
+                name, creation, modified, owner, modified_by,
+                item_code, warehouse, state, projected_qty, last_alerted_qty, last_alerted_at
+            )
+            VALUES {", ".join(["(%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)"] * len(chunk))}
+            ON DUPLICATE KEY UPDATE {updates}
+            """,
+			values,
+		)
+
+
+def sweep_recovered():
+	"""
+	Delete the state of pairs that are back above their reorder level plus the recovery
+	band, or no longer have one. The fallback only reads low rows, so without this a
+	recovered pair the event path never rechecks would stay LOW.
+	"""
+	from low_stock_alerts.consumption import cover_params, reorder_level_sql
+	from low_stock_alerts.group_qty import projected_qty_sql
+
+	joins, reorder_level = reorder_level_sql("ir")
+	group_joins, projected_qty = projected_qty_sql("ir", "b")
+	names = frappe.db.sql_list(
+		f"""
+        SELECT s.name
+        FROM `tab{DOCTYPE}` s
+        LEFT JOIN `tabItem Reorder` ir
+            ON ir.parent = s.item_code AND ir.warehouse = s.warehouse AND ir.parenttype = 'Item'
+        LEFT JOIN `tabBin` b ON b.item_code = s.item_code AND b.warehouse = s.warehouse
+        {joins}
+        {group_joins}
+        WHERE
+            IFNULL(ir.warehouse_reorder_level, 0) <= 0
+            OR {projected_qty} > {reorder_level} * (1 + %(band)s)
+        """,
+		{"band": get_recovery_band(), **cover_params()},
+	)
+	if names:
+		_mark_changed()
+	for start in range(0, len(names), WRITE_CHUNK_SIZE):
+		frappe.db.delete(DOCTYPE, {"name": ("in", names[start : start + WRITE_CHUNK_SIZE])})
+	return len(names)
+
+
+def _mark_changed():
+	"""Bump the version once the current transaction commits."""
+	if not frappe.flags.low_stock_state_changed:
+		frappe.flags.low_stock_state_changed = True
+		frappe.db.after_commit.add(_on_commit)
+		frappe.db.after_rollback.add(_clear_changed)
+
+
+def _on_commit():
+	_clear_changed()
+	_bump_version()
+
+
+def _bump_version():
+	version = frappe.generate_hash(length=12)
+	frappe.cache().set_value(VERSION_KEY, version)
+	return version
+
+
+def _clear_changed():
+	frappe.flags.low_stock_state_changed = None
@@ -189,202 +189,736 @@
 
 
 # api.py  
+import hashlib
+from bisect import bisect_left
+
 import frappe  
 from frappe import _  
-from frappe.utils import flt, nowdate, now_datetime  
+from frappe.utils import add_to_date, cint, flt, get_datetime, now_datetime  
   
-# Shared config (overridden in tests or via hooks/config later)  
+from low_stock_alerts import group_qty, metrics, outbox, snapshot
+from low_stock_alerts.admission import admit
+from low_stock_alerts.alert_state import (
+    get_critical_ratio,
+    get_recovery_band,
+    get_state_version,
+    get_states,
+    get_states_in,
+    save_states,
+    sweep_recovered,
+)
+from low_stock_alerts.consumption import cover_params, reorder_level_sql
+from low_stock_alerts.consumption import record as record_consumption
+from low_stock_alerts.digest import add_to_digest, get_digest_window
+from low_stock_alerts.engine import (
+    OK,
+    LowStock,
+    StateChange,
+    classify,
+    escalations,
+    evaluate,
+    evaluate_columns,
+    group_runs,
+)
+from low_stock_alerts.lookup_cache import item_cache, recipient_cache, reorder_cache
+from low_stock_alerts.profiling import profile
+from low_stock_alerts.providers import FrappeProvider
+from low_stock_alerts.settings import get_setting
+from low_stock_alerts.shards import get_shard_count, run_sharded_fallback
+from low_stock_alerts.throttle import claim
+from low_stock_alerts.warehouse_tree import get_tree_version, get_warehouse_tree
+
+# Overrides the monitored warehouses of Low Stock Alert Settings when not empty (tests, benchmarks)
 monitored_warehouses = []  
   
   
+PENDING_CHECK_TTL = 600
+# Pending-check marker of a pair that only stock increases touched
+RESTOCK = "restock"
+
+WATERMARK_KEY = "low_stock_alerts_fallback_watermark"
+FULL_SCAN_KEY = "low_stock_alerts_last_full_scan"
+WATERMARK_OVERLAP = 60
+
+STATUS_CACHE_KEY = "low_stock_alerts:status"
+STATUS_CACHE_TTL = 60 * 60
+
+
 def on_sle_update(doc, method):  
     """Event hook: called after each Stock Ledger Entry is created/updated."""  
-    print("SLE hook triggered:", doc.name, doc.voucher_type, "actual_qty:", doc.actual_qty)  
+    metrics.get_logger().debug("SLE %s (%s) actual_qty=%s", doc.name, doc.voucher_type, doc.actual_qty)
+    if method == "on_submit":
+        record_consumption(doc)
+        group_qty.record(doc)
+
+    if not cint(get_setting("sle_trigger", 1)):
+        return
+
     if doc.docstatus == 1 and not doc.is_cancelled:  
-        frappe.enqueue(  
-            "low_stock_alerts.api.check_and_alert_low_stock",  
-            item_code=doc.item_code,  
-            warehouse=doc.warehouse,  
-            actual_qty=doc.actual_qty,  # pass actual_qty to detect decrease  
-            decrease_only=True,        # flag to allow decrease-only trigger  
-            queue="short",  
-        )  
-        print("Done")  
-  
-  
+        pending = _get_pending_checks()
+
+        # Only decreases and zero-qty reconciliations can push stock below reorder level. An
+        # increase can still move a LOW or CRITICAL pair back to OK; it is kept as a restock
+        # and checked only if the pair has a state
+        if flt(doc.actual_qty) > 0:
+            pending.setdefault((doc.item_code, doc.warehouse), RESTOCK)
+            return
+
+        pending[(doc.item_code, doc.warehouse)] = None
+
+
+def on_order_update(doc, method=None):
+    """
+    Sales Order and Material Request hook, enabled by `order_trigger` in Low Stock Alert
+    Settings. Orders move projected qty without a Stock Ledger Entry; ERPNext has written
+    the new qty to Bin by the time this runs. Queues a check only for the pairs whose
+    alert state the new qty changes, against the same reorder level a check uses, days
+    of cover included.
+    """
+    if not cint(get_setting("order_trigger", 0)):
+        return
+
+    pairs = list({(d.item_code, d.warehouse) for d in doc.get("items") or [] if d.item_code and d.warehouse})
+    reorder = reorder_cache.get_many(pairs)
+    monitored = [pair for pair in pairs if reorder[pair] and flt(reorder[pair].warehouse_reorder_level) > 0]
+    metrics.incr("order:no_reorder_level", len(pairs) - len(monitored))
+
+    # Checked against a group total, which the hourly rebuild brings up to date with orders
+    if group_qty.is_enabled():
+        grouped = {pair for pair in monitored if reorder[pair].get("warehouse_group")}
+        metrics.incr("order:group_threshold", len(grouped))
+        monitored = [pair for pair in monitored if pair not in grouped]
+    if not monitored:
+        return
+
+    provider = FrappeProvider()
+    levels = provider.get_reorder_levels(monitored)
+    projected = provider.get_projected_qty(monitored)
+    states = provider.get_states(monitored)
+    recovery_band, critical_ratio = get_recovery_band(), get_critical_ratio()
+    pending = _get_pending_checks()
+    for pair in monitored:
+        previous = states[pair].state if pair in states else OK
+        state = classify(projected.get(pair, 0), levels[pair].level, previous, recovery_band, critical_ratio)
+        if state == previous:
+            metrics.incr("order:no_crossing")
+            continue
+
+        metrics.incr("order:crossing")
+        pending[pair] = None
+
+
+def _get_pending_checks():
+    """Pairs collected for the current voucher; a single job is enqueued after commit."""
+    pending = frappe.flags.low_stock_pending_checks
+    if pending is None:
+        pending = frappe.flags.low_stock_pending_checks = {}
+        frappe.db.after_commit.add(enqueue_pending_checks)
+        frappe.db.after_rollback.add(_clear_pending_checks)
+
+    return pending
+
+
+def _clear_pending_checks():
+    frappe.flags.low_stock_pending_checks = None
+
+
+def enqueue_pending_checks():
+    """Enqueue one batch job for all pairs touched by the committed voucher.
+
+    Pairs that already have a check waiting on the queue are dropped, so a burst of
+    vouchers for the same item and warehouse results in a single evaluation.
+    """
+    pending = frappe.flags.low_stock_pending_checks
+    _clear_pending_checks()
+    try:
+        if not pending:
+            return
+
+        restocked = [pair for pair, reason in pending.items() if reason == RESTOCK]
+        if restocked:
+            short = get_states(restocked)
+            metrics.incr("sle:skipped_increase", len(restocked) - len(short))
+            pending = [pair for pair, reason in pending.items() if reason != RESTOCK or pair in short]
+            if not pending:
+                return
+
+        pairs = admit(pending)
+        metrics.incr("sle:not_monitored", len(pending) - len(pairs))
+        if not pairs:
+            return
+
+        added = claim([(_pending_check_key(*pair), PENDING_CHECK_TTL) for pair in pairs])
+        new_pairs = [list(pair) for pair, is_new in zip(pairs, added, strict=True) if is_new]
+        metrics.incr("sle:already_pending", len(pairs) - len(new_pairs))
+        if not new_pairs:
+            return
+
+        frappe.enqueue(
+            "low_stock_alerts.api.check_and_alert_low_stock_batch",
+            pairs=new_pairs,
+            queue="short",
+        )
+        metrics.incr("sle:enqueued_pairs", len(new_pairs))
+        metrics.get_logger().debug("Enqueued low-stock check for %s pairs", len(new_pairs))
+    finally:
+        metrics.flush()
+
+
+def _pending_check_key(item_code, warehouse):
+    return f"low_stock_alerts:pending_check:{item_code}:{warehouse}"
+
+
 def get_monitored_warehouses_for_leaf(leaf_warehouse):  
     import low_stock_alerts.api as api  
   
-    monitored = api.monitored_warehouses or []  
+    monitored = api.monitored_warehouses or get_setting("monitored_warehouses") or []
     if not monitored:  
         return [leaf_warehouse]  
   
-    result = []  
-    leaf = frappe.db.get_value("Warehouse", leaf_warehouse, ["lft", "rgt"], as_dict=True)  
-    if not leaf:  
-        return [leaf_warehouse]  
-  
-    for wh in monitored:  
-        is_group = frappe.db.get_value("Warehouse", wh, "is_group")  
-        if is_group:  
-            parent = frappe.db.get_value("Warehouse", wh, ["lft", "rgt"], as_dict=True)  
-            if parent and parent.lft <= leaf.lft and parent.rgt >= leaf.rgt:  
-                result.append(wh)  
-        elif leaf_warehouse == wh:  
-            result.append(wh)  
-  
-    return result if result else [leaf_warehouse]  
-  
-  
-def _get_reorder_for_leaf(item_code, leaf_warehouse):  
-    return frappe.db.get_value(  
-        "Item Reorder",  
-        {"parent": item_code, "warehouse": leaf_warehouse},  
-        ["warehouse_reorder_level", "warehouse_reorder_qty"],  
-        as_dict=True,  
-    )  
-  
-  
+    return get_warehouse_tree().get_monitored_for_leaf(leaf_warehouse, monitored) or [leaf_warehouse]
+
+
 def check_and_alert_low_stock(item_code, warehouse, actual_qty=0, decrease_only=False):  
-    print(f"DEBUG check_and_alert_low_stock: item={item_code}, wh={warehouse}, actual_qty={actual_qty}, decrease_only={decrease_only}")  
-    monitored = get_monitored_warehouses_for_leaf(warehouse)  
-    print("DEBUG monitored:", monitored)  
-    if not monitored:  
-        print("DEBUG RETURN: no monitored")  
-        return  
-  
+    """Check a single (item, warehouse) pair; see `check_and_alert_low_stock_batch`."""
     # Only skip if this is an increase; allow decreases and zero-qty reconciliations  
     if decrease_only and flt(actual_qty) > 0:  
-        print("DEBUG RETURN: decrease_only and positive actual_qty (increase)")  
-        return  
-  
-    reorder = _get_reorder_for_leaf(item_code, warehouse)  
-    print("DEBUG reorder:", reorder)  
-    if not reorder or not reorder.warehouse_reorder_level:  
-        print("DEBUG RETURN: no reorder or no level")  
-        return  
-  
-    projected_qty = flt(  
-        frappe.db.get_value("Bin", {"item_code": item_code, "warehouse": warehouse}, "projected_qty") or 0  
-    )  
-    print("DEBUG projected_qty:", projected_qty, "reorder_level:", reorder.warehouse_reorder_level)  
-    if projected_qty > reorder.warehouse_reorder_level:  
-        print("DEBUG RETURN: projected > reorder")  
         return  
-  
-    throttle_key = f"low_stock_alert:{item_code}:{warehouse}"  
-    if frappe.cache().get_value(throttle_key):  
-        print("DEBUG RETURN: throttled")  
-        return  
-    frappe.cache().set_value(throttle_key, now_datetime(), expires_in_sec=600)  
-  
-    item_payload = {  
-        "item_code": item_code,  
-        "item_name": frappe.db.get_value("Item", item_code, "item_name"),  
-        "description": frappe.db.get_value("Item", item_code, "description"),  
-        "warehouse": warehouse,  
-        "projected_qty": projected_qty,  
-        "reorder_level": reorder.warehouse_reorder_level,  
-        "reorder_qty": reorder.warehouse_reorder_qty,  
-    }  
-  
-    for monitored_name in monitored:  
-        recipient = frappe.db.get_value("Warehouse", monitored_name, "email_id")  
-        print(f"DEBUG recipient for {monitored_name}:", recipient)  
-        if recipient:  
-            send_low_stock_email([item_payload], recipient, monitored_name)
-  
-  
+
+    check_and_alert_low_stock_batch([(item_code, warehouse)])
+
+
+def check_and_alert_low_stock_batch(pairs):
+    """
+    Check a set of (item_code, warehouse) pairs and email every monitored warehouse once
+    with all of its items that are at/below reorder level.
+    """
+    try:
+        with profile("check_batch"), outbox.collect():
+            _check_and_alert_low_stock_batch(pairs)
+    finally:
+        metrics.flush()
+
+
+def _check_and_alert_low_stock_batch(pairs):
+    pairs = list(dict.fromkeys((item_code, warehouse) for item_code, warehouse in pairs))
+    if not pairs:
+        return
+
+    # Let new stock movements for these pairs queue a fresh check from now on
+    frappe.cache().delete_value([_pending_check_key(*pair) for pair in pairs])
+
+    provider = FrappeProvider()
+    result = evaluate(pairs, provider, get_recovery_band(), get_critical_ratio())
+    with metrics.timed("snapshot"):
+        snapshot.update(pairs, result.low)
+    for stage, count in result.counts.items():
+        metrics.incr(f"check:{stage}", count)
+
+    emailed = _send_alerts(result.alerts) if result.alerts else set()
+    # An escalation nobody was emailed about keeps the previous state, so a later check alerts
+    provider.save_states([
+        change
+        for change in result.state_changes
+        if not change.alerted or (change.item_code, change.warehouse) in emailed
+    ])
+
+
+def _send_alerts(alerts):
+    """Email or digest every `Alert` that has a recipient; return the pairs that were queued."""
+    with metrics.timed("item_lookup"):
+        items = item_cache.get_many(list({row.item_code for alert in alerts for row in alert.items}))
+
+    items_by_monitored = {
+        alert.monitored_warehouse: [
+            _alert_payload(row, items.get(row.item_code) or frappe._dict()) for row in alert.items
+        ]
+        for alert in alerts
+    }
+
+    with metrics.timed("recipient_lookup"):
+        recipients = recipient_cache.get_many(list(items_by_monitored))
+    metrics.incr("check:no_recipient", sum(1 for name in items_by_monitored if not recipients.get(name)))
+
+    emailed = {
+        row.pair for alert in alerts if recipients.get(alert.monitored_warehouse) for row in alert.items
+    }
+    if get_digest_window():
+        digest = {}
+        for monitored_name, monitored_items in items_by_monitored.items():
+            if recipient := recipients.get(monitored_name):
+                digest.setdefault(recipient, []).extend((monitored_name, item) for item in monitored_items)
+        with metrics.timed("digest"):
+            add_to_digest(digest)
+        return emailed
+
+    for monitored_name, monitored_items in items_by_monitored.items():
+        recipient = recipients.get(monitored_name)
+        if recipient:
+            send_low_stock_email(monitored_items, recipient, monitored_name)
+    return emailed
+
+
+def _alert_payload(row, item):
+    """Email row for a `LowStock` decision; `item` carries item_name and description."""
+    return {
+        "item_code": row.item_code,
+        "item_name": item.item_name,
+        "description": item.description,
+        "warehouse": row.warehouse,
+        "projected_qty": row.projected_qty,
+        "reorder_level": row.reorder_level,
+        "reorder_qty": row.reorder_qty,
+        "shortfall": row.shortfall,
+        "state": row.state,
+    }
+
+
 def send_low_stock_email(items, recipient, warehouse_or_group):  
     """  
     Send a clean email listing only items at/below reorder level for the given warehouse.  
+
+    Inside `outbox.collect()` the email is queued with the rest of the job's emails.
     """  
-    template = """  
-    <h3>Low Stock Alert</h3>  
-    <p>Warehouse: {{ warehouse_or_group }}</p>  
-    <p>The following items are at or below reorder level:</p>  
-    <table border="1" cellpadding="5" cellspacing="0">  
-        <tr>  
-            <th>Item Code</th>  
-            <th>Item Name</th>  
-            <th>Warehouse</th>  
-            <th>Projected Qty</th>  
-            <th>Reorder Level</th>  
-        </tr>  
-        {% for item in items %}  
-        <tr>  
-            <td>{{ item.item_code }}</td>  
-            <td>{{ item.item_name }}</td>  
-            <td>{{ item.warehouse }}</td>  
-            <td>{{ item.projected_qty }}</td>  
-            <td>{{ item.reorder_level }}</td>  
-        </tr>  
-        {% endfor %}  
-    </table>  
-    """  
-    message = frappe.render_template(template, {"items": items, "warehouse": warehouse_or_group})  
-    print("SENDING EMAIL TO:", recipient)  
-    frappe.sendmail(  
-        recipients=recipient,  
-        subject=_("Low Stock Alert"),  
-        message=message,  
-        reference_doctype="User",  
-    )  
-    print("email sent", recipient)  
+    with metrics.timed("render"):
+        message = outbox.render(items, warehouse_or_group)
+    metrics.get_logger().debug("Sending low stock email for %s to %s (%s items)", warehouse_or_group, recipient, len(items))
+    outbox.add(recipient, _("Low Stock Alert"), message)
   
   
-def run_low_stock_alerts_fallback(debug=None):  
+
+def run_low_stock_alerts_fallback(debug=None, chunk_size=None):  
     """  
     Hourly fallback: scan all enabled leaf warehouses and send alerts for any items at/below reorder level.  
+
+    Rows are streamed in warehouse order, so each warehouse's email is rendered as soon as
+    its last row has been read and memory use does not grow with the catalogue; emails
+    reach the Email Queue in batches through `low_stock_alerts.outbox`.
+    With `fallback_shards` set, the scan is split across workers instead; see
+    `low_stock_alerts.shards`.
     """  
-    warehouses = frappe.get_all(  
-        "Warehouse", fields=["name", "email_id"], filters={"disabled": 0, "is_group": 0}  
-    )  
-    print("warehouses:", warehouses)  
-    if not warehouses:  
-        return  
-  
-    placeholders = ", ".join(["%s"] * len(warehouses))  
-    reorder_data = frappe.db.sql(  
-        f"""  
-        SELECT  
-            ir.parent as item_code,  
-            i.item_name,  
-            i.description,  
-            ir.warehouse,  
-            ir.warehouse_reorder_level,  
-            ir.warehouse_reorder_qty  
-        FROM `tabItem Reorder` ir  
-        INNER JOIN `tabItem` i ON i.name = ir.parent  
-        WHERE  
-            i.disabled = 0  
-            AND i.is_stock_item = 1  
-            AND (i.end_of_life IS NULL OR i.end_of_life > %s OR i.end_of_life = '0000-00-00')  
-            AND ir.warehouse IN ({placeholders})  
-        """,  
-        (nowdate(), *[w.name for w in warehouses]),  
-        as_dict=True,  
-    )  
-  
-    low_stock_by_warehouse = {}  
-    for d in reorder_data:  
-        projected_qty = flt(  
-            frappe.db.get_value("Bin", {"item_code": d.item_code, "warehouse": d.warehouse}, "projected_qty") or 0  
-        )  
-        if d.warehouse_reorder_level and projected_qty <= d.warehouse_reorder_level:  
-            low_stock_by_warehouse.setdefault(d.warehouse, []).append({  
-                "item_code": d.item_code,  
-                "item_name": d.item_name,  
-                "description": d.description,  
-                "warehouse": d.warehouse,  
-                "projected_qty": projected_qty,  
-                "reorder_level": d.warehouse_reorder_level,  
-                "reorder_qty": d.warehouse_reorder_qty,  
-            })  
-  
-    print("low_stock_by_warehouse:", low_stock_by_warehouse)  
-    for wh in warehouses:  
-        items = low_stock_by_warehouse.get(wh.name)  
-        print(f"Warehouse {wh.name}: email_id={wh.email_id}, items={items}")  
-        if items and wh.email_id:  
-            send_low_stock_email(items, wh.email_id, wh.name)
\ No newline at end of file
+    try:
+        if group_qty.rebuild():
+            # Release the group totals before the scan, so vouchers are not held up by it
+            frappe.db.commit()
+
+        if get_shard_count() > 1:
+            with profile("fallback_sharded"):
+                run_sharded_fallback(chunk_size=chunk_size)
+            return
+
+        with profile("fallback"), metrics.timed("fallback"), outbox.collect():
+            _send_fallback_emails(iter_low_stock_chunks(chunk_size))
+            sweep_recovered()
+            snapshot.sweep()
+    finally:
+        metrics.flush()
+
+
+def scan_low_stock(chunk_size=None, dry_run=False):
+    """
+    Run a full fallback scan in this process and return `[warehouse, email_id, items]` for
+    every warehouse that alerted. With `dry_run` nothing is emailed and no alert state is
+    saved, so the result is what the next scan would send. Used by `bench low-stock scan`.
+    """
+    groups = []
+    group_qty.rebuild()
+    with outbox.collect():
+        for warehouse, email_id, items in iter_fallback_groups(iter_low_stock_chunks(chunk_size), dry_run):
+            groups.append([warehouse, email_id, items])
+            if not dry_run:
+                _send_fallback_email(warehouse, email_id, items)
+
+        if not dry_run:
+            sweep_recovered()
+            snapshot.sweep()
+    return groups
+
+
+def run_low_stock_alerts_incremental(full=False):
+    """
+    Frequent fallback: re-evaluate only the pairs whose Bin or Item Reorder row changed since
+    the last run. A full scan runs when `full` is set or the last one is older than
+    `full_scan_interval_hours` (default 24).
+
+    Scheduled every few minutes; does nothing unless `incremental_fallback` is set in Low
+    Stock Alert Settings or a full scan is requested.
+    """
+    if not (full or cint(get_setting("incremental_fallback", 0))):
+        return
+
+    started_at = now_datetime()
+    last_full_scan = frappe.db.get_global(FULL_SCAN_KEY)
+    full_scan_due = not last_full_scan or get_datetime(last_full_scan) < add_to_date(
+        started_at, hours=-flt(get_setting("full_scan_interval_hours", 24))
+    )
+    watermark = frappe.db.get_global(WATERMARK_KEY)
+
+    if full or full_scan_due or not watermark:
+        run_low_stock_alerts_fallback()
+        frappe.db.set_global(FULL_SCAN_KEY, str(started_at))
+    else:
+        # Overlap with the previous run so rows committed late by long transactions are not missed
+        modified_since = add_to_date(get_datetime(watermark), seconds=-WATERMARK_OVERLAP)
+        try:
+            if group_qty.rebuild(missing_only=True):
+                frappe.db.commit()
+            with profile("fallback_incremental"), metrics.timed("fallback_incremental"), outbox.collect():
+                _send_fallback_emails(iter_low_stock_chunks(modified_since=modified_since))
+                sweep_recovered()
+                snapshot.sweep()
+        finally:
+            metrics.flush()
+
+    frappe.db.set_global(WATERMARK_KEY, str(started_at))
+
+
+def _send_fallback_emails(chunks):
+    """Send one email per warehouse for chunks of `LOW_STOCK_ROWS_QUERY` rows ordered by warehouse."""
+    for warehouse, email_id, items in iter_fallback_groups(chunks):
+        _send_fallback_email(warehouse, email_id, items)
+
+
+def iter_fallback_groups(chunks, dry_run=False, defer_alerts=False):
+    """
+    Yield `(warehouse, email_id, items)` for chunks of rows ordered by warehouse.
+
+    Each chunk is checked column-wise and split into warehouse runs by index. Low rows
+    that were already LOW or CRITICAL are dropped, so payload dicts are only built for
+    pairs whose alert state got worse. A warehouse spanning several chunks is yielded
+    once its last row has been read. With `dry_run` the state changes are not saved; with
+    `defer_alerts` only the escalations are not, and the caller saves them with
+    `save_alerted` once their email is queued.
+    """
+    warehouse, email_id, items = None, None, []
+    for chunk in chunks:
+        columns = list(zip(*chunk, strict=True))
+        low_indices, shortfall = evaluate_columns(columns[PROJECTED_QTY], columns[REORDER_LEVEL])
+        low_indices, shortfall, states = _escalated_rows(
+            chunk, low_indices, shortfall, save=not dry_run, save_alerts=not defer_alerts
+        )
+
+        for run_warehouse, start, end in group_runs(columns[WAREHOUSE]):
+            if run_warehouse != warehouse:
+                if items:
+                    yield warehouse, email_id, items
+                warehouse, email_id, items = run_warehouse, chunk[start][EMAIL_ID], []
+
+            first, last = bisect_left(low_indices, start), bisect_left(low_indices, end)
+            items.extend(
+                _fallback_payload(chunk[low_indices[i]], shortfall[i], states[i]) for i in range(first, last)
+            )
+
+    if items:
+        yield warehouse, email_id, items
+
+
+def _escalated_rows(chunk, low_indices, shortfall, save=True, save_alerts=True):
+    """
+    Keep the low rows of `chunk` whose alert state got worse and, with `save`, persist the
+    state changes, escalations only with `save_alerts`. Returns the kept indices, their
+    shortfall and their new state.
+    """
+    low = []
+    for i, short in zip(low_indices, shortfall, strict=True):
+        row = chunk[i]
+        low.append(
+            LowStock(
+                item_code=row[ITEM_CODE],
+                warehouse=row[WAREHOUSE],
+                projected_qty=row[PROJECTED_QTY],
+                reorder_level=row[REORDER_LEVEL],
+                reorder_qty=row[REORDER_QTY],
+                shortfall=short,
+            )
+        )
+    alert, changes = escalations(low, get_states([row.pair for row in low]), get_recovery_band(), get_critical_ratio())
+    if save:
+        # Only warehouses with an email get one; the other escalations keep their previous state
+        emailed = {row.pair for i, row in zip(low_indices, low, strict=True) if save_alerts and chunk[i][EMAIL_ID]}
+        save_states([c for c in changes if not c.alerted or (c.item_code, c.warehouse) in emailed])
+        with metrics.timed("snapshot"):
+            snapshot.save(low, {row[ITEM_CODE]: row[ITEM_NAME] for row in chunk})
+    metrics.incr("fallback:already_low", len(low) - len(alert))
+
+    state_by_pair = {row.pair: row.state for row in alert}
+    kept = [
+        (i, short, state_by_pair[row.pair])
+        for i, short, row in zip(low_indices, shortfall, low, strict=True)
+        if row.pair in state_by_pair
+    ]
+    return [i for i, _s, _st in kept], [short for _i, short, _st in kept], [state for _i, _s, state in kept]
+
+
+def save_alerted(groups):
+    """Save the escalations of `(warehouse, email_id, items)` groups whose email was queued."""
+    save_states(
+        [
+            StateChange(item["item_code"], item["warehouse"], item["state"], item["projected_qty"], True)
+            for _warehouse, email_id, items in groups
+            if email_id
+            for item in items
+        ]
+    )
+
+
+def _send_fallback_email(warehouse, email_id, items):
+    metrics.incr("fallback:low_rows", len(items))
+    if email_id:
+        send_low_stock_email(items, email_id, warehouse)
+
+
+def _fallback_payload(row, shortfall, state):
+    return {
+        "item_code": row[ITEM_CODE],
+        "item_name": row[ITEM_NAME],
+        "description": row[DESCRIPTION],
+        "warehouse": row[WAREHOUSE],
+        "projected_qty": row[PROJECTED_QTY],
+        "reorder_level": row[REORDER_LEVEL],
+        "reorder_qty": row[REORDER_QTY],
+        "shortfall": shortfall,
+        "state": state,
+    }
+
+
+LOW_STOCK_ROWS_QUERY = """
+    SELECT
+        ir.name,
+        ir.parent AS item_code,
+        i.item_name,
+        i.description,
+        ir.warehouse,
+        w.email_id,
+        {projected_qty} AS projected_qty,
+        {reorder_level} AS warehouse_reorder_level,
+        ir.warehouse_reorder_qty
+    FROM `tabItem Reorder` ir
+    INNER JOIN `tabItem` i ON i.name = ir.parent
+    INNER JOIN `tabWarehouse` w ON w.name = ir.warehouse
+    LEFT JOIN `tabBin` b ON b.item_code = ir.parent AND b.warehouse = ir.warehouse
+    {joins}
+    WHERE
+        ir.parenttype = 'Item'
+        AND i.disabled = 0
+        AND i.is_stock_item = 1
+        AND (i.end_of_life IS NULL OR i.end_of_life > %(today)s OR i.end_of_life = '0000-00-00')
+        AND w.disabled = 0
+        AND w.is_group = 0
+        AND ir.warehouse_reorder_level > 0
+        AND {projected_qty} <= {reorder_level}
+        {conditions}
+    ORDER BY ir.warehouse, ir.parent, ir.name
+"""
+
+
+def _low_stock_rows_query(conditions):
+    """
+    `LOW_STOCK_ROWS_QUERY` with `conditions`; the reorder level includes days of cover and
+    the projected qty is the group total for rows with a Warehouse Group, when set.
+    """
+    joins, reorder_level = reorder_level_sql("ir")
+    group_joins, projected_qty = group_qty.projected_qty_sql("ir", "b")
+    return LOW_STOCK_ROWS_QUERY.format(
+        conditions=conditions,
+        joins=joins + group_joins,
+        reorder_level=reorder_level,
+        projected_qty=projected_qty,
+    )
+
+
+LOW_STOCK_ROWS_FIELDS = (
+    "name",
+    "item_code",
+    "item_name",
+    "description",
+    "warehouse",
+    "email_id",
+    "projected_qty",
+    "warehouse_reorder_level",
+    "warehouse_reorder_qty",
+)
+(
+    NAME,
+    ITEM_CODE,
+    ITEM_NAME,
+    DESCRIPTION,
+    WAREHOUSE,
+    EMAIL_ID,
+    PROJECTED_QTY,
+    REORDER_LEVEL,
+    REORDER_QTY,
+) = range(len(LOW_STOCK_ROWS_FIELDS))
+
+
+def iter_low_stock_rows(chunk_size=None, modified_since=None):
+    """
+    Yield every (item, enabled leaf warehouse) reorder row whose projected qty is at/below
+    its reorder level, ordered by warehouse and item. Pairs without a Bin count as zero stock.
+    See `iter_low_stock_chunks` for the arguments.
+    """
+    for chunk in iter_low_stock_chunks(chunk_size, modified_since):
+        yield from (frappe._dict(zip(LOW_STOCK_ROWS_FIELDS, row, strict=True)) for row in chunk)
+
+
+def iter_low_stock_chunks(chunk_size=None, modified_since=None, shard=None):
+    """
+    Yield the rows of `iter_low_stock_rows` as lists of tuples in `LOW_STOCK_ROWS_FIELDS` order.
+
+    Rows are fetched `chunk_size` at a time (`low_stock_alerts_fallback_chunk_size` in site
+    config by default), each chunk starting after the last key of the previous one.
+    With `modified_since`, only pairs whose Bin or Item Reorder row changed after it are read.
+    `shard` limits a full scan to one company (`{"company": ...}`) or one lft/rgt range of
+    the warehouse tree (`{"lft": ..., "rgt": ...}`).
+    """
+    chunk_size = cint(chunk_size or get_setting("fallback_chunk_size", 5000))
+    if modified_since:
+        yield from _iter_low_stock_chunks_for_pairs(_get_touched_pairs(modified_since), chunk_size)
+        return
+
+    # The leading-column bound lets the scan start at the last key of the `install.add_indexes` index
+    conditions = """
+        AND ir.warehouse >= %(warehouse)s
+        AND (ir.warehouse, ir.parent, ir.name) > (%(warehouse)s, %(item_code)s, %(name)s)
+    """
+    if shard and shard.get("company"):
+        conditions += " AND w.company = %(company)s"
+    elif shard:
+        conditions += " AND w.lft >= %(lft)s AND w.rgt <= %(rgt)s"
+
+    last_key = ("", "", "")
+    while True:
+        rows = frappe.db.sql(
+            _low_stock_rows_query(conditions) + " LIMIT %(limit)s",
+            {
+                **(shard or {}),
+                **cover_params(),
+                "warehouse": last_key[0],
+                "item_code": last_key[1],
+                "name": last_key[2],
+                "limit": chunk_size,
+            },
+        )
+        if rows:
+            yield rows
+
+        if len(rows) < chunk_size:
+            return
+        last_key = (rows[-1][WAREHOUSE], rows[-1][ITEM_CODE], rows[-1][NAME])
+
+
+def _get_touched_pairs(modified_since):
+    """
+    Return sorted (warehouse, item_code) pairs whose Bin or Item Reorder changed after
+    `modified_since`, and with group thresholds the pairs whose group total changed.
+    """
+    group_totals = ""
+    if group_qty.is_enabled():
+        group_totals = f"""
+        UNION
+        SELECT ir.warehouse, ir.parent
+        FROM `tabItem Reorder` ir
+        INNER JOIN `tab{group_qty.DOCTYPE}` gq
+            ON gq.item_code = ir.parent AND gq.warehouse_group = ir.warehouse_group
+        WHERE ir.parenttype = 'Item' AND gq.modified > %(since)s
+        """
+    touched = frappe.db.sql(
+        f"""
+        SELECT warehouse, item_code FROM `tabBin` WHERE modified > %(since)s
+        UNION
+        SELECT warehouse, parent FROM `tabItem Reorder` WHERE parenttype = 'Item' AND modified > %(since)s
+        {group_totals}
+        """,
+        {"since": modified_since},
+    )
+    return sorted(tuple(pair) for pair in touched)
+
+
+def _iter_low_stock_chunks_for_pairs(pairs, chunk_size):
+    for start in range(0, len(pairs), chunk_size):
+        chunk = set(pairs[start : start + chunk_size])
+        rows = frappe.db.sql(
+            _low_stock_rows_query("AND ir.warehouse IN %(warehouses)s AND ir.parent IN %(items)s"),
+            {
+                **cover_params(),
+                "warehouses": tuple({warehouse for warehouse, _i in chunk}),
+                "items": tuple({item_code for _w, item_code in chunk}),
+            },
+        )
+        rows = [row for row in rows if (row[WAREHOUSE], row[ITEM_CODE]) in chunk]
+        if rows:
+            yield rows
+
+
+@frappe.whitelist(methods=["GET", "POST"])
+def get_low_stock_status(warehouses: list[str] | str, etag: str | None = None) -> dict | None:
+    """
+    Every LOW and CRITICAL item of `warehouses` (leaves or groups) in one call, for
+    dashboards that poll. Quantities are those of each pair's last state change.
+
+    The response carries an ETag that changes only when an alert state or the warehouse
+    tree changes. A poll that sends it back, as `If-None-Match` or `etag`, gets an empty
+    304 for two Redis reads; other polls of the same user for the same warehouses are
+    served from Redis until it changes. Only warehouses the user may read are included.
+    """
+    frappe.has_permission("Low Stock Alert State", "read", throw=True)
+
+    if isinstance(warehouses, str):
+        warehouses = frappe.parse_json(warehouses) if warehouses.lstrip().startswith("[") else [warehouses]
+    warehouses = sorted(set(warehouses))
+
+    # Read the versions before the states, so a change committed in between only costs a refresh.
+    # User permissions differ per user, so the response does too
+    digest = hashlib.sha1("\x1f".join([frappe.session.user, *warehouses]).encode()).hexdigest()[:16]
+    current = f'"{get_state_version()}-{get_tree_version()}-{digest}"'
+    _set_etag(current)
+    if _etag_matches(current, etag) or _etag_matches(current, frappe.get_request_header("If-None-Match")):
+        metrics.incr("status:not_modified")
+        frappe.response["http_status_code"] = 304
+        return None
+
+    cache = frappe.cache()
+    cache_key = f"{STATUS_CACHE_KEY}:{current}"
+    status = cache.get_value(cache_key)
+    if status is None:
+        metrics.incr("status:miss")
+        bounds = get_warehouse_tree().bounds
+        missing = [warehouse for warehouse in warehouses if warehouse not in bounds]
+        if missing:
+            frappe.throw(_("Warehouse {0} not found").format(", ".join(missing)), frappe.DoesNotExistError)
+
+        readable = _readable_warehouses(warehouses)
+        denied = [warehouse for warehouse in warehouses if warehouse not in readable]
+        if denied:
+            frappe.throw(
+                _("Not permitted to read Warehouse {0}").format(", ".join(denied)), frappe.PermissionError
+            )
+
+        items = get_states_in([bounds[warehouse] for warehouse in warehouses])
+        # A user permission on a group need not cover every warehouse below it
+        readable = _readable_warehouses({row.warehouse for row in items})
+        status = {"etag": current, "items": [row for row in items if row.warehouse in readable]}
+        cache.set_value(cache_key, status, expires_in_sec=STATUS_CACHE_TTL)
+    return status
+
+
+def _readable_warehouses(warehouses):
+    """The subset of `warehouses` the session user may read, user permissions applied."""
+    if not warehouses:
+        return set()
+    filters = {"name": ["in", list(warehouses)]}
+    return set(frappe.get_list("Warehouse", filters=filters, pluck="name", limit_page_length=0))
+
+
+def _etag_matches(current, header):
+    """Whether an `If-None-Match` style list of tags contains `current`."""
+    if not header:
+        return False
+    tags = {tag.strip().removeprefix("W/") for tag in header.split(",")}
+    return current in tags or "*" in tags
+
+
+def _set_etag(etag):
+    headers = getattr(frappe.local, "response_headers", None)
+    if headers is not None:
+        headers["ETag"] = etag
@@ -0,0 +1,123 @@
+"""
+Bench commands.
+
+    bench --site all low-stock scan [--dry-run] [--workers N] [--json]
+
+`scan` runs the fallback scan on every selected site, `--workers` sites at a time in
+separate processes, and prints the rows each site alerted on with its timing. With
+`--dry-run` no email is queued and no alert state is written: the rows are what the next
+scan would send.
+"""
+
+import json
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import click
+import frappe
+from frappe.commands import pass_context
+from frappe.exceptions import SiteNotSpecifiedError
+
+
+@click.group("low-stock")
+def low_stock():
+	"""Low stock alerts"""
+
+
+@low_stock.command("scan")
+@click.option(
+	"--dry-run", is_flag=True, help="Report what would alert without queueing emails or saving state"
+)
+@click.option("--workers", type=int, default=1, show_default=True, help="Sites scanned in parallel")
+@click.option("--chunk-size", type=int, help="Rows per query, defaults to the fallback chunk size setting")
+@click.option("--json", "as_json", is_flag=True, help="Print the report as JSON")
+@pass_context
+def scan(context, dry_run=False, workers=1, chunk_size=None, as_json=False):
+	"""Run the low-stock fallback scan on the selected sites."""
+	sites = list(context.sites or [])
+	if not sites:
+		raise SiteNotSpecifiedError
+
+	start = time.perf_counter()
+	reports = {}
+	with ProcessPoolExecutor(max_workers=max(min(workers, len(sites)), 1)) as pool:
+		futures = {pool.submit(_scan_site, site, dry_run, chunk_size): site for site in sites}
+		for future in as_completed(futures):
+			reports[futures[future]] = future.result()
+
+	report = {
+		"dry_run": dry_run,
+		"elapsed_ms": round((time.perf_counter() - start) * 1000, 1),
+		"sites": {site: reports[site] for site in sites},
+	}
+	if as_json:
+		click.echo(json.dumps(report, indent=2, default=str))
+	else:
+		_print_report(report)
+
+	if any(site_report.get("error") for site_report in reports.values()):
+		sys.exit(1)
+
+
+def _scan_site(site, dry_run, chunk_size):
+	from low_stock_alerts import metrics
+	from low_stock_alerts.api import scan_low_stock
+
+	start = time.perf_counter()
+	frappe.init(site=site)
+	try:
+		frappe.connect()
+		groups = scan_low_stock(chunk_size, dry_run)
+		if dry_run:
+			frappe.db.rollback()
+		else:
+			frappe.db.commit()
+
+		rows = [{**item, "email_id": email_id} for _warehouse, email_id, items in groups for item in items]
+		return {
+			"low_rows": len(rows),
+			"emails": 0 if dry_run else sum(1 for _warehouse, email_id, _items in groups if email_id),
+			"elapsed_ms": round((time.perf_counter() - start) * 1000, 1),
+			"rows": rows,
+		}
+	except Exception as e:
+		if frappe.db:
+			frappe.db.rollback()
+		return {
+			"error": str(e) or e.__class__.__name__,
+			"traceback": frappe.get_traceback(),
+			"elapsed_ms": round((time.perf_counter() - start) * 1000, 1),
+		}
+	finally:
+		# A dry run's counters describe emails and states that were never written
+		if frappe.db and not dry_run:
+			metrics.flush()
+		else:
+			metrics.discard()
+		frappe.destroy()
+
+
+def _print_report(report):
+	mode = " (dry run)" if report["dry_run"] else ""
+	for site, site_report in report["sites"].items():
+		if site_report.get("error"):
+			click.secho(
+				f"{site}: failed after {site_report['elapsed_ms']} ms: {site_report['error']}", fg="red"
+			)
+			continue
+
+		click.echo(
+			f"{site}: {site_report['low_rows']} low rows, {site_report['emails']} emails"
+			f" in {site_report['elapsed_ms']} ms{mode}"
+		)
+		for row in site_report["rows"]:
+			click.echo(
+				f"  {row['warehouse']}\t{row['item_code']}\t{row['state']}"
+				f"\tprojected {row['projected_qty']}\treorder level {row['reorder_level']}"
+			)
+
+	click.echo(f"{len(report['sites'])} sites in {report['elapsed_ms']} ms")
+
+
+commands = [low_stock]
@@ -0,0 +1,170 @@
+"""
+Exponentially weighted consumption rate per (item, warehouse), for days-of-cover alerts.
+
+With `cover_horizon_days` set in Low Stock Alert Settings, every submitted Stock Ledger
+Entry that takes stock out of a monitored pair folds its qty into the pair's row in
+`Low Stock Consumption Rate`: one row per pair, updated in O(1) from `actual_qty` and
+`posting_date`, never from SLE history. Entries are collected per voucher and written
+with one read and one upsert right before the transaction commits. Cancellation entries
+take back what the original added.
+
+A pair then also counts as low once its projected qty covers fewer days than the
+horizon: its effective reorder level is `max(reorder level, rate x horizon)`, see
+`engine.cover_level`. The static reorder level still decides which pairs are monitored.
+"""
+
+import frappe
+from frappe.utils import flt, getdate, now, nowdate
+
+from low_stock_alerts import metrics
+from low_stock_alerts.engine import add_consumption, decayed_rate
+from low_stock_alerts.settings import get_setting
+
+DOCTYPE = "Low Stock Consumption Rate"
+WRITE_CHUNK_SIZE = 1000
+
+
+def get_cover_horizon():
+	"""Days of consumption the projected qty must cover; 0 turns days-of-cover alerts off."""
+	return flt(get_setting("cover_horizon_days", 0))
+
+
+def get_half_life():
+	"""Days after which a unit consumed counts half as much towards the rate."""
+	return flt(get_setting("consumption_half_life_days", 7)) or 7
+
+
+def record(doc):
+	"""Collect the stock a submitted SLE took out; called from `api.on_sle_update`."""
+	if get_cover_horizon() <= 0:
+		return
+
+	# Outflows count, and the reversing entries of a cancellation take them back
+	actual_qty = flt(doc.actual_qty)
+	if (actual_qty < 0 and not doc.is_cancelled) or (actual_qty > 0 and doc.is_cancelled):
+		pending = frappe.flags.low_stock_consumption
+		if pending is None:
+			pending = frappe.flags.low_stock_consumption = {}
+			frappe.db.before_commit.add(flush)
+			frappe.db.after_rollback.add(_clear)
+
+		entries = pending.setdefault((doc.item_code, doc.warehouse), [])
+		entries.append((-actual_qty, getdate(doc.posting_date)))
+
+
+def flush():
+	"""Fold the voucher's outflows into the stored rates of monitored pairs."""
+	from low_stock_alerts.admission import admit
+
+	pending = frappe.flags.low_stock_consumption
+	_clear()
+	if not pending:
+		return
+
+	pairs = admit(pending)
+	if not pairs:
+		return
+
+	half_life = get_half_life()
+	with metrics.timed("consumption"):
+		stored = _get_stored(pairs, for_update=True)
+		rows = []
+		for pair in pairs:
+			rate, last_date = stored.get(pair, (0, None))
+			for qty, posting_date in sorted(pending[pair], key=lambda entry: entry[1]):
+				rate, last_date = add_consumption(rate, last_date, qty, posting_date, half_life)
+			rows.append((*pair, rate, last_date))
+		_upsert(rows)
+	metrics.incr("consumption:pairs", len(rows))
+
+
+def get_rates(pairs, today=None):
+	"""Return {(item_code, warehouse): rate per day as of `today`} for pairs with a rate."""
+	today = getdate(today or nowdate())
+	half_life = get_half_life()
+	return {
+		pair: decayed_rate(flt(rate), (today - getdate(last_date)).days, half_life)
+		for pair, (rate, last_date) in _get_stored(pairs).items()
+	}
+
+
+def reorder_level_sql(alias="ir"):
+	"""
+	Return `(join, level)` for queries over Item Reorder rows `alias`: a JOIN on the rate
+	table and the effective reorder level as a SQL expression. Pass `cover_params()` with
+	the query. Without a horizon the level is the Item Reorder level and there is no join.
+	"""
+	level = f"{alias}.warehouse_reorder_level"
+	if get_cover_horizon() <= 0:
+		return "", level
+
+	join = f"""
+        LEFT JOIN `tab{DOCTYPE}` cr ON cr.item_code = {alias}.parent AND cr.warehouse = {alias}.warehouse
+    """
+	rate = "cr.rate * POW(0.5, DATEDIFF(%(today)s, cr.last_date) / %(half_life)s)"
+	return join, f"GREATEST({level}, IFNULL({rate}, 0) * %(horizon)s)"
+
+
+def cover_params():
+	return {"today": nowdate(), "half_life": get_half_life(), "horizon": get_cover_horizon()}
+
+
+def _get_stored(pairs, for_update=False):
+	pairs = set(pairs)
+	if not pairs:
+		return {}
+
+	rows = frappe.db.sql(
+		f"""
+        SELECT item_code, warehouse, rate, last_date
+        FROM `tab{DOCTYPE}`
+        WHERE item_code IN %(items)s AND warehouse IN %(warehouses)s
+        {"FOR UPDATE" if for_update else ""}
+        """,
+		{
+			"items": tuple({item_code for item_code, _w in pairs}),
+			"warehouses": tuple({warehouse for _i, warehouse in pairs}),
+		},
+	)
+	return {
+		(item_code, warehouse): (flt(rate), getdate(last_date))
+		for item_code, warehouse, rate, last_date in rows
+		if (item_code, warehouse) in pairs
+	}
+
+
+def _upsert(rows):
+	timestamp, user = now(), frappe.session.user
+	for start in range(0, len(rows), WRITE_CHUNK_SIZE):
+		chunk = rows[start : start + WRITE_CHUNK_SIZE]
+		values = []
+		for item_code, warehouse, rate, last_date in chunk:
+			values.extend(
+				(
+					frappe.generate_hash(length=10),
+					timestamp,
+					timestamp,
+					user,
+					user,
+					item_code,
+					warehouse,
+					rate,
+					last_date,
+				)
+			)
+
+		frappe.db.sql(
+			f"""
+            INSERT INTO `tab{DOCTYPE}` (
+                name, creation, modified, owner, modified_by, item_code, warehouse, rate, last_date
+            )
+            VALUES {", ".join(["(%s, %s, %s, %s, %s, %s, %s, %s, %s)"] * len(chunk))}
+            ON DUPLICATE KEY UPDATE
+                rate = VALUES(rate), last_date = VALUES(last_date), modified = VALUES(modified)
+            """,
+			values,
+		)
+
+
+def _clear():
+	frappe.flags.low_stock_consumption = None
@@ -0,0 +1,114 @@
+"""
+Per-recipient digest of low-stock alerts.
+
+When `digest_window` (seconds) is set in Low Stock Alert Settings, event-driven alerts
+are buffered in Redis instead of being emailed right away. The first hit for a recipient
+opens a window; once it has elapsed the scheduler sends everything buffered for that
+recipient as one email. A flush that fails puts what it took back, due right away;
+buffers nothing flushes (e.g. after Redis lost the due set) expire a day after the
+last alert added to them.
+"""
+
+import json
+import time
+
+import frappe
+from frappe.utils import cint
+
+from low_stock_alerts import metrics, outbox
+from low_stock_alerts.settings import get_setting
+
+DUE_KEY = "low_stock_alerts:digest:due"
+# Seconds a buffer outlives its window
+BUFFER_TTL = 24 * 60 * 60
+
+
+def get_digest_window():
+	return cint(get_setting("digest_window", 0))
+
+
+def add_to_digest(items_by_recipient):
+	"""Buffer {recipient: [(monitored_warehouse, item_payload), ...]} in one round trip."""
+	if not items_by_recipient:
+		return
+
+	cache = frappe.cache()
+	window = get_digest_window()
+	due_at = time.time() + window
+	pipe = cache.pipeline()
+	for recipient, entries in items_by_recipient.items():
+		buffer_key = cache.make_key(_buffer_key(recipient))
+		pipe.hset(
+			buffer_key,
+			mapping={
+				# Latest payload per (monitored warehouse, item, leaf) wins within a window
+				"\x1f".join((monitored, item["item_code"], item["warehouse"])): json.dumps(
+					{**item, "monitored_warehouse": monitored}, default=str
+				)
+				for monitored, item in entries
+			},
+		)
+		pipe.expire(buffer_key, window + BUFFER_TTL)
+		pipe.zadd(cache.make_key(DUE_KEY), {recipient: due_at}, nx=True)
+	pipe.execute()
+
+
+def flush_due_digests():
+	"""Scheduler job: email every recipient whose digest window has elapsed."""
+	from low_stock_alerts.api import send_low_stock_email
+
+	cache = frappe.cache()
+	due = cache.zrangebyscore(cache.make_key(DUE_KEY), "-inf", time.time())
+	taken = {}
+	try:
+		with outbox.collect():
+			for recipient in due:
+				recipient = frappe.safe_decode(recipient)
+				taken[recipient] = _take(cache, recipient)
+				items = [json.loads(value) for value in taken[recipient].values()]
+				if not items:
+					continue
+
+				monitored = sorted({item.pop("monitored_warehouse") for item in items})
+				items.sort(key=lambda item: (item["warehouse"], item["item_code"]))
+				send_low_stock_email(items, recipient, ", ".join(monitored))
+				metrics.incr("digest:sent")
+	except Exception:
+		# Nothing was queued: the job's rollback drops the Email Queue rows written so far
+		_put_back(cache, taken)
+		raise
+	finally:
+		metrics.flush()
+
+
+def _take(cache, recipient):
+	"""Atomically read and clear the buffer of `recipient`; return its raw fields."""
+	buffer_key = cache.make_key(_buffer_key(recipient))
+	pipe = cache.pipeline(transaction=True)
+	pipe.hgetall(buffer_key)
+	pipe.delete(buffer_key)
+	pipe.zrem(cache.make_key(DUE_KEY), recipient)
+	buffered, _deleted, _removed = pipe.execute()
+	return buffered or {}
+
+
+def _put_back(cache, taken):
+	"""Buffer `taken` again, due right away. Entries added since the take keep their newer payload."""
+	taken = {recipient: buffered for recipient, buffered in taken.items() if buffered}
+	if not taken:
+		return
+
+	ttl = get_digest_window() + BUFFER_TTL
+	pipe = cache.pipeline()
+	for recipient, buffered in taken.items():
+		buffer_key = cache.make_key(_buffer_key(recipient))
+		for field, value in buffered.items():
+			pipe.hsetnx(buffer_key, field, value)
+		pipe.expire(buffer_key, ttl)
+		pipe.zadd(cache.make_key(DUE_KEY), {recipient: time.time()})
+	pipe.execute()
+	metrics.incr("digest:put_back", len(taken))
+
+
+def _buffer_key(recipient):
+	return f"low_stock_alerts:digest:{recipient}"
@@ -0,0 +1,312 @@
+"""
+Low-stock decision engine, independent of Frappe.
+
+`evaluate` turns snapshots of reorder levels, projected quantities, the warehouse
+hierarchy and the alert throttle into `Alert` decisions: which monitored warehouse
+should hear about which items. It never reads the database or sends anything itself;
+the snapshots come from a provider, `low_stock_alerts.providers.FrappeProvider` on a
+site and `SnapshotProvider` over plain dicts in tests and benchmarks.
+
+Each pair also has an alert state, OK, LOW or CRITICAL, and only a change for the
+worse produces an alert. A pair that is already LOW stays quiet until it becomes
+CRITICAL or first recovers above its reorder level plus the recovery band.
+
+Threshold checks run column-wise (`evaluate_columns`). Large batches are vectorised
+with NumPy when it is installed; otherwise the same results come from plain Python.
+
+A pair's reorder level can be raised to cover a horizon of days at its exponentially
+weighted consumption rate (`add_consumption`, `cover_level`).
+"""
+
+import math
+from collections import namedtuple
+from dataclasses import dataclass, field, replace
+
+try:
+	import numpy
+except ImportError:
+	numpy = None
+
+# Below this many rows building the arrays costs more than the loop they replace
+VECTORISE_MIN_ROWS = 512
+
+OK, LOW, CRITICAL = "OK", "LOW", "CRITICAL"
+SEVERITY = {OK: 0, LOW: 1, CRITICAL: 2}
+
+ReorderLevel = namedtuple("ReorderLevel", ["level", "qty"])
+AlertState = namedtuple("AlertState", ["state", "last_alerted_qty", "last_alerted_at"], defaults=(None, None))
+
+
+@dataclass(frozen=True)
+class LowStock:
+	item_code: str
+	warehouse: str
+	projected_qty: float
+	reorder_level: float
+	reorder_qty: float
+	shortfall: float
+	state: str = LOW
+
+	@property
+	def pair(self):
+		return (self.item_code, self.warehouse)
+
+
+@dataclass
+class Alert:
+	monitored_warehouse: str
+	items: list
+
+
+@dataclass(frozen=True)
+class StateChange:
+	item_code: str
+	warehouse: str
+	state: str
+	projected_qty: float
+	# An escalation that alerts; callers save it only once its email is queued
+	alerted: bool
+
+
+@dataclass
+class Evaluation:
+	alerts: list = field(default_factory=list)
+	counts: dict = field(default_factory=dict)
+	state_changes: list = field(default_factory=list)
+	# Every pair at or below its reorder level, alerting or not
+	low: list = field(default_factory=list)
+
+
+class SnapshotProvider:
+	"""
+	Provider over in-memory snapshots.
+
+	`reorder_levels` maps (item_code, warehouse) to `ReorderLevel`, `projected_qty` maps the
+	same pairs to a number, `monitored_by_leaf` maps a leaf warehouse to the monitored
+	warehouses covering it, `states` maps pairs that are not OK to their `AlertState` and
+	`throttled` holds pairs that alerted too recently.
+	Other providers implement the same methods against their own storage.
+	"""
+
+	def __init__(
+		self, reorder_levels=None, projected_qty=None, monitored_by_leaf=None, states=None, throttled=()
+	):
+		self.reorder_levels = reorder_levels or {}
+		self.projected_qty = projected_qty or {}
+		self.monitored_by_leaf = monitored_by_leaf or {}
+		self.states = states or {}
+		self.throttled = set(throttled)
+
+	def get_reorder_levels(self, pairs):
+		return {pair: self.reorder_levels[pair] for pair in pairs if pair in self.reorder_levels}
+
+	def get_projected_qty(self, pairs):
+		return {pair: self.projected_qty[pair] for pair in pairs if pair in self.projected_qty}
+
+	def get_states(self, pairs):
+		return {pair: self.states[pair] for pair in pairs if pair in self.states}
+
+	def save_states(self, changes):
+		for change in changes:
+			pair = (change.item_code, change.warehouse)
+			if change.state == OK:
+				self.states.pop(pair, None)
+			else:
+				self.states[pair] = AlertState(change.state)
+
+	def get_monitored(self, leaves):
+		return {leaf: self.monitored_by_leaf.get(leaf) or [leaf] for leaf in leaves}
+
+	def claim(self, low, monitored_by_leaf):
+		"""Return the entries of `low` that may alert now."""
+		return [row for row in low if row.pair not in self.throttled]
+
+
+def classify(projected_qty, reorder_level, previous=OK, recovery_band=0, critical_ratio=0):
+	"""
+	Alert state of a pair. CRITICAL at or below `critical_ratio` x reorder level (a stock-out
+	by default), LOW at or below the reorder level. A pair that is not OK only returns to
+	OK above `reorder_level x (1 + recovery_band)`; inside the band it stays LOW.
+	"""
+	if not reorder_level or reorder_level <= 0:
+		return OK
+	if projected_qty <= reorder_level * critical_ratio:
+		return CRITICAL
+	if projected_qty <= reorder_level:
+		return LOW
+	if previous != OK and projected_qty <= reorder_level * (1 + recovery_band):
+		return LOW
+	return OK
+
+
+def decayed_rate(rate, days, half_life_days):
+	"""Consumption rate `days` after it was last updated, halving every `half_life_days`."""
+	if not rate or rate <= 0:
+		return 0
+	return rate * 0.5 ** (max(days, 0) / half_life_days)
+
+
+def add_consumption(rate, last_date, qty, posting_date, half_life_days):
+	"""
+	Fold `qty` taken out on `posting_date` into a rate per day last updated on `last_date`.
+	Return the new `(rate, last_date)`.
+
+	Each unit adds `ln 2 / half_life_days` to the rate and its weight halves every
+	`half_life_days`, so a steady daily consumption converges to roughly itself. Entries
+	posted before `last_date` are weighted by their age; negative `qty` reverses an entry.
+	"""
+	weight = qty * math.log(2) / half_life_days
+	if last_date is None:
+		return max(weight, 0), posting_date
+
+	age = (posting_date - last_date).days
+	if age >= 0:
+		return max(decayed_rate(rate, age, half_life_days) + weight, 0), posting_date
+	return max((rate or 0) + weight * 0.5 ** (-age / half_life_days), 0), last_date
+
+
+def cover_level(reorder_level, rate, horizon_days):
+	"""Reorder level raised to the stock `horizon_days` of consumption at `rate` would use."""
+	if not horizon_days or not rate or horizon_days <= 0:
+		return reorder_level
+	return max(reorder_level, rate * horizon_days)
+
+
+def escalations(low, states, recovery_band=0, critical_ratio=0):
+	"""
+	Split `low` (`LowStock` rows) by their previous `states`. Return `(alert, changes)`:
+	the rows whose state got worse, with `state` set, and a `StateChange` for every row
+	whose state changed at all.
+	"""
+	alert, changes = [], []
+	for row in low:
+		previous = states[row.pair].state if row.pair in states else OK
+		state = classify(row.projected_qty, row.reorder_level, previous, recovery_band, critical_ratio)
+		if state == previous:
+			continue
+
+		worse = SEVERITY[state] > SEVERITY[previous]
+		changes.append(StateChange(row.item_code, row.warehouse, state, row.projected_qty, worse))
+		if worse:
+			alert.append(replace(row, state=state))
+	return alert, changes
+
+
+def evaluate_columns(projected_qty, reorder_levels):
+	"""
+	Threshold check over two columns of equal length.
+
+	Return `(indices, shortfall)`: the ascending positions whose reorder level is positive
+	and projected qty at or below it, and `reorder_level - projected_qty` at each of them.
+	"""
+	if numpy is not None and len(projected_qty) >= VECTORISE_MIN_ROWS:
+		projected = numpy.asarray(projected_qty, dtype=float)
+		levels = numpy.asarray(reorder_levels, dtype=float)
+		indices = numpy.flatnonzero((levels > 0) & (projected <= levels))
+		return indices.tolist(), (levels[indices] - projected[indices]).tolist()
+
+	indices = [
+		i
+		for i, (projected, level) in enumerate(zip(projected_qty, reorder_levels, strict=True))
+		if 0 < level and projected <= level
+	]
+	return indices, [reorder_levels[i] - projected_qty[i] for i in indices]
+
+
+def group_runs(keys):
+	"""Return `(key, start, end)` for each run of equal consecutive values in `keys`."""
+	if not keys:
+		return []
+
+	if numpy is not None and len(keys) >= VECTORISE_MIN_ROWS:
+		column = numpy.asarray(keys, dtype=object)
+		starts = [0, *(numpy.flatnonzero(column[1:] != column[:-1]) + 1).tolist()]
+	else:
+		starts = [0, *(i for i in range(1, len(keys)) if keys[i] != keys[i - 1])]
+
+	ends = [*starts[1:], len(keys)]
+	return [(keys[start], start, end) for start, end in zip(starts, ends, strict=True)]
+
+
+def find_low_stock(pairs, reorder_levels, projected_qty):
+	"""
+	Return a `LowStock` for every pair with a positive reorder level whose projected qty
+	is at or below it. Pairs missing from `projected_qty` count as zero stock.
+	"""
+	pairs = [pair for pair in pairs if pair in reorder_levels]
+	levels = [reorder_levels[pair].level or 0 for pair in pairs]
+	projected = [projected_qty.get(pair) or 0 for pair in pairs]
+
+	indices, shortfall = evaluate_columns(projected, levels)
+	return [
+		LowStock(*pairs[i], projected[i], levels[i], reorder_levels[pairs[i]].qty, short)
+		for i, short in zip(indices, shortfall, strict=True)
+	]
+
+
+def group_by_monitored(low, monitored_by_leaf):
+	"""One `Alert` per monitored warehouse, in the order the warehouses first appear."""
+	alerts = {}
+	for row in low:
+		for monitored in monitored_by_leaf.get(row.warehouse) or [row.warehouse]:
+			if monitored not in alerts:
+				alerts[monitored] = Alert(monitored, [])
+			alerts[monitored].items.append(row)
+	return list(alerts.values())
+
+
+def evaluate(pairs, provider, recovery_band=0, critical_ratio=0):
+	"""
+	Decide which monitored warehouses to alert for `pairs` of (item_code, warehouse).
+
+	Snapshots are requested from `provider` stage by stage and only for the pairs still
+	in play, so a batch where nothing got worse never reaches the hierarchy, throttle or
+	email stages. `counts` records how many pairs dropped out at each stage,
+	`state_changes` lists the transitions for the caller to persist and `low` every pair
+	that is at or below its reorder level. A throttled escalation has no state change:
+	the pair keeps its previous state and alerts on a check after the window.
+	"""
+	pairs = list(dict.fromkeys(pairs))
+	result = Evaluation(counts={"pairs": len(pairs)})
+	if not pairs:
+		return result
+
+	reorder_levels = provider.get_reorder_levels(pairs)
+	with_level = [pair for pair in pairs if pair in reorder_levels and (reorder_levels[pair].level or 0) > 0]
+	result.counts["no_reorder_level"] = len(pairs) - len(with_level)
+	if not with_level:
+		return result
+
+	projected_qty = provider.get_projected_qty(with_level)
+	states = provider.get_states(with_level)
+	low = result.low = find_low_stock(with_level, reorder_levels, projected_qty)
+	result.counts["above_reorder_level"] = len(with_level) - len(low)
+
+	# Pairs above their reorder level that were LOW or CRITICAL may have recovered
+	low_pairs = {row.pair for row in low}
+	for pair, previous in states.items():
+		if pair in low_pairs:
+			continue
+		projected = projected_qty.get(pair) or 0
+		state = classify(projected, reorder_levels[pair].level, previous.state, recovery_band, critical_ratio)
+		if state != previous.state:
+			result.state_changes.append(StateChange(*pair, state, projected, False))
+
+	low, changes = escalations(low, states, recovery_band, critical_ratio)
+	result.state_changes.extend(changes)
+	result.counts["already_low"] = len(low_pairs) - len(low)
+	if not low:
+		return result
+
+	monitored_by_leaf = provider.get_monitored(list(dict.fromkeys(row.warehouse for row in low)))
+	claimed = provider.claim(low, monitored_by_leaf)
+	result.counts["throttled"] = len(low) - len(claimed)
+	claimed_pairs = {row.pair for row in claimed}
+	result.state_changes = [
+		change
+		for change in result.state_changes
+		if not change.alerted or (change.item_code, change.warehouse) in claimed_pairs
+	]
+
+	result.alerts = group_by_monitored(claimed, monitored_by_leaf)
+	return result
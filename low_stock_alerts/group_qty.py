@@ -0,0 +1,296 @@
+"""
+Group-level reorder thresholds: an item's projected qty summed over a warehouse group.
+
+An Item Reorder row may name a Warehouse Group ("Check in (group)" in ERPNext). With
+`group_thresholds` set in Low Stock Alert Settings such a row is checked against the
+item's total projected qty over every warehouse under the group instead of its own
+warehouse's, so a leaf that runs low while the group as a whole is stocked stays quiet.
+
+Totals are kept in `Low Stock Group Qty`, one row per (item, group), each summed with
+one query over the Bins inside the group's lft/rgt range. A voucher's Stock Ledger
+Entries mark the (item, warehouse) pairs it moved; right before the transaction commits
+the totals of the groups holding them are summed again from Bin, so they follow projected
+qty exactly, reserved and ordered qty the voucher released included. A total that went
+down queues a check of the rows checked against it. A check reads one row per group and
+never loops over the group's leaves.
+
+Projected qty also moves without any SLE (a Sales Order reserving stock, a Purchase
+Order on order). `rebuild_group_totals` sums every total again every hour while group
+thresholds are on, and full fallback scans do the same before reading.
+"""
+
+import frappe
+from frappe.utils import cint, flt, now
+
+from low_stock_alerts import metrics
+from low_stock_alerts.lookup_cache import group_reorder_cache, reorder_cache
+from low_stock_alerts.settings import get_setting
+from low_stock_alerts.warehouse_tree import get_warehouse_tree
+
+DOCTYPE = "Low Stock Group Qty"
+WRITE_CHUNK_SIZE = 1000
+
+GROUP_TOTALS_QUERY = """
+    SELECT t.item_code, t.warehouse_group, IFNULL(SUM(b.projected_qty), 0)
+    FROM (
+        SELECT DISTINCT parent AS item_code, warehouse_group
+        FROM `tabItem Reorder`
+        WHERE parenttype = 'Item' AND IFNULL(warehouse_group, '') != '' {conditions}
+    ) t
+    INNER JOIN `tabWarehouse` g ON g.name = t.warehouse_group
+    LEFT JOIN (`tabBin` b INNER JOIN `tabWarehouse` w ON w.name = b.warehouse)
+        ON b.item_code = t.item_code AND w.lft >= g.lft AND w.rgt <= g.rgt
+    GROUP BY t.item_code, t.warehouse_group
+"""
+
+
+def is_enabled():
+	return bool(cint(get_setting("group_thresholds", 0)))
+
+
+def record(doc):
+	"""Mark the pair a submitted SLE moved; called from `api.on_sle_update`."""
+	if not is_enabled():
+		return
+
+	pending = frappe.flags.low_stock_group_qty
+	if pending is None:
+		pending = frappe.flags.low_stock_group_qty = {}
+		frappe.db.before_commit.add(flush)
+		frappe.db.after_rollback.add(_clear)
+
+	pending[(doc.item_code, doc.warehouse)] = None
+
+
+def flush():
+	"""Sum the totals of the groups holding the voucher's pairs again, now that Bin is updated."""
+	pending = frappe.flags.low_stock_group_qty
+	_clear()
+	if not pending:
+		return
+
+	rows_by_item = group_reorder_cache.get_many(list({item_code for item_code, _w in pending}))
+	bounds = get_warehouse_tree().bounds
+	keys = {
+		(item_code, group)
+		for item_code, warehouse in pending
+		for _w, group in rows_by_item.get(item_code) or ()
+		if _contains(bounds, group, warehouse)
+	}
+	if not keys:
+		return
+
+	with metrics.timed("group_qty"):
+		stored = _get_stored(keys, for_update=True)
+		totals = _sum_totals(keys)
+		_upsert(list(totals.items()))
+	metrics.incr("group_qty:updated", len(totals))
+
+	if cint(get_setting("sle_trigger", 1)):
+		_queue_checks(_lowered(stored, totals), rows_by_item)
+
+
+def rebuild_group_totals():
+	"""
+	Hourly: sum every total again while group thresholds are on, and queue a check of the
+	rows whose total went down, e.g. because a Sales Order reserved stock.
+	"""
+	if not is_enabled():
+		return
+
+	stored = _get_stored()
+	totals = _rebuild()
+	lowered = _lowered(stored, totals)
+	_queue_checks(lowered, group_reorder_cache.get_many(list({item_code for item_code, _g in lowered})))
+	metrics.flush()
+
+
+def get_projected_qty(pairs):
+	"""Return {(item_code, warehouse): group total} for the `pairs` whose reorder row names a group."""
+	group_by_pair = {
+		pair: reorder.warehouse_group
+		for pair, reorder in reorder_cache.get_many(pairs).items()
+		if reorder and reorder.get("warehouse_group")
+	}
+	if not group_by_pair:
+		return {}
+
+	totals = get_totals({(item_code, group) for (item_code, _w), group in group_by_pair.items()})
+	return {pair: totals.get((pair[0], group), 0) for pair, group in group_by_pair.items()}
+
+
+def get_totals(keys):
+	"""Return {(item_code, warehouse_group): projected qty}, summing and storing the missing totals."""
+	totals = _get_stored(keys)
+	missing = [key for key in set(keys) if key not in totals]
+	if missing:
+		computed = _sum_totals(missing)
+		# A total a voucher stored in the meantime is newer than this sum; keep it
+		_upsert(list(computed.items()), keep_existing=True)
+		totals.update(computed)
+	return totals
+
+
+def rebuild(missing_only=False):
+	"""
+	Sum every total from Bin and drop the totals no reorder row uses any more; with
+	`missing_only` only the totals not stored yet are summed. Fallback scans run it
+	before reading. Returns the number of totals summed.
+	"""
+	if not is_enabled():
+		return 0
+	return len(_rebuild(missing_only))
+
+
+def _rebuild(missing_only=False):
+	started_at = now()
+	with metrics.timed("group_qty_rebuild"):
+		if missing_only:
+			totals = _sum_totals(
+				conditions=f"""
+                AND NOT EXISTS (
+                    SELECT 1 FROM `tab{DOCTYPE}` gq
+                    WHERE gq.item_code = `tabItem Reorder`.parent
+                        AND gq.warehouse_group = `tabItem Reorder`.warehouse_group
+                )
+                """
+			)
+			_upsert(list(totals.items()), keep_existing=True)
+		else:
+			totals = _sum_totals()
+			_upsert(list(totals.items()))
+			frappe.db.sql(
+				f"DELETE FROM `tab{DOCTYPE}` WHERE modified < %(started_at)s", {"started_at": started_at}
+			)
+	metrics.incr("group_qty:rebuilt", len(totals))
+	return totals
+
+
+def _lowered(stored, totals):
+	"""Keys whose total went down, or that had none stored."""
+	return [key for key, total in totals.items() if key not in stored or total < stored[key]]
+
+
+def _queue_checks(keys, rows_by_item):
+	"""Queue a check of the reorder rows checked against the group totals `keys`."""
+	pairs = [
+		(item_code, warehouse)
+		for item_code, group in keys
+		for warehouse, row_group in rows_by_item.get(item_code) or ()
+		if row_group == group
+	]
+	if pairs:
+		from low_stock_alerts.api import _get_pending_checks
+
+		_get_pending_checks().update(dict.fromkeys(pairs))
+		metrics.incr("group_qty:checks", len(pairs))
+
+
+def projected_qty_sql(alias="ir", bin_alias="b"):
+	"""
+	Return `(join, qty)` for queries over Item Reorder rows `alias` and their Bin
+	`bin_alias`: a JOIN on the group totals and the projected qty each row is checked
+	against as a SQL expression. Without group thresholds it is the Bin's projected qty
+	and there is no join.
+	"""
+	qty = f"IFNULL({bin_alias}.projected_qty, 0)"
+	if not is_enabled():
+		return "", qty
+
+	join = f"""
+        LEFT JOIN `tab{DOCTYPE}` gq
+            ON gq.item_code = {alias}.parent AND gq.warehouse_group = {alias}.warehouse_group
+    """
+	group_qty = "IFNULL(gq.projected_qty, 0)"
+	return join, f"CASE WHEN IFNULL({alias}.warehouse_group, '') = '' THEN {qty} ELSE {group_qty} END"
+
+
+def _contains(bounds, group, warehouse):
+	if group not in bounds or warehouse not in bounds:
+		return False
+	lft, rgt = bounds[group]
+	leaf_lft, leaf_rgt = bounds[warehouse]
+	return lft <= leaf_lft and leaf_rgt <= rgt
+
+
+def _sum_totals(keys=None, conditions=""):
+	"""Sum the totals of `keys` (all reorder groups when None) in one query over the lft/rgt ranges."""
+	values = {}
+	if keys is not None:
+		keys = set(keys)
+		if not keys:
+			return {}
+		conditions += " AND parent IN %(items)s AND warehouse_group IN %(groups)s"
+		values = {
+			"items": tuple({item_code for item_code, _g in keys}),
+			"groups": tuple({group for _i, group in keys}),
+		}
+
+	totals = {
+		(item_code, group): flt(qty)
+		for item_code, group, qty in frappe.db.sql(GROUP_TOTALS_QUERY.format(conditions=conditions), values)
+	}
+	if keys is None:
+		return totals
+	# A key whose reorder row is gone sums to nothing
+	return {key: totals.get(key, 0) for key in keys}
+
+
+def _get_stored(keys=None, for_update=False):
+	"""Stored totals of `keys`, or of every group when None."""
+	if keys is None:
+		return {
+			(item_code, group): flt(qty)
+			for item_code, group, qty in frappe.db.sql(
+				f"SELECT item_code, warehouse_group, projected_qty FROM `tab{DOCTYPE}`"
+			)
+		}
+
+	keys = set(keys)
+	if not keys:
+		return {}
+
+	rows = frappe.db.sql(
+		f"""
+        SELECT item_code, warehouse_group, projected_qty
+        FROM `tab{DOCTYPE}`
+        WHERE item_code IN %(items)s AND warehouse_group IN %(groups)s
+        {"FOR UPDATE" if for_update else ""}
+        """,
+		{
+			"items": tuple({item_code for item_code, _g in keys}),
+			"groups": tuple({group for _i, group in keys}),
+		},
+	)
+	return {(item_code, group): flt(qty) for item_code, group, qty in rows if (item_code, group) in keys}
+
+
+def _upsert(rows, keep_existing=False):
+	timestamp, user = now(), frappe.session.user
+	update = (
+		"projected_qty = projected_qty"
+		if keep_existing
+		else "projected_qty = VALUES(projected_qty), modified = VALUES(modified)"
+	)
+	for start in range(0, len(rows), WRITE_CHUNK_SIZE):
+		chunk = rows[start : start + WRITE_CHUNK_SIZE]
+		values = []
+		for (item_code, group), qty in chunk:
+			values.extend(
+				(frappe.generate_hash(length=10), timestamp, timestamp, user, user, item_code, group, qty)
+			)
+
+		frappe.db.sql(
+			f"""
+            INSERT INTO `tab{DOCTYPE}` (
+                name, creation, modified, owner, modified_by, item_code, warehouse_group, projected_qty
+            )
+            VALUES {", ".join(["(%s, %s, %s, %s, %s, %s, %s, %s)"] * len(chunk))}
+            ON DUPLICATE KEY UPDATE {update}
+            """,
+			values,
+		)
+
+
+def _clear():
+	frappe.flags.low_stock_group_qty = None
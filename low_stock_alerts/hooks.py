@@ -86,7 +86,8 @@ app_license = "mit"
 # ------------
 
 # before_install = "low_stock_alerts.install.before_install"
-# after_install = "low_stock_alerts.install.after_install"
+after_install = "low_stock_alerts.install.add_indexes"
+after_migrate = "low_stock_alerts.install.add_indexes"
 
 # Uninstallation
 # ------------
@@ -142,12 +143,57 @@ doc_events = {
         "on_submit": "low_stock_alerts.api.on_sle_update",  
         "on_update_after_submit": "low_stock_alerts.api.on_sle_update",  
     }, 
+	"Sales Order": {
+		"on_submit": "low_stock_alerts.api.on_order_update",
+		"on_cancel": "low_stock_alerts.api.on_order_update",
+		"on_update_after_submit": "low_stock_alerts.api.on_order_update",
+	},
+	"Material Request": {
+		"on_submit": "low_stock_alerts.api.on_order_update",
+		"on_cancel": "low_stock_alerts.api.on_order_update",
+		"on_update_after_submit": "low_stock_alerts.api.on_order_update",
+	},
+	"Warehouse": {
+		"on_update": [
+			"low_stock_alerts.warehouse_tree.invalidate_warehouse_tree",
+			"low_stock_alerts.lookup_cache.on_warehouse_update",
+		],
+		"after_rename": "low_stock_alerts.warehouse_tree.invalidate_warehouse_tree",
+		"on_trash": [
+			"low_stock_alerts.warehouse_tree.invalidate_warehouse_tree",
+			"low_stock_alerts.lookup_cache.on_warehouse_update",
+		],
+	},
+	"Item": {
+		"on_update": [
+			"low_stock_alerts.lookup_cache.on_item_update",
+			"low_stock_alerts.admission.on_item_update",
+		],
+		"on_trash": [
+			"low_stock_alerts.lookup_cache.on_item_update",
+			"low_stock_alerts.admission.on_item_update",
+		],
+	},
 }
 
 # Scheduled Tasks
 # ---------------
 
 scheduler_events = {
+	"cron": {
+		"* * * * *": [
+			"low_stock_alerts.digest.flush_due_digests",
+		],
+		"*/5 * * * *": [
+			"low_stock_alerts.api.run_low_stock_alerts_incremental",
+		],
+		"0 * * * *": [
+			"low_stock_alerts.group_qty.rebuild_group_totals",
+		],
+		"30 2 * * *": [
+			"low_stock_alerts.admission.rebuild_admission_index",
+		],
+	},
 	# "all": [
 	# 	"low_stock_alerts.tasks.all"
 	# ],
@@ -155,8 +201,8 @@ scheduler_events = {
 	# 	"low_stock_alerts.tasks.daily"
 	# ],
 	# "hourly": [
-    #     "low_stock_alerts.api.run_low_stock_alerts_fallback"
-    ]
+	# 	"low_stock_alerts.api.run_low_stock_alerts_fallback"
+	# ],
 	# "weekly": [
 	# 	"low_stock_alerts.tasks.weekly"
 	# ],
@@ -0,0 +1,294 @@
+"""
+Two-level cache for the lookups done on every low-stock check.
+
+Level one is a size-limited LRU in each process, level two a Redis hash shared by all
+workers of the site. Misses are loaded from the database in bulk for the whole batch
+of keys. Save hooks on Item and Warehouse drop exactly the affected keys from Redis
+and append them to the namespace's invalidation log; every process pops the logged keys
+from its LRU on its first lookup of the next request or job and keeps the rest. A
+process that fell further behind than the log reaches back, or finds Redis flushed,
+discards its whole LRU. Hit and miss counts go out with the `metrics` flush.
+"""
+
+import json
+import random
+from collections import OrderedDict
+
+import frappe
+from redis.exceptions import WatchError
+
+from low_stock_alerts import metrics
+from low_stock_alerts.settings import get_setting
+
+KEY_PREFIX = "low_stock_alerts:lookup"
+REDIS_TTL = 24 * 60 * 60
+# Invalidated keys kept per namespace for processes that have not caught up yet
+INVALIDATION_LOG_SIZE = 1000
+
+
+class LookupCache:
+	def __init__(self, namespace, loader):
+		"""`loader(keys)` returns {key: value} for the keys that exist in the database."""
+		self.namespace = namespace
+		self.loader = loader
+		self.hash_key = f"{KEY_PREFIX}:{namespace}"
+		self.log_key = f"{KEY_PREFIX}:{namespace}:invalidated"
+		self.seq_key = f"{KEY_PREFIX}:{namespace}:seq"
+		self.stats = {"local_hits": 0, "redis_hits": 0, "misses": 0}
+		self._local = OrderedDict()
+		self._seq = None
+
+	@property
+	def maxsize(self):
+		return int(get_setting("lookup_cache_size", 10000))
+
+	def get(self, key):
+		return self.get_many([key]).get(key)
+
+	def get_many(self, keys):
+		"""Return {key: value} for all `keys`; keys missing in the database map to None."""
+		cache = frappe.cache()
+		self._sync(cache)
+
+		result = {}
+		missing = []
+		for key in dict.fromkeys(keys):
+			if key in self._local:
+				self._local.move_to_end(key)
+				result[key] = self._local[key]
+			else:
+				missing.append(key)
+
+		local_hits = len(result)
+		redis_hits = 0
+		loaded = {}
+		if missing:
+			pipe = cache.pipeline()
+			pipe.hmget(cache.make_key(self.hash_key), [_field(key) for key in missing])
+			pipe.get(cache.make_key(self.seq_key))
+			pipe.ttl(cache.make_key(self.hash_key))
+			cached, seq, ttl = pipe.execute()
+			not_cached = []
+			for key, value in zip(missing, cached, strict=True):
+				if value is None:
+					not_cached.append(key)
+				else:
+					result[key] = self._remember(key, _loads(value))
+					redis_hits += 1
+
+			if not_cached:
+				found = self.loader(not_cached)
+				loaded = {key: found.get(key) for key in not_cached}
+				result.update(loaded)
+				if self._write_back(cache, loaded, seq, ttl):
+					for key, value in loaded.items():
+						self._remember(key, value)
+
+		self._count(local_hits=local_hits, redis_hits=redis_hits, misses=len(loaded))
+
+		return result
+
+	def invalidate(self, keys):
+		"""Drop `keys` from Redis and from the LRU of every process."""
+		keys = list(keys)
+		if not keys:
+			return
+
+		fields = [_field(key) for key in keys]
+		cache = frappe.cache()
+		pipe = cache.pipeline(transaction=True)
+		pipe.hdel(cache.make_key(self.hash_key), *fields)
+		pipe.rpush(cache.make_key(self.log_key), *fields)
+		pipe.ltrim(cache.make_key(self.log_key), -INVALIDATION_LOG_SIZE, -1)
+		pipe.incrby(cache.make_key(self.seq_key), len(fields))
+		pipe.execute()
+		for key in keys:
+			self._local.pop(key, None)
+
+	def _write_back(self, cache, loaded, seq, ttl):
+		"""
+		Store `loaded` in Redis unless the sequence moved on from `seq`, read before the
+		loader ran: an invalidation that landed meanwhile may cover rows it read stale.
+		"""
+		seq_key = cache.make_key(self.seq_key)
+		hash_key = cache.make_key(self.hash_key)
+		with cache.pipeline() as pipe:
+			try:
+				pipe.watch(seq_key)
+				if pipe.get(seq_key) != seq:
+					return False
+				pipe.multi()
+				pipe.hset(hash_key, mapping={_field(key): json.dumps(value) for key, value in loaded.items()})
+				# Expire the hash a day after it was created, not a day after the last miss
+				if ttl < 0:
+					pipe.expire(hash_key, REDIS_TTL)
+				pipe.execute()
+			except WatchError:
+				return False
+		return True
+
+	def _sync(self, cache):
+		"""Pop the keys invalidated since the last request or job from the LRU."""
+		synced = getattr(frappe.local, "low_stock_alerts_lookup_synced", None)
+		if synced is None:
+			synced = frappe.local.low_stock_alerts_lookup_synced = set()
+		if self in synced:
+			return
+		synced.add(self)
+
+		seq_key = cache.make_key(self.seq_key)
+		seq = cache.get(seq_key)
+		if seq is None:
+			# Redis was flushed or never written: start from a random offset so no stale LRU matches it
+			cache.set(seq_key, random.randrange(1 << 48), nx=True)
+			seq = cache.get(seq_key)
+		seq = int(seq)
+		if seq == self._seq:
+			return
+
+		behind = seq - self._seq if self._seq is not None else 0
+		if 0 < behind <= INVALIDATION_LOG_SIZE:
+			pipe = cache.pipeline(transaction=True)
+			pipe.get(seq_key)
+			pipe.lrange(cache.make_key(self.log_key), -behind, -1)
+			latest, fields = pipe.execute()
+			# Keys invalidated between the two reads are not in `fields`; start over then
+			if latest is not None and int(latest) == seq and len(fields) == behind:
+				for field in fields:
+					self._local.pop(_key(frappe.safe_decode(field)), None)
+				self._seq = seq
+				return
+
+		self._local.clear()
+		self._seq = seq
+
+	def _remember(self, key, value):
+		self._local[key] = value
+		while len(self._local) > self.maxsize:
+			self._local.popitem(last=False)
+		return value
+
+	def _count(self, **counts):
+		for name, count in counts.items():
+			self.stats[name] += count
+			metrics.incr(f"lookup:{self.namespace}:{name}", count)
+
+
+def _field(key):
+	return "\x1f".join(key) if isinstance(key, tuple) else key
+
+
+def _key(field):
+	return tuple(field.split("\x1f")) if "\x1f" in field else field
+
+
+def _loads(value):
+	value = json.loads(value)
+	return frappe._dict(value) if isinstance(value, dict) else value
+
+
+def _load_reorder(pairs):
+	rows = frappe.db.sql(
+		"""
+        SELECT parent AS item_code, warehouse, warehouse_group, warehouse_reorder_level, warehouse_reorder_qty
+        FROM `tabItem Reorder`
+        WHERE parenttype = 'Item' AND parent IN %(items)s AND warehouse IN %(warehouses)s
+        """,
+		{
+			"items": tuple({item_code for item_code, _w in pairs}),
+			"warehouses": tuple({warehouse for _i, warehouse in pairs}),
+		},
+		as_dict=True,
+	)
+	return {
+		(r.item_code, r.warehouse): frappe._dict(
+			warehouse_reorder_level=r.warehouse_reorder_level,
+			warehouse_reorder_qty=r.warehouse_reorder_qty,
+			warehouse_group=r.warehouse_group or None,
+		)
+		for r in rows
+	}
+
+
+def _load_group_reorder(item_codes):
+	rows = frappe.db.sql(
+		"""
+        SELECT parent AS item_code, warehouse, warehouse_group
+        FROM `tabItem Reorder`
+        WHERE parenttype = 'Item' AND parent IN %(items)s AND IFNULL(warehouse_group, '') != ''
+        """,
+		{"items": tuple(item_codes)},
+		as_dict=True,
+	)
+	result = {}
+	for r in rows:
+		result.setdefault(r.item_code, []).append([r.warehouse, r.warehouse_group])
+	return result
+
+
+def _load_items(item_codes):
+	return {
+		d.name: frappe._dict(item_name=d.item_name, description=d.description)
+		for d in frappe.get_all(
+			"Item", filters={"name": ["in", item_codes]}, fields=["name", "item_name", "description"]
+		)
+	}
+
+
+def _load_recipients(warehouses):
+	return dict(
+		frappe.get_all(
+			"Warehouse", filters={"name": ["in", warehouses]}, fields=["name", "email_id"], as_list=True
+		)
+	)
+
+
+# (item_code, warehouse) -> {warehouse_reorder_level, warehouse_reorder_qty, warehouse_group}
+reorder_cache = LookupCache("item_reorder", _load_reorder)
+# item_code -> [[warehouse, warehouse_group], ...] of its rows checked against a group total
+group_reorder_cache = LookupCache("item_reorder_group", _load_group_reorder)
+# item_code -> {item_name, description}
+item_cache = LookupCache("item", _load_items)
+# warehouse -> email_id
+recipient_cache = LookupCache("warehouse_email", _load_recipients)
+
+CACHES = (reorder_cache, group_reorder_cache, item_cache, recipient_cache)
+
+
+def on_item_update(doc, method=None):
+	"""Doc event hook: drop the item's display fields and reorder rows, old and new."""
+	warehouses = {d.warehouse for d in doc.get("reorder_levels") or []}
+	before = doc.get_doc_before_save()
+	if before:
+		warehouses.update(d.warehouse for d in before.get("reorder_levels") or [])
+
+	reorder_keys = [(doc.name, warehouse) for warehouse in warehouses if warehouse]
+	frappe.db.after_commit.add(reorder_cache.invalidate, reorder_keys)
+	frappe.db.after_commit.add(group_reorder_cache.invalidate, [doc.name])
+	frappe.db.after_commit.add(item_cache.invalidate, [doc.name])
+
+
+def on_warehouse_update(doc, method=None):
+	"""Doc event hook: drop the warehouse's recipient email."""
+	frappe.db.after_commit.add(recipient_cache.invalidate, [doc.name])
+
+
+@frappe.whitelist()
+def get_lookup_cache_stats() -> dict:
+	"""Hit/miss counters of every namespace, summed over all workers of the site."""
+	frappe.only_for("System Manager")
+
+	cache = frappe.cache()
+	pipe = cache.pipeline()
+	pipe.hgetall(cache.make_key(metrics.COUNTS_KEY))
+	(counts,) = pipe.execute()
+	totals = {frappe.safe_decode(k): int(v) for k, v in (counts or {}).items()}
+	return {
+		c.namespace: {
+			"local_hits": totals.get(f"lookup:{c.namespace}:local_hits", 0),
+			"redis_hits": totals.get(f"lookup:{c.namespace}:redis_hits", 0),
+			"misses": totals.get(f"lookup:{c.namespace}:misses", 0),
+			"maxsize": c.maxsize,
+		}
+		for c in CACHES
+	}
@@ -0,0 +1,76 @@
+# Copyright (c) 2026, Muhammad Hammad Nadeem and contributors
+# For license information, please see license.txt
+
+import frappe
+from frappe import _
+from frappe.model.document import Document
+from frappe.utils import cint, flt
+
+from low_stock_alerts.settings import clear_settings_cache
+
+
+class LowStockAlertSettings(Document):
+	# begin: auto-generated types
+	# This code is auto-generated. Do not modify anything in this block.
+
+	from typing import TYPE_CHECKING
+
+	if TYPE_CHECKING:
+		from frappe.types import DF
+
+		from low_stock_alerts.low_stock_alerts.doctype.low_stock_monitored_warehouse.low_stock_monitored_warehouse import (
+			LowStockMonitoredWarehouse,
+		)
+		from low_stock_alerts.low_stock_alerts.doctype.low_stock_throttle_window.low_stock_throttle_window import (
+			LowStockThrottleWindow,
+		)
+
+		admission_filter: DF.Check
+		consumption_half_life_days: DF.Float
+		cover_horizon_days: DF.Float
+		critical_ratio: DF.Float
+		digest_window: DF.Int
+		email_batch_size: DF.Int
+		email_retries: DF.Int
+		fallback_chunk_size: DF.Int
+		fallback_shard_by: DF.Literal["subtree", "company"]
+		fallback_shard_mode: DF.Literal["queue", "pool"]
+		fallback_shards: DF.Int
+		full_scan_interval_hours: DF.Float
+		group_thresholds: DF.Check
+		incremental_fallback: DF.Check
+		monitored_warehouses: DF.Table[LowStockMonitoredWarehouse]
+		order_trigger: DF.Check
+		profile_log_size: DF.Int
+		profile_sample_rate: DF.Float
+		profile_top_n: DF.Int
+		recovery_band: DF.Float
+		sle_trigger: DF.Check
+		throttle_window: DF.Int
+		throttle_windows: DF.Table[LowStockThrottleWindow]
+	# end: auto-generated types
+
+	def validate(self):
+		for fieldname in ("fallback_chunk_size", "email_batch_size"):
+			if cint(self.get(fieldname)) < 1:
+				frappe.throw(_("{0} must be at least 1").format(_(self.meta.get_label(fieldname))))
+
+		for table in ("monitored_warehouses", "throttle_windows"):
+			seen = set()
+			for row in self.get(table):
+				if row.warehouse in seen:
+					frappe.throw(
+						_("Row #{0}: Warehouse {1} is listed more than once in {2}").format(
+							row.idx, frappe.bold(row.warehouse), _(self.meta.get_label(table))
+						)
+					)
+				seen.add(row.warehouse)
+
+		if self.cover_horizon_days and flt(self.consumption_half_life_days) <= 0:
+			frappe.throw(_("Consumption Half-Life must be greater than 0"))
+
+		if flt(self.profile_sample_rate) > 1:
+			frappe.throw(_("Sample Rate must be between 0 and 1"))
+
+	def on_update(self):
+		clear_settings_cache()
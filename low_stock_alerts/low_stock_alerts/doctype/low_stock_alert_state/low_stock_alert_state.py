@@ -0,0 +1,31 @@
+# Copyright (c) 2026, Muhammad Hammad Nadeem and contributors
+# For license information, please see license.txt
+
+import frappe
+from frappe.model.document import Document
+
+
+class LowStockAlertState(Document):
+	# begin: auto-generated types
+	# This code is auto-generated. Do not modify anything in this block.
+
+	from typing import TYPE_CHECKING
+
+	if TYPE_CHECKING:
+		from frappe.types import DF
+
+		item_code: DF.Link
+		last_alerted_at: DF.Datetime | None
+		last_alerted_qty: DF.Float
+		projected_qty: DF.Float
+		state: DF.Literal["OK", "LOW", "CRITICAL"]
+		warehouse: DF.Link
+	# end: auto-generated types
+
+	pass
+
+
+def on_doctype_update():
+	frappe.db.add_unique(
+		"Low Stock Alert State", ["item_code", "warehouse"], constraint_name="item_warehouse"
+	)
@@ -0,0 +1,29 @@
+# Copyright (c) 2026, Muhammad Hammad Nadeem and contributors
+# For license information, please see license.txt
+
+import frappe
+from frappe.model.document import Document
+
+
+class LowStockConsumptionRate(Document):
+	# begin: auto-generated types
+	# This code is auto-generated. Do not modify anything in this block.
+
+	from typing import TYPE_CHECKING
+
+	if TYPE_CHECKING:
+		from frappe.types import DF
+
+		item_code: DF.Link
+		last_date: DF.Date | None
+		rate: DF.Float
+		warehouse: DF.Link
+	# end: auto-generated types
+
+	pass
+
+
+def on_doctype_update():
+	frappe.db.add_unique(
+		"Low Stock Consumption Rate", ["item_code", "warehouse"], constraint_name="item_warehouse"
+	)
@@ -0,0 +1,28 @@
+# Copyright (c) 2026, Muhammad Hammad Nadeem and contributors
+# For license information, please see license.txt
+
+import frappe
+from frappe.model.document import Document
+
+
+class LowStockGroupQty(Document):
+	# begin: auto-generated types
+	# This code is auto-generated. Do not modify anything in this block.
+
+	from typing import TYPE_CHECKING
+
+	if TYPE_CHECKING:
+		from frappe.types import DF
+
+		item_code: DF.Link
+		projected_qty: DF.Float
+		warehouse_group: DF.Link
+	# end: auto-generated types
+
+	pass
+
+
+def on_doctype_update():
+	frappe.db.add_unique(
+		"Low Stock Group Qty", ["item_code", "warehouse_group"], constraint_name="item_group"
+	)
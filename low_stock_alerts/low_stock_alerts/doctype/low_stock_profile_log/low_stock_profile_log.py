@@ -0,0 +1,30 @@
+# Copyright (c) 2026, Muhammad Hammad Nadeem and contributors
+# For license information, please see license.txt
+
+import frappe
+from frappe.model.document import Document
+
+
+class LowStockProfileLog(Document):
+	# begin: auto-generated types
+	# This code is auto-generated. Do not modify anything in this block.
+
+	from typing import TYPE_CHECKING
+
+	if TYPE_CHECKING:
+		from frappe.types import DF
+
+		duration_ms: DF.Float
+		failed: DF.Check
+		job: DF.Data | None
+		query_count: DF.Int
+		query_ms: DF.Float
+		started_at: DF.Datetime | None
+		stats: DF.Code | None
+	# end: auto-generated types
+
+	pass
+
+
+def on_doctype_update():
+	frappe.db.add_index("Low Stock Profile Log", ["creation"])
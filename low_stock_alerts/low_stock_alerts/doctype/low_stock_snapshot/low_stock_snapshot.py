@@ -0,0 +1,32 @@
+# Copyright (c) 2026, Muhammad Hammad Nadeem and contributors
+# For license information, please see license.txt
+
+import frappe
+from frappe.model.document import Document
+
+
+class LowStockSnapshot(Document):
+	# begin: auto-generated types
+	# This code is auto-generated. Do not modify anything in this block.
+
+	from typing import TYPE_CHECKING
+
+	if TYPE_CHECKING:
+		from frappe.types import DF
+
+		item_code: DF.Link
+		item_name: DF.Data | None
+		projected_qty: DF.Float
+		reorder_level: DF.Float
+		reorder_qty: DF.Float
+		shortfall: DF.Float
+		state: DF.Literal["LOW", "CRITICAL"]
+		warehouse: DF.Link
+	# end: auto-generated types
+
+	pass
+
+
+def on_doctype_update():
+	frappe.db.add_unique("Low Stock Snapshot", ["item_code", "warehouse"], constraint_name="item_warehouse")
+	frappe.db.add_index("Low Stock Snapshot", ["warehouse", "item_code"])
@@ -0,0 +1,38 @@
+// Copyright (c) 2026, Muhammad Hammad Nadeem and contributors
+// For license information, please see license.txt
+
+frappe.query_reports["Current Low Stock"] = {
+	filters: [
+		{
+			fieldname: "warehouse",
+			label: __("Warehouse"),
+			fieldtype: "Link",
+			options: "Warehouse",
+		},
+		{
+			fieldname: "item_code",
+			label: __("Item"),
+			fieldtype: "Link",
+			options: "Item",
+		},
+		{
+			fieldname: "state",
+			label: __("State"),
+			fieldtype: "Select",
+			options: "\nLOW\nCRITICAL",
+		},
+		{
+			fieldname: "page",
+			label: __("Page"),
+			fieldtype: "Int",
+			default: 1,
+		},
+		{
+			fieldname: "page_length",
+			label: __("Rows per Page"),
+			fieldtype: "Select",
+			options: "100\n500\n1000",
+			default: "500",
+		},
+	],
+};
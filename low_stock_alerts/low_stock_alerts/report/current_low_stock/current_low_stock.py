@@ -0,0 +1,41 @@
+# Copyright (c) 2026, Muhammad Hammad Nadeem and contributors
+# For license information, please see license.txt
+
+from frappe import _
+from frappe.utils import cint
+
+from low_stock_alerts.snapshot import get_rows
+
+
+def execute(filters=None):
+	"""One page of the Low Stock Snapshot; a group warehouse shows every warehouse under it."""
+	filters = filters or {}
+	page_length = cint(filters.get("page_length")) or 500
+	rows = get_rows(
+		warehouse=filters.get("warehouse"),
+		item_code=filters.get("item_code"),
+		state=filters.get("state"),
+		start=(max(cint(filters.get("page")), 1) - 1) * page_length,
+		limit=page_length,
+	)
+	return get_columns(), rows
+
+
+def get_columns():
+	return [
+		{"fieldname": "item_code", "label": _("Item"), "fieldtype": "Link", "options": "Item", "width": 160},
+		{"fieldname": "item_name", "label": _("Item Name"), "fieldtype": "Data", "width": 200},
+		{
+			"fieldname": "warehouse",
+			"label": _("Warehouse"),
+			"fieldtype": "Link",
+			"options": "Warehouse",
+			"width": 180,
+		},
+		{"fieldname": "state", "label": _("State"), "fieldtype": "Data", "width": 90},
+		{"fieldname": "projected_qty", "label": _("Projected Qty"), "fieldtype": "Float", "width": 120},
+		{"fieldname": "reorder_level", "label": _("Reorder Level"), "fieldtype": "Float", "width": 120},
+		{"fieldname": "reorder_qty", "label": _("Reorder Qty"), "fieldtype": "Float", "width": 110},
+		{"fieldname": "shortfall", "label": _("Shortfall"), "fieldtype": "Float", "width": 110},
+		{"fieldname": "modified", "label": _("Updated"), "fieldtype": "Datetime", "width": 160},
+	]
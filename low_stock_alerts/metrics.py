@@ -0,0 +1,94 @@
+"""
+Per-stage timings and counters for the alert hot path.
+
+Stages and counters are collected in process memory and written to Redis in one
+pipelined call when a job finishes (`flush`), so instrumentation adds no round trips
+per pair. Totals are summed over all workers and read through `get_alert_metrics`.
+"""
+
+from collections import Counter, defaultdict
+from contextlib import contextmanager
+from time import perf_counter
+
+import frappe
+
+TIMINGS_KEY = "low_stock_alerts:metrics:timings"
+COUNTS_KEY = "low_stock_alerts:metrics:counts"
+
+_timings = defaultdict(float)
+_counts = Counter()
+
+
+def get_logger():
+	"""App logger; debug output in the hot path is off unless the site log level allows it."""
+	return frappe.logger("low_stock_alerts")
+
+
+@contextmanager
+def timed(stage):
+	"""Add the wall time of the block to `stage` and count one call."""
+	start = perf_counter()
+	try:
+		yield
+	finally:
+		_timings[stage] += perf_counter() - start
+		_counts[f"stage:{stage}"] += 1
+
+
+def incr(name, count=1):
+	"""Count an event, e.g. an early-return reason; zero counts are ignored."""
+	if count:
+		_counts[name] += count
+
+
+def flush():
+	"""Write the collected timings and counters to Redis and reset them."""
+	if not (_timings or _counts):
+		return
+
+	cache = frappe.cache()
+	pipe = cache.pipeline(transaction=False)
+	for stage, seconds in _timings.items():
+		pipe.hincrbyfloat(cache.make_key(TIMINGS_KEY), stage, seconds)
+	for name, count in _counts.items():
+		pipe.hincrby(cache.make_key(COUNTS_KEY), name, count)
+	pipe.execute()
+	discard()
+
+
+def discard():
+	"""Drop the collected timings and counters without writing them, e.g. after a dry run."""
+	_timings.clear()
+	_counts.clear()
+
+
+@frappe.whitelist()
+def get_alert_metrics() -> dict:
+	"""Totals since the last reset: per-stage calls and time, and event counters."""
+	frappe.only_for("System Manager")
+
+	cache = frappe.cache()
+	pipe = cache.pipeline(transaction=False)
+	pipe.hgetall(cache.make_key(TIMINGS_KEY))
+	pipe.hgetall(cache.make_key(COUNTS_KEY))
+	timings, counts = pipe.execute()
+
+	timings = {frappe.safe_decode(k): float(v) for k, v in (timings or {}).items()}
+	counts = {frappe.safe_decode(k): int(v) for k, v in (counts or {}).items()}
+
+	stages = {}
+	for stage, seconds in timings.items():
+		calls = counts.pop(f"stage:{stage}", 0)
+		stages[stage] = {
+			"calls": calls,
+			"total_ms": round(seconds * 1000, 3),
+			"avg_ms": round(seconds * 1000 / calls, 3) if calls else 0,
+		}
+
+	return {"stages": stages, "counters": counts}
+
+
+@frappe.whitelist(methods=["POST"])
+def reset_alert_metrics() -> None:
+	frappe.only_for("System Manager")
+	frappe.cache().delete_value([TIMINGS_KEY, COUNTS_KEY])
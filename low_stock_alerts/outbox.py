@@ -0,0 +1,198 @@
+"""
+Outbox for low-stock emails.
+
+The alert template is compiled once per process. Inside `collect()` rendered emails are
+held in memory and written to the Email Queue in batches of `email_batch_size`: one
+multi-row INSERT for the queue and one for its recipients per batch, instead of one
+`frappe.sendmail` document insert per email. The regular Email Queue job sends them.
+
+A batch that fails is rolled back to its savepoint and retried up to `email_retries`
+times; if it still fails its emails are queued one by one through `frappe.sendmail`, so
+one bad message does not hold back the rest.
+"""
+
+import json
+import time
+from collections import namedtuple
+from contextlib import contextmanager
+
+import frappe
+from frappe.utils import cint, now
+
+from low_stock_alerts import metrics
+from low_stock_alerts.settings import get_setting
+
+TEMPLATE = """
+<h3>Low Stock Alert</h3>
+<p>Warehouse: {{ warehouse_or_group }}</p>
+<p>The following items are at or below reorder level:</p>
+<table border="1" cellpadding="5" cellspacing="0">
+    <tr>
+        <th>Item Code</th>
+        <th>Item Name</th>
+        <th>Warehouse</th>
+        <th>Projected Qty</th>
+        <th>Reorder Level</th>
+    </tr>
+    {% for item in items %}
+    <tr>
+        <td>{{ item.item_code }}</td>
+        <td>{{ item.item_name }}</td>
+        <td>{{ item.warehouse }}</td>
+        <td>{{ item.projected_qty }}</td>
+        <td>{{ item.reorder_level }}</td>
+    </tr>
+    {% endfor %}
+</table>
+"""
+
+RETRY_DELAY = 0.5
+
+Email = namedtuple("Email", ["recipient", "subject", "message"])
+
+# Compiled `TEMPLATE` of this process
+_template = None
+# Emails waiting for the end of the current `collect()` block, None outside one
+_pending = None
+
+
+def render(items, warehouse_or_group):
+	global _template
+
+	if _template is None:
+		_template = frappe.get_jenv().from_string(TEMPLATE)
+	return _template.render(items=items, warehouse_or_group=warehouse_or_group)
+
+
+@contextmanager
+def collect():
+	"""
+	Hold the emails added inside the block and write them when it exits cleanly; if it
+	raises they are dropped with the rest of the job. A nested block joins the outer one.
+	"""
+	global _pending
+
+	if _pending is not None:
+		yield
+		return
+
+	_pending = []
+	try:
+		yield
+		flush()
+	finally:
+		_pending = None
+
+
+def add(recipient, subject, message):
+	"""Queue one email. Outside `collect()` it is written right away."""
+	email = Email(recipient, subject, message)
+	if _pending is None:
+		insert_emails([email])
+		return
+
+	_pending.append(email)
+	if len(_pending) >= get_batch_size():
+		flush()
+
+
+def flush():
+	"""Write the emails held by the current `collect()` block in batches."""
+	batch_size = get_batch_size()
+	while _pending:
+		batch = _pending[:batch_size]
+		del _pending[:batch_size]
+		insert_emails(batch)
+
+
+def get_batch_size():
+	return max(cint(get_setting("email_batch_size", 200)), 1)
+
+
+def insert_emails(emails):
+	"""Write `emails` to the Email Queue in one batch, retrying before falling back to one by one."""
+	if not emails:
+		return
+
+	retries = max(cint(get_setting("email_retries", 3)), 0)
+	for attempt in range(retries + 1):
+		savepoint = f"low_stock_outbox_{attempt}"
+		frappe.db.savepoint(savepoint)
+		try:
+			with metrics.timed("email_queue"):
+				queued = _bulk_insert(emails)
+			metrics.incr("emails_sent", queued)
+			metrics.incr("outbox:no_recipients", len(emails) - queued)
+			return
+		except Exception:
+			frappe.db.rollback(save_point=savepoint)
+			metrics.incr("outbox:failed_batches")
+			metrics.get_logger().warning(
+				"Queueing %s low stock emails failed (attempt %s)", len(emails), attempt + 1, exc_info=True
+			)
+			if attempt < retries:
+				time.sleep(RETRY_DELAY * 2**attempt)
+
+	for email in emails:
+		frappe.sendmail(
+			recipients=email.recipient,
+			subject=email.subject,
+			message=email.message,
+			reference_doctype="User",
+		)
+	metrics.incr("emails_sent", len(emails))
+
+
+def _bulk_insert(emails):
+	"""Write `emails` to the Email Queue; return how many were written."""
+	from frappe.email.doctype.email_queue.email_queue import QueueBuilder
+
+	queue_meta = frappe.get_meta("Email Queue")
+	timestamp, user = now(), frappe.session.user
+	standard = {"creation": timestamp, "modified": timestamp, "owner": user, "modified_by": user}
+
+	queue_rows, recipient_rows = [], []
+	for email in emails:
+		queued = QueueBuilder(
+			recipients=[email.recipient],
+			subject=email.subject,
+			message=email.message,
+			reference_doctype="User",
+		).as_dict()
+		recipients = queued.pop("recipients", None)
+		if not recipients:
+			# Unsubscribed or invalid; sendmail would have dropped it as well
+			continue
+
+		name = frappe.generate_hash(length=10)
+		row = {
+			key: json.dumps(value) if isinstance(value, dict | list) else value
+			for key, value in queued.items()
+			if queue_meta.has_field(key)
+		}
+		queue_rows.append({**standard, **row, "name": name, "status": "Not Sent"})
+		recipient_rows.extend(
+			{
+				**standard,
+				"name": frappe.generate_hash(length=10),
+				"parent": name,
+				"parenttype": "Email Queue",
+				"parentfield": "recipients",
+				"idx": idx,
+				"recipient": recipient,
+				"status": "Not Sent",
+			}
+			for idx, recipient in enumerate(recipients, 1)
+		)
+
+	_insert_rows("Email Queue", queue_rows)
+	_insert_rows("Email Queue Recipient", recipient_rows)
+	return len(queue_rows)
+
+
+def _insert_rows(doctype, rows):
+	if not rows:
+		return
+
+	fields = list(dict.fromkeys(field for row in rows for field in row))
+	frappe.db.bulk_insert(doctype, fields, [[row.get(field) for field in fields] for row in rows])
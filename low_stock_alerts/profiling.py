@@ -0,0 +1,158 @@
+"""
+Sampled profiling of alert jobs.
+
+With `profile_sample_rate` set in Low Stock Alert Settings (or
+`low_stock_alerts_profile_sample_rate` in site config), that share of the jobs wrapped
+in `profile()` runs under cProfile. Each sampled job leaves a `Low Stock Profile Log`
+row with its duration, the number of queries it ran and their time, and the top
+`profile_top_n` functions by cumulative time. The log is capped at `profile_log_size`
+rows. Jobs that are not sampled pay one setting lookup and a random draw.
+
+Queries are counted by wrapping `frappe.db.sql` for the duration of the job, the way
+Frappe's recorder does. The log row is written in the job's transaction. A job that
+raises is logged too, marked failed, right after its transaction is rolled back, next
+to its Error Log.
+"""
+
+import cProfile
+import io
+import pstats
+import random
+import time
+from contextlib import contextmanager
+
+import frappe
+from frappe.utils import cint, flt, now
+
+from low_stock_alerts import metrics
+from low_stock_alerts.settings import get_setting
+
+DOCTYPE = "Low Stock Profile Log"
+
+# Job being profiled in this process; nested `profile()` blocks belong to it
+_active = None
+
+
+def get_sample_rate():
+	return min(max(flt(get_setting("profile_sample_rate", 0)), 0), 1)
+
+
+@contextmanager
+def profile(job):
+	"""Run the block under cProfile for a sampled share of calls and log the result as `job`."""
+	global _active
+
+	if _active is not None or not _sampled():
+		yield
+		return
+
+	profiler = cProfile.Profile()
+	try:
+		profiler.enable()
+	except ValueError:
+		# Another profiler is already active in this thread
+		yield
+		return
+
+	_active = job
+	queries = [0, 0.0]
+	original_sql = _wrap_sql(queries)
+	started_at, start = now(), time.perf_counter()
+	failed = True
+	try:
+		yield
+		failed = False
+	finally:
+		profiler.disable()
+		duration = time.perf_counter() - start
+		_restore_sql(original_sql)
+		_active = None
+
+		if failed:
+			# The job's rollback would take a row written now with it
+			frappe.db.after_rollback.add(_log, job, started_at, duration, queries, profiler, True)
+		else:
+			_log(job, started_at, duration, queries, profiler)
+
+
+def _sampled():
+	rate = get_sample_rate()
+	return rate > 0 and random.random() < rate
+
+
+def _wrap_sql(queries):
+	"""Count and time `frappe.db.sql` calls into `queries`; returns what to restore."""
+	db = frappe.db
+	original = vars(db).get("sql")
+	sql = db.sql
+
+	def timed_sql(*args, **kwargs):
+		start = time.perf_counter()
+		try:
+			return sql(*args, **kwargs)
+		finally:
+			queries[0] += 1
+			queries[1] += time.perf_counter() - start
+
+	db.sql = timed_sql
+	return original
+
+
+def _restore_sql(original):
+	if original is None:
+		del frappe.db.sql
+	else:
+		frappe.db.sql = original
+
+
+def _log(job, started_at, duration, queries, profiler, failed=False):
+	stream = io.StringIO()
+	stats = pstats.Stats(profiler, stream=stream)
+	stats.strip_dirs().sort_stats("cumulative").print_stats(max(cint(get_setting("profile_top_n", 30)), 1))
+
+	timestamp, user = now(), frappe.session.user
+	frappe.db.bulk_insert(
+		DOCTYPE,
+		[
+			"name",
+			"creation",
+			"modified",
+			"owner",
+			"modified_by",
+			"job",
+			"started_at",
+			"duration_ms",
+			"query_count",
+			"query_ms",
+			"failed",
+			"stats",
+		],
+		[
+			[
+				frappe.generate_hash(length=10),
+				timestamp,
+				timestamp,
+				user,
+				user,
+				job,
+				started_at,
+				round(duration * 1000, 3),
+				queries[0],
+				round(queries[1] * 1000, 3),
+				int(failed),
+				stream.getvalue().strip(),
+			]
+		],
+	)
+	_prune(max(cint(get_setting("profile_log_size", 500)), 1))
+	metrics.incr(f"profile:{job}")
+
+
+def _prune(keep):
+	"""Delete the oldest profiles beyond the newest `keep`."""
+	cutoff = frappe.db.sql(
+		f"SELECT creation FROM `tab{DOCTYPE}` ORDER BY creation DESC LIMIT 1 OFFSET %(keep)s",
+		{"keep": keep},
+	)
+	if cutoff:
+		frappe.db.sql(f"DELETE FROM `tab{DOCTYPE}` WHERE creation <= %(cutoff)s", {"cutoff": cutoff[0][0]})
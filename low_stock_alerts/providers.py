@@ -0,0 +1,89 @@
+"""
+Data providers for `low_stock_alerts.engine`.
+
+`FrappeProvider` serves the engine's snapshots from the site: reorder levels through
+the lookup cache (raised to the days-of-cover level where a consumption rate is
+tracked), projected quantities from Bin (the group total for reorder rows checked
+against a Warehouse Group), alert states from `Low Stock Alert State`, the hierarchy
+from the warehouse tree index and throttle state by claiming alert windows in Redis.
+"""
+
+import frappe
+from frappe.utils import flt
+
+from low_stock_alerts import alert_state, consumption, group_qty, metrics
+from low_stock_alerts.engine import ReorderLevel, cover_level
+from low_stock_alerts.lookup_cache import reorder_cache
+from low_stock_alerts.throttle import claim_alerts
+
+
+class FrappeProvider:
+	def get_reorder_levels(self, pairs):
+		with metrics.timed("reorder_lookup"):
+			reorder_by_pair = reorder_cache.get_many(pairs)
+
+		levels = {
+			pair: ReorderLevel(flt(reorder.warehouse_reorder_level), flt(reorder.warehouse_reorder_qty))
+			for pair, reorder in reorder_by_pair.items()
+			if reorder
+		}
+
+		horizon = consumption.get_cover_horizon()
+		monitored = [pair for pair, level in levels.items() if level.level > 0]
+		if horizon > 0 and monitored:
+			with metrics.timed("consumption_lookup"):
+				rates = consumption.get_rates(monitored)
+			for pair, rate in rates.items():
+				levels[pair] = levels[pair]._replace(level=cover_level(levels[pair].level, rate, horizon))
+		return levels
+
+	def get_projected_qty(self, pairs):
+		with metrics.timed("bin_read"):
+			projected = get_projected_qty_for_pairs(pairs)
+
+		if group_qty.is_enabled():
+			with metrics.timed("group_qty_read"):
+				projected.update(group_qty.get_projected_qty(pairs))
+		return projected
+
+	def get_states(self, pairs):
+		with metrics.timed("state_lookup"):
+			return alert_state.get_states(pairs)
+
+	def save_states(self, changes):
+		if not changes:
+			return
+
+		with metrics.timed("state_save"):
+			alert_state.save_states(changes)
+
+	def get_monitored(self, leaves):
+		from low_stock_alerts.api import get_monitored_warehouses_for_leaf
+
+		with metrics.timed("hierarchy"):
+			return {leaf: get_monitored_warehouses_for_leaf(leaf) for leaf in leaves}
+
+	def claim(self, low, monitored_by_leaf):
+		with metrics.timed("throttle"):
+			claimed = set(claim_alerts([row.pair for row in low], monitored_by_leaf))
+		return [row for row in low if row.pair in claimed]
+
+
+def get_projected_qty_for_pairs(pairs):
+	"""Return {(item_code, warehouse): projected_qty} for the given pairs in one query."""
+	if not pairs:
+		return {}
+
+	rows = frappe.db.sql(
+		"""
+        SELECT item_code, warehouse, projected_qty
+        FROM `tabBin`
+        WHERE item_code IN %(items)s AND warehouse IN %(warehouses)s
+        """,
+		{
+			"items": tuple({item_code for item_code, _w in pairs}),
+			"warehouses": tuple({warehouse for _i, warehouse in pairs}),
+		},
+		as_dict=True,
+	)
+	return {(r.item_code, r.warehouse): flt(r.projected_qty) for r in rows}
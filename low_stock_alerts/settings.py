@@ -0,0 +1,77 @@
+"""
+App settings, kept in the `Low Stock Alert Settings` single DocType.
+
+Each worker loads the settings once and keeps them until the version key in Redis
+changes; saving the settings bumps it. Within a request or job the loaded copy is reused
+without asking Redis again, so the hot path never reads settings per event.
+A `low_stock_alerts_<key>` entry in site config overrides the stored value.
+"""
+
+import frappe
+
+DOCTYPE = "Low Stock Alert Settings"
+VERSION_KEY = "low_stock_alerts:settings_version"
+
+# (version, settings) loaded by this process
+_loaded = None
+
+
+def get_setting(key, default=None):
+	"""Return an app setting from site config, else from the settings DocType, else `default`."""
+	value = frappe.conf.get(f"low_stock_alerts_{key}")
+	if value is None:
+		value = get_settings().get(key)
+	return default if value is None or value == "" else value
+
+
+def get_settings():
+	"""Return the stored settings, checking the version at most once per request or job."""
+	global _loaded
+
+	settings = getattr(frappe.local, "low_stock_alerts_settings", None)
+	if settings is not None:
+		return settings
+
+	version = frappe.cache().get_value(VERSION_KEY)
+	if version is None:
+		version = _bump_version()
+
+	if _loaded is None or _loaded[0] != version:
+		_loaded = (version, _load())
+
+	frappe.local.low_stock_alerts_settings = _loaded[1]
+	return _loaded[1]
+
+
+def clear_settings_cache():
+	"""Reload the settings here right away and in every other worker once the change commits."""
+	_forget()
+	frappe.db.after_commit.add(_bump_version)
+	frappe.db.after_rollback.add(_forget)
+
+
+def _load():
+	settings = frappe._dict(frappe.db.get_singles_dict(DOCTYPE, cast=True))
+	child_filters = {"parenttype": DOCTYPE, "parent": DOCTYPE}
+	settings.monitored_warehouses = frappe.db.get_all(
+		"Low Stock Monitored Warehouse", filters=child_filters, pluck="warehouse", order_by="idx"
+	)
+	settings.throttle_windows = {
+		d.warehouse: d.throttle_window
+		for d in frappe.db.get_all(
+			"Low Stock Throttle Window", filters=child_filters, fields=["warehouse", "throttle_window"]
+		)
+	}
+	return settings
+
+
+def _forget():
+	global _loaded
+	_loaded = None
+	frappe.local.low_stock_alerts_settings = None
+
+
+def _bump_version():
+	version = frappe.generate_hash(length=12)
+	frappe.cache().set_value(VERSION_KEY, version)
+	return version
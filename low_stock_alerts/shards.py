@@ -0,0 +1,253 @@
+"""
+Sharded fallback scan.
+
+With `fallback_shards` in Low Stock Alert Settings above 1, the fallback is split into
+that many shards: one per company (`fallback_shard_by` = "company") or contiguous
+lft/rgt ranges of the warehouse tree holding about the same number of reorder rows (the
+default, "subtree").
+
+Shards run as jobs on the long queue. Each job stores its low rows in Redis and
+decrements a counter for the run; the job that brings it to zero merges every shard's
+rows and sends one email per recipient. With `fallback_shard_mode` set to "pool",
+shards run in a local process pool instead and the caller merges the results.
+
+A shard saves its own snapshot rows and the state changes that alert nobody, but the
+escalations are saved by the merge, once their emails are queued. A shard that fails
+still counts down and the merge sends what the other shards found; its escalations are
+found again by the next run.
+"""
+
+import json
+from concurrent.futures import ProcessPoolExecutor
+
+import frappe
+from frappe.utils import cint
+
+from low_stock_alerts import metrics, outbox, snapshot
+from low_stock_alerts.alert_state import sweep_recovered
+from low_stock_alerts.profiling import profile
+from low_stock_alerts.settings import get_setting
+from low_stock_alerts.throttle import claim
+
+RUN_KEY = "low_stock_alerts:fallback_run"
+LOCK_KEY = "low_stock_alerts:fallback_run:lock"
+# Long enough for the slowest shard; an abandoned run frees the lock after this
+RUN_TTL = 6 * 60 * 60
+SHARD_SAVEPOINT = "low_stock_fallback_shard"
+
+
+def get_shard_count():
+	return cint(get_setting("fallback_shards", 0))
+
+
+def run_sharded_fallback(shards=None, by=None, mode=None, chunk_size=None):
+	"""
+	Split the fallback scan into shards and fan them out. Does nothing while a previous
+	sharded run is still in flight, so a slow scan never overlaps the next one.
+	"""
+	shards = cint(shards or get_shard_count())
+	by = by or get_setting("fallback_shard_by", "subtree")
+	mode = mode or get_setting("fallback_shard_mode", "queue")
+
+	plan = plan_shards(shards, by)
+	if not plan:
+		return
+
+	if not claim([(LOCK_KEY, RUN_TTL)])[0]:
+		metrics.get_logger().info("Sharded low-stock fallback still running, skipping this run")
+		metrics.incr("fallback:shard_run_skipped")
+		return
+
+	metrics.incr("fallback:shards", len(plan))
+	if mode == "pool":
+		try:
+			groups = []
+			with ProcessPoolExecutor(max_workers=len(plan)) as pool:
+				futures = [
+					pool.submit(
+						_scan_shard_in_process,
+						(frappe.local.site, frappe.local.sites_path, shard, chunk_size),
+					)
+					for shard in plan
+				]
+				for shard, future in zip(plan, futures, strict=True):
+					try:
+						groups.extend(future.result())
+					except Exception:
+						_shard_failed(shard)
+			merge_run(groups)
+		finally:
+			frappe.cache().delete_value(LOCK_KEY)
+		return
+
+	run_id = frappe.generate_hash(length=10)
+	cache = frappe.cache()
+	cache.set(cache.make_key(_run_key(run_id, "pending")), len(plan), ex=RUN_TTL)
+	for shard in plan:
+		frappe.enqueue(
+			"low_stock_alerts.shards.run_fallback_shard",
+			queue="long",
+			run_id=run_id,
+			shard=shard,
+			chunk_size=chunk_size,
+		)
+
+
+def plan_shards(shards, by="subtree"):
+	"""Return a list of shard filters for `iter_low_stock_chunks`, at most `shards` long."""
+	if by == "company":
+		companies = frappe.db.sql(
+			"""
+            SELECT DISTINCT company FROM `tabWarehouse`
+            WHERE is_group = 0 AND disabled = 0 AND IFNULL(company, '') != ''
+            ORDER BY company
+            """
+		)
+		return [{"company": company} for (company,) in companies]
+
+	# Reorder rows per enabled leaf, in tree order, to cut balanced lft/rgt ranges
+	leaves = frappe.db.sql(
+		"""
+        SELECT w.lft, w.rgt, COUNT(ir.name) AS weight
+        FROM `tabWarehouse` w
+        LEFT JOIN `tabItem Reorder` ir ON ir.warehouse = w.name AND ir.parenttype = 'Item'
+        WHERE w.is_group = 0 AND w.disabled = 0
+        GROUP BY w.name, w.lft, w.rgt
+        ORDER BY w.lft
+        """,
+		as_dict=True,
+	)
+	return split_ranges(leaves, shards)
+
+
+def split_ranges(leaves, shards):
+	"""
+	Cut `leaves` (dicts with lft, rgt and weight, in lft order) into at most `shards`
+	contiguous {"lft", "rgt"} ranges of roughly equal total weight.
+	"""
+	leaves = [leaf for leaf in leaves if leaf.weight]
+	if not leaves:
+		return []
+
+	shards = max(min(cint(shards), len(leaves)), 1)
+	target = sum(leaf.weight for leaf in leaves) / shards
+	ranges, start, cumulative = [], 0, 0
+	for i, leaf in enumerate(leaves):
+		cumulative += leaf.weight
+		if len(ranges) < shards - 1 and cumulative >= target * (len(ranges) + 1):
+			ranges.append({"lft": leaves[start].lft, "rgt": leaf.rgt})
+			start = i + 1
+
+	if start < len(leaves):
+		ranges.append({"lft": leaves[start].lft, "rgt": leaves[-1].rgt})
+	return ranges
+
+
+def scan_shard(shard, chunk_size=None):
+	"""Return `[warehouse, email_id, items]` for every warehouse in `shard` with low rows."""
+	from low_stock_alerts.api import iter_fallback_groups, iter_low_stock_chunks
+
+	with metrics.timed("fallback_shard"):
+		chunks = iter_low_stock_chunks(chunk_size, shard=shard)
+		return [
+			[warehouse, email_id, items]
+			for warehouse, email_id, items in iter_fallback_groups(chunks, defer_alerts=True)
+		]
+
+
+def run_fallback_shard(run_id, shard, chunk_size=None):
+	"""Long-queue job: scan one shard, store its rows and merge the run if it was the last shard."""
+	try:
+		frappe.db.savepoint(SHARD_SAVEPOINT)
+		try:
+			with profile("fallback_shard"):
+				groups = scan_shard(shard, chunk_size)
+		except Exception:
+			# Count the shard down anyway, so the run still merges what the others found and frees its lock
+			frappe.db.rollback(save_point=SHARD_SAVEPOINT)
+			_shard_failed(shard)
+			groups = []
+		_finish_shard(run_id, groups)
+	finally:
+		metrics.flush()
+
+
+def _finish_shard(run_id, groups):
+	"""Store the rows of a finished shard; the last shard of the run merges them all."""
+	cache = frappe.cache()
+	pipe = cache.pipeline(transaction=True)
+	if groups:
+		pipe.hset(
+			cache.make_key(_run_key(run_id, "groups")),
+			mapping={group[0]: json.dumps(group, default=str) for group in groups},
+		)
+		pipe.expire(cache.make_key(_run_key(run_id, "groups")), RUN_TTL)
+	pipe.decr(cache.make_key(_run_key(run_id, "pending")))
+	remaining = pipe.execute()[-1]
+
+	if remaining <= 0:
+		try:
+			merge_run(_take_run(run_id))
+		finally:
+			cache.delete_value(LOCK_KEY)
+
+
+def _shard_failed(shard):
+	metrics.incr("fallback:shard_failed")
+	metrics.get_logger().warning("Low stock fallback shard %s failed", shard, exc_info=True)
+
+
+def _take_run(run_id):
+	"""Atomically read and clear the rows stored by every shard of `run_id`."""
+	cache = frappe.cache()
+	groups_key = cache.make_key(_run_key(run_id, "groups"))
+	pipe = cache.pipeline(transaction=True)
+	pipe.hgetall(groups_key)
+	pipe.delete(groups_key, cache.make_key(_run_key(run_id, "pending")))
+	stored, _deleted = pipe.execute()
+	return [json.loads(value) for value in (stored or {}).values()]
+
+
+def merge_run(groups):
+	"""Send the merged emails of a run, save their escalations and sweep what recovered."""
+	from low_stock_alerts.api import save_alerted
+
+	send_merged(groups)
+	save_alerted(groups)
+	sweep_recovered()
+	snapshot.sweep()
+
+
+def send_merged(groups):
+	"""Send one email per recipient for `[warehouse, email_id, items]` groups from all shards."""
+	from low_stock_alerts.api import send_low_stock_email
+
+	by_recipient = {}
+	for warehouse, email_id, items in groups:
+		metrics.incr("fallback:low_rows", len(items))
+		if email_id:
+			by_recipient.setdefault(email_id, {})[warehouse] = items
+
+	with outbox.collect():
+		for recipient, items_by_warehouse in by_recipient.items():
+			warehouses = sorted(items_by_warehouse)
+			items = [item for warehouse in warehouses for item in items_by_warehouse[warehouse]]
+			send_low_stock_email(items, recipient, ", ".join(warehouses))
+
+
+def _scan_shard_in_process(args):
+	site, sites_path, shard, chunk_size = args
+	frappe.init(site=site, sites_path=sites_path)
+	try:
+		frappe.connect()
+		groups = scan_shard(shard, chunk_size)
+		# Keep the shard's snapshot rows and quiet state changes; the caller saves its escalations
+		frappe.db.commit()
+		return groups
+	finally:
+		metrics.flush()
+		frappe.destroy()
+
+
+def _run_key(run_id, name):
+	return f"{RUN_KEY}:{run_id}:{name}"
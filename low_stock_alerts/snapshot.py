@@ -0,0 +1,204 @@
+"""
+What is low right now, kept in `Low Stock Snapshot`.
+
+One row per (item, warehouse) whose projected qty is at or below its effective reorder
+level, with the item name and the numbers the check used. The
+event path upserts the pairs it found low and deletes the other pairs it checked; every
+fallback scan upserts the low rows it reads and `sweep` drops the rows that recovered
+without an event. Reading the shortage is then an indexed query over a table as small as
+the shortage itself, paged by `(warehouse, item_code)`, instead of a scan of Item
+Reorder and Bin.
+
+A warehouse group is matched against the current lft/rgt of `tabWarehouse` when rows are
+read, so a warehouse moved to another group is filed under it right away.
+"""
+
+import frappe
+from frappe.utils import cint, now
+
+from low_stock_alerts.alert_state import get_critical_ratio
+from low_stock_alerts.engine import classify
+from low_stock_alerts.lookup_cache import item_cache
+
+DOCTYPE = "Low Stock Snapshot"
+WRITE_CHUNK_SIZE = 1000
+MAX_PAGE_LENGTH = 1000
+
+FIELDS = (
+	"item_code",
+	"item_name",
+	"warehouse",
+	"state",
+	"projected_qty",
+	"reorder_level",
+	"reorder_qty",
+	"shortfall",
+	"modified",
+)
+
+
+def update(pairs, low):
+	"""Event path: store `low` (`LowStock` rows) and delete the other checked `pairs`."""
+	low_pairs = {row.pair for row in low}
+	_delete([pair for pair in dict.fromkeys(pairs) if pair not in low_pairs])
+	save(low)
+
+
+def save(low, item_names=None):
+	"""Upsert `low` (`LowStock` rows). `item_names` maps item codes to names; looked up if missing."""
+	if not low:
+		return
+
+	if item_names is None:
+		items = item_cache.get_many(list({row.item_code for row in low}))
+		item_names = {item_code: item.item_name for item_code, item in items.items() if item}
+
+	critical_ratio = get_critical_ratio()
+	_upsert(
+		[
+			(
+				row.item_code,
+				item_names.get(row.item_code),
+				row.warehouse,
+				classify(row.projected_qty, row.reorder_level, critical_ratio=critical_ratio),
+				row.projected_qty,
+				row.reorder_level,
+				row.reorder_qty,
+				row.shortfall,
+			)
+			for row in low
+		]
+	)
+
+
+def sweep():
+	"""
+	Delete the rows of pairs that are no longer low or no longer scanned: above their
+	reorder level, without one, or with the item or warehouse disabled. Runs after each
+	fallback scan, which only upserts the rows that are low.
+	"""
+	from low_stock_alerts.consumption import cover_params, reorder_level_sql
+	from low_stock_alerts.group_qty import projected_qty_sql
+
+	joins, reorder_level = reorder_level_sql("ir")
+	group_joins, projected_qty = projected_qty_sql("ir", "b")
+	names = frappe.db.sql_list(
+		f"""
+        SELECT s.name
+        FROM `tab{DOCTYPE}` s
+        LEFT JOIN `tabItem Reorder` ir
+            ON ir.parent = s.item_code AND ir.warehouse = s.warehouse AND ir.parenttype = 'Item'
+        LEFT JOIN `tabItem` i ON i.name = s.item_code
+        LEFT JOIN `tabWarehouse` w ON w.name = s.warehouse
+        LEFT JOIN `tabBin` b ON b.item_code = s.item_code AND b.warehouse = s.warehouse
+        {joins}
+        {group_joins}
+        WHERE
+            IFNULL(ir.warehouse_reorder_level, 0) <= 0
+            OR IFNULL(i.disabled, 1) = 1
+            OR IFNULL(i.is_stock_item, 0) = 0
+            OR (i.end_of_life IS NOT NULL AND i.end_of_life != '0000-00-00' AND i.end_of_life <= %(today)s)
+            OR IFNULL(w.disabled, 1) = 1
+            OR {projected_qty} > {reorder_level}
+        """,
+		cover_params(),
+	)
+	for start in range(0, len(names), WRITE_CHUNK_SIZE):
+		frappe.db.delete(DOCTYPE, {"name": ("in", names[start : start + WRITE_CHUNK_SIZE])})
+	return len(names)
+
+
+def get_rows(warehouse=None, item_code=None, state=None, after=None, start=0, limit=100):
+	"""
+	Return snapshot rows as dicts ordered by warehouse and item. `warehouse` may be a
+	group, which matches every warehouse under it. Page with `after`, the
+	`(warehouse, item_code)` of the last row already read, or with an offset `start`.
+	"""
+	joins, conditions = "", []
+	values = {"limit": max(min(cint(limit) or 100, MAX_PAGE_LENGTH), 1), "start": cint(start)}
+	if warehouse:
+		# A leaf's own range holds only itself
+		joins = """
+            INNER JOIN `tabWarehouse` w ON w.name = s.warehouse
+            INNER JOIN `tabWarehouse` g ON g.name = %(warehouse)s AND w.lft >= g.lft AND w.rgt <= g.rgt
+        """
+		values["warehouse"] = warehouse
+	if item_code:
+		conditions.append("s.item_code = %(item_code)s")
+		values["item_code"] = item_code
+	if state:
+		conditions.append("s.state = %(state)s")
+		values["state"] = state
+	if after:
+		conditions.append("(s.warehouse, s.item_code) > (%(after_warehouse)s, %(after_item)s)")
+		values["after_warehouse"], values["after_item"] = after
+
+	return frappe.db.sql(
+		f"""
+        SELECT {", ".join(f"s.{field}" for field in FIELDS)}
+        FROM `tab{DOCTYPE}` s
+        {joins}
+        {"WHERE " + " AND ".join(conditions) if conditions else ""}
+        ORDER BY s.warehouse, s.item_code
+        LIMIT %(limit)s OFFSET %(start)s
+        """,
+		values,
+		as_dict=True,
+	)
+
+
+@frappe.whitelist()
+def get_low_stock(
+	warehouse: str | None = None,
+	item_code: str | None = None,
+	state: str | None = None,
+	after_warehouse: str | None = None,
+	after_item: str | None = None,
+	limit: int = 100,
+) -> dict:
+	"""
+	One page of the pairs that are low now, from the snapshot. Pass the returned `next`
+	back as arguments for the following page; it is None on the last one.
+	"""
+	frappe.has_permission(DOCTYPE, "read", throw=True)
+
+	limit = max(min(cint(limit) or 100, MAX_PAGE_LENGTH), 1)
+	after = (after_warehouse, after_item or "") if after_warehouse else None
+	rows = get_rows(warehouse, item_code, state, after=after, limit=limit)
+
+	next_page = None
+	if len(rows) == limit:
+		next_page = {"after_warehouse": rows[-1].warehouse, "after_item": rows[-1].item_code}
+	return {"rows": rows, "next": next_page}
+
+
+def _upsert(rows):
+	timestamp, user = now(), frappe.session.user
+	for start in range(0, len(rows), WRITE_CHUNK_SIZE):
+		chunk = rows[start : start + WRITE_CHUNK_SIZE]
+		values = []
+		for row in chunk:
+			values.extend((frappe.generate_hash(length=10), timestamp, timestamp, user, user, *row))
+
+		frappe.db.sql(
+			f"""
+            INSERT INTO `tab{DOCTYPE}` (
+                name, creation, modified, owner, modified_by, item_code, item_name, warehouse,
+                state, projected_qty, reorder_level, reorder_qty, shortfall
+            )
+            VALUES {", ".join(["(%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)"] * len(chunk))}
+            ON DUPLICATE KEY UPDATE
+                item_name = VALUES(item_name), state = VALUES(state),
+                projected_qty = VALUES(projected_qty), reorder_level = VALUES(reorder_level),
+                reorder_qty = VALUES(reorder_qty), shortfall = VALUES(shortfall), modified = VALUES(modified)
+            """,
+			values,
+		)
+
+
+def _delete(pairs):
+	for start in range(0, len(pairs), WRITE_CHUNK_SIZE):
+		frappe.db.sql(
+			f"DELETE FROM `tab{DOCTYPE}` WHERE (item_code, warehouse) IN %(pairs)s",
+			{"pairs": tuple(pairs[start : start + WRITE_CHUNK_SIZE])},
+		)
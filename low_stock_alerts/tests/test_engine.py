@@ -0,0 +1,156 @@
+from datetime import date, timedelta
+from unittest.mock import patch
+
+from frappe.tests import UnitTestCase
+
+from low_stock_alerts import engine
+from low_stock_alerts.engine import (
+	CRITICAL,
+	LOW,
+	OK,
+	AlertState,
+	ReorderLevel,
+	SnapshotProvider,
+	add_consumption,
+	classify,
+	cover_level,
+	evaluate,
+	evaluate_columns,
+	find_low_stock,
+	group_runs,
+)
+
+
+class TestEngine(UnitTestCase):
+	def setUp(self):
+		self.provider = SnapshotProvider(
+			reorder_levels={
+				("ITEM-1", "Store 1"): ReorderLevel(10, 5),
+				("ITEM-2", "Store 1"): ReorderLevel(10, 5),
+				("ITEM-1", "Store 2"): ReorderLevel(10, 5),
+				("ITEM-3", "Store 2"): ReorderLevel(0, 0),
+			},
+			projected_qty={
+				("ITEM-1", "Store 1"): 4,
+				("ITEM-2", "Store 1"): 50,
+				("ITEM-3", "Store 2"): 0,
+			},
+			monitored_by_leaf={"Store 1": ["Region A"], "Store 2": ["Region A", "Store 2"]},
+		)
+
+	def test_find_low_stock_treats_missing_bin_as_zero(self):
+		low = find_low_stock(
+			[("ITEM-1", "Store 2"), ("ITEM-2", "Store 1")],
+			self.provider.reorder_levels,
+			self.provider.projected_qty,
+		)
+		self.assertEqual([row.pair for row in low], [("ITEM-1", "Store 2")])
+		self.assertEqual(low[0].projected_qty, 0)
+
+	def test_evaluate_groups_by_monitored_warehouse(self):
+		pairs = [("ITEM-1", "Store 1"), ("ITEM-2", "Store 1"), ("ITEM-1", "Store 2"), ("ITEM-3", "Store 2")]
+		result = evaluate(pairs, self.provider)
+
+		self.assertEqual(
+			{alert.monitored_warehouse: [row.pair for row in alert.items] for alert in result.alerts},
+			{
+				"Region A": [("ITEM-1", "Store 1"), ("ITEM-1", "Store 2")],
+				"Store 2": [("ITEM-1", "Store 2")],
+			},
+		)
+		self.assertEqual(
+			result.counts,
+			{"pairs": 4, "no_reorder_level": 1, "above_reorder_level": 1, "already_low": 0, "throttled": 0},
+		)
+
+	def test_evaluate_skips_throttled_pairs(self):
+		self.provider.throttled = {("ITEM-1", "Store 1")}
+		result = evaluate([("ITEM-1", "Store 1"), ("ITEM-1", "Store 1")], self.provider)
+
+		self.assertEqual(result.alerts, [])
+		self.assertEqual(result.counts["pairs"], 1)
+		self.assertEqual(result.counts["throttled"], 1)
+
+	def test_throttled_escalation_alerts_after_the_window(self):
+		pair = ("ITEM-1", "Store 1")
+		self.provider.throttled = {pair}
+		throttled = evaluate([pair], self.provider)
+		self.provider.save_states(throttled.state_changes)
+		self.assertEqual(throttled.state_changes, [])
+		self.assertEqual(self.provider.states, {})
+
+		self.provider.throttled = set()
+		result = evaluate([pair], self.provider)
+		self.assertEqual([row.pair for alert in result.alerts for row in alert.items], [pair])
+		self.assertEqual(result.counts["already_low"], 0)
+
+	def test_evaluate_columns_with_and_without_numpy(self):
+		projected = [4, 12, 0, 10, 3]
+		levels = [10, 10, 0, 10, -1]
+		expected = ([0, 3], [6, 0])
+
+		with patch("low_stock_alerts.engine.numpy", None):
+			self.assertEqual(evaluate_columns(projected, levels), expected)
+
+		if engine.numpy is not None:
+			with patch("low_stock_alerts.engine.VECTORISE_MIN_ROWS", 0):
+				self.assertEqual(evaluate_columns(projected, levels), expected)
+
+	def test_group_runs(self):
+		self.assertEqual(
+			group_runs(["Store 1", "Store 1", "Store 2", "Store 3", "Store 3"]),
+			[("Store 1", 0, 2), ("Store 2", 2, 3), ("Store 3", 3, 5)],
+		)
+		self.assertEqual(group_runs([]), [])
+
+	def test_classify_with_recovery_band(self):
+		self.assertEqual(classify(0, 10), CRITICAL)
+		self.assertEqual(classify(4, 10), LOW)
+		self.assertEqual(classify(4, 10, critical_ratio=0.5), CRITICAL)
+		self.assertEqual(classify(10.5, 10, OK, recovery_band=0.1), OK)
+		self.assertEqual(classify(10.5, 10, LOW, recovery_band=0.1), LOW)
+		self.assertEqual(classify(10.5, 10, CRITICAL, recovery_band=0.1), LOW)
+		self.assertEqual(classify(11.5, 10, LOW, recovery_band=0.1), OK)
+
+	def test_evaluate_alerts_only_on_worse_state(self):
+		pairs = [("ITEM-1", "Store 1"), ("ITEM-1", "Store 2")]
+		first = evaluate(pairs, self.provider)
+		self.provider.save_states(first.state_changes)
+		self.assertEqual(len(first.alerts), 2)
+
+		second = evaluate(pairs, self.provider)
+		self.assertEqual(second.alerts, [])
+		self.assertEqual(second.state_changes, [])
+		self.assertEqual(second.counts["already_low"], 2)
+
+		# Store 1 runs out, Store 2 recovers past the band
+		self.provider.projected_qty.update({("ITEM-1", "Store 1"): 0, ("ITEM-1", "Store 2"): 20})
+		third = evaluate(pairs, self.provider, recovery_band=0.1)
+		self.assertEqual([row.pair for alert in third.alerts for row in alert.items], [("ITEM-1", "Store 1")])
+		self.assertEqual(third.alerts[0].items[0].state, CRITICAL)
+
+		self.provider.save_states(third.state_changes)
+		self.assertEqual(self.provider.states, {("ITEM-1", "Store 1"): AlertState(CRITICAL)})
+
+	def test_add_consumption_tracks_a_steady_rate(self):
+		start = date(2026, 1, 1)
+		rate, last_date = 0, None
+		for day in range(60):
+			rate, last_date = add_consumption(rate, last_date, 10, start + timedelta(days=day), 7)
+
+		self.assertEqual(last_date, start + timedelta(days=59))
+		self.assertAlmostEqual(rate, 10, delta=0.5)
+
+		# A backdated entry counts less and does not move the date; its reversal takes it back
+		backdated, backdated_date = add_consumption(rate, last_date, 70, start + timedelta(days=52), 7)
+		self.assertAlmostEqual(backdated, rate + 70 * 0.0990 / 2, delta=0.01)
+		self.assertEqual(backdated_date, last_date)
+		reversed_rate, _date = add_consumption(backdated, last_date, -70, start + timedelta(days=52), 7)
+		self.assertAlmostEqual(reversed_rate, rate)
+
+		self.assertEqual(add_consumption(1, last_date, -100, last_date, 7)[0], 0)
+
+	def test_cover_level(self):
+		self.assertEqual(cover_level(10, 2, 14), 28)
+		self.assertEqual(cover_level(10, 0.5, 14), 10)
+		self.assertEqual(cover_level(10, 2, 0), 10)
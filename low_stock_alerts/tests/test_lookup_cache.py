@@ -0,0 +1,130 @@
+from unittest.mock import patch
+
+import frappe
+from frappe.tests import IntegrationTestCase
+
+from low_stock_alerts import metrics
+from low_stock_alerts.lookup_cache import LookupCache
+
+
+class TestLookupCache(IntegrationTestCase):
+	def setUp(self):
+		frappe.cache().flushall()
+		metrics.discard()
+		self.next_request()
+		self.loads = []
+		self.cache = LookupCache(f"test_{frappe.generate_hash(length=6)}", self.loader)
+
+	def loader(self, keys):
+		self.loads.append(list(keys))
+		return {key: {"value": key[0]} for key in keys if key[0] != "missing"}
+
+	def next_request(self):
+		frappe.local.low_stock_alerts_lookup_synced = None
+
+	def test_misses_are_loaded_in_bulk_and_then_served_locally(self):
+		keys = [("a", "wh"), ("b", "wh"), ("missing", "wh")]
+
+		first = self.cache.get_many(keys)
+		second = self.cache.get_many(keys)
+
+		self.assertEqual(self.loads, [keys])
+		self.assertEqual(first, second)
+		self.assertIsNone(first[("missing", "wh")])
+		self.assertEqual(self.cache.stats, {"local_hits": 3, "redis_hits": 0, "misses": 3})
+
+	def test_redis_level_is_shared_between_processes(self):
+		self.cache.get_many([("a", "wh")])
+		other = LookupCache(self.cache.namespace, self.loader)
+
+		self.assertEqual(other.get(("a", "wh")), {"value": "a"})
+		self.assertEqual(len(self.loads), 1)
+		self.assertEqual(other.stats["redis_hits"], 1)
+
+	def test_invalidate_reloads_only_dropped_keys(self):
+		self.cache.get_many([("a", "wh"), ("b", "wh")])
+		self.cache.invalidate([("a", "wh")])
+
+		self.cache.get_many([("a", "wh"), ("b", "wh")])
+		self.assertEqual(self.loads[-1], [("a", "wh")])
+
+	def test_invalidate_keeps_other_keys_in_every_process(self):
+		keys = [("a", "wh"), ("b", "wh")]
+		self.cache.get_many(keys)
+		other = LookupCache(self.cache.namespace, self.loader)
+		other.get_many(keys)
+
+		self.cache.invalidate([("a", "wh")])
+		self.next_request()
+		other.get_many(keys)
+
+		self.assertEqual(self.loads[-1], [("a", "wh")])
+		self.assertEqual(other.stats, {"local_hits": 1, "redis_hits": 2, "misses": 1})
+
+	def test_load_raced_by_an_invalidation_is_not_written_back(self):
+		def loader(keys):
+			found = self.loader(keys)
+			# The row changes and its save commits while the loader still holds the old value
+			self.cache.invalidate(keys)
+			return found
+
+		racing = LookupCache(self.cache.namespace, loader)
+		self.assertEqual(racing.get(("a", "wh")), {"value": "a"})
+
+		self.assertEqual(self.cache.get(("a", "wh")), {"value": "a"})
+		self.assertEqual(len(self.loads), 2)
+
+	def test_hash_expiry_is_set_when_the_hash_is_created(self):
+		hash_key = frappe.cache().make_key(self.cache.hash_key)
+		self.cache.get_many([("a", "wh")])
+		frappe.cache().expire(hash_key, 60)
+
+		self.cache.get_many([("b", "wh")])
+		self.assertLessEqual(frappe.cache().ttl(hash_key), 60)
+
+	def test_sequence_is_checked_once_per_request(self):
+		keys = [("a", "wh"), ("b", "wh")]
+		self.cache.get_many(keys)
+		other = LookupCache(self.cache.namespace, self.loader)
+		other.get_many(keys)
+
+		self.cache.invalidate([("a", "wh")])
+		with patch.object(frappe.cache(), "get", wraps=frappe.cache().get) as get:
+			self.assertEqual(other.get_many(keys), {key: {"value": key[0]} for key in keys})
+			get.assert_not_called()
+
+		self.next_request()
+		other.get_many(keys)
+		self.assertEqual(self.loads[-1], [("a", "wh")])
+
+	def test_counts_are_written_with_the_metrics_flush(self):
+		self.cache.get_many([("a", "wh")])
+		self.cache.get_many([("a", "wh")])
+		self.assertFalse(frappe.cache().exists(metrics.COUNTS_KEY))
+
+		metrics.flush()
+		pipe = frappe.cache().pipeline()
+		pipe.hgetall(frappe.cache().make_key(metrics.COUNTS_KEY))
+		(counts,) = pipe.execute()
+		prefix = f"lookup:{self.cache.namespace}"
+		self.assertEqual(int(counts[f"{prefix}:local_hits".encode()]), 1)
+		self.assertEqual(int(counts[f"{prefix}:misses".encode()]), 1)
+
+	def test_process_behind_the_invalidation_log_reloads_everything(self):
+		keys = [("a", "wh"), ("b", "wh"), ("c", "wh")]
+		self.cache.get_many(keys)
+		other = LookupCache(self.cache.namespace, self.loader)
+		other.get_many(keys)
+
+		with patch("low_stock_alerts.lookup_cache.INVALIDATION_LOG_SIZE", 1):
+			self.cache.invalidate([("a", "wh"), ("b", "wh")])
+			self.next_request()
+			other.get_many(keys)
+
+		self.assertEqual(other.stats["local_hits"], 0)
+		self.assertEqual(other.stats["redis_hits"], 4)
+
+	def test_lru_is_bounded(self):
+		with patch.dict(frappe.conf, {"low_stock_alerts_lookup_cache_size": 2}):
+			self.cache.get_many([("a", "wh"), ("b", "wh"), ("c", "wh")])
+			self.assertEqual(len(self.cache._local), 2)
@@ -3,6 +3,9 @@ from frappe.tests import IntegrationTestCase
 from unittest.mock import patch
 
 import low_stock_alerts.api as api
+import low_stock_alerts.shards as shards
+from low_stock_alerts import admission
+from low_stock_alerts.admission import rebuild_admission_index
 from low_stock_alerts.api import (
     on_sle_update,
     check_and_alert_low_stock,
@@ -12,6 +15,11 @@ from low_stock_alerts.api import (
 )
 
 
+def sent(mock_insert):
+    """Emails handed to the mocked `outbox.insert_emails`, in order."""
+    return [email for c in mock_insert.call_args_list for email in c.args[0]]
+
+
 class TestLowStockAlerts(IntegrationTestCase):
 
     def setUp(self):
@@ -64,6 +72,7 @@ class TestLowStockAlerts(IntegrationTestCase):
             "warehouse_reorder_qty": 5,
         })
         self.item.save()
+        rebuild_admission_index()
 
         from erpnext.stock.utils import get_or_make_bin
         self.bin1 = get_or_make_bin(self.item.name, self.wh1.name)
@@ -104,42 +113,270 @@ class TestLowStockAlerts(IntegrationTestCase):
         sle.warehouse = self.wh1.name
 
         on_sle_update(sle, "on_update")
+        api.enqueue_pending_checks()
+
+        mock_enqueue.assert_called_once()
+
+    @patch("frappe.enqueue")
+    def test_on_sle_update_batches_voucher_pairs(self, mock_enqueue):
+        for warehouse in (self.wh1.name, self.wh2.name, self.wh1.name):
+            sle = frappe.new_doc("Stock Ledger Entry")
+            sle.docstatus = 1
+            sle.is_cancelled = 0
+            sle.item_code = self.item.name
+            sle.warehouse = warehouse
+            sle.actual_qty = -1
+            on_sle_update(sle, "on_submit")
+
+        api.enqueue_pending_checks()
+
+        mock_enqueue.assert_called_once()
+        self.assertEqual(
+            sorted(map(tuple, mock_enqueue.call_args.kwargs["pairs"])),
+            sorted([(self.item.name, self.wh1.name), (self.item.name, self.wh2.name)]),
+        )
+
+        # Pairs already waiting on the queue are not enqueued again
+        on_sle_update(sle, "on_submit")
+        api.enqueue_pending_checks()
+        mock_enqueue.assert_called_once()
+
+    @patch("frappe.enqueue")
+    def test_on_sle_update_skips_increase(self, mock_enqueue):
+        sle = frappe.new_doc("Stock Ledger Entry")
+        sle.docstatus = 1
+        sle.is_cancelled = 0
+        sle.item_code = self.item.name
+        sle.warehouse = self.wh1.name
+        sle.actual_qty = 10
+
+        on_sle_update(sle, "on_submit")
+        api.enqueue_pending_checks()
+
+        mock_enqueue.assert_not_called()
+
+    @patch("low_stock_alerts.outbox.insert_emails")
+    @patch("frappe.enqueue")
+    def test_restock_clears_state_so_the_next_drop_alerts(self, mock_enqueue, mock_insert):
+        check_and_alert_low_stock(self.item.name, self.wh1.name)
+        self.assertEqual(len(sent(mock_insert)), 1)
+
+        sle = frappe.new_doc("Stock Ledger Entry")
+        sle.docstatus = 1
+        sle.is_cancelled = 0
+        sle.item_code = self.item.name
+        sle.warehouse = self.wh1.name
+        sle.actual_qty = 15
+        frappe.db.set_value("Bin", self.bin1, "projected_qty", 20)
+
+        # A restock of a LOW pair is checked and moves it back to OK
+        on_sle_update(sle, "on_submit")
+        api.enqueue_pending_checks()
+        mock_enqueue.assert_called_once()
+        api.check_and_alert_low_stock_batch(mock_enqueue.call_args.kwargs["pairs"])
+        self.assertFalse(
+            frappe.db.exists("Low Stock Alert State", {"item_code": self.item.name, "warehouse": self.wh1.name})
+        )
+
+        frappe.cache().delete_keys("low_stock_alert:")
+        frappe.db.set_value("Bin", self.bin1, "projected_qty", 5)
+        check_and_alert_low_stock(self.item.name, self.wh1.name)
+        self.assertEqual(len(sent(mock_insert)), 2)
+
+    @patch("frappe.enqueue")
+    def test_on_sle_update_skips_pairs_without_reorder_level(self, mock_enqueue):
+        wh3 = frappe.get_doc({
+            "doctype": "Warehouse",
+            "warehouse_name": f"Test Leaf WH3 {frappe.generate_hash(length=4)}",
+            "company": self.company,
+            "parent_warehouse": self.group_wh.name,
+        }).insert()
+
+        sle = frappe.new_doc("Stock Ledger Entry")
+        sle.docstatus = 1
+        sle.is_cancelled = 0
+        sle.item_code = self.item.name
+        sle.warehouse = wh3.name
+        sle.actual_qty = -1
+
+        on_sle_update(sle, "on_submit")
+        api.enqueue_pending_checks()
+        mock_enqueue.assert_not_called()
+
+        # Once Redis lost the index every pair is admitted, even if an Item save added some back
+        frappe.cache().delete_value("low_stock_alerts:monitored_pairs")
+        admission._apply({(self.item.name, self.wh1.name)}, set())
+        on_sle_update(sle, "on_submit")
+        api.enqueue_pending_checks()
+        self.assertIn(
+            [[self.item.name, wh3.name]],
+            [c.kwargs.get("pairs") for c in mock_enqueue.call_args_list],
+        )
+
+    def _order_update(self, *warehouses):
+        """A submitted order for the test item; ERPNext has already moved projected qty in Bin."""
+        doc = frappe._dict(items=[frappe._dict(item_code=self.item.name, warehouse=wh) for wh in warehouses])
+        api.on_order_update(doc, "on_submit")
+
+    @patch("frappe.enqueue")
+    def test_order_update_queues_check_only_on_state_change(self, mock_enqueue):
+        from low_stock_alerts.alert_state import save_states
+        from low_stock_alerts.engine import LOW, StateChange
+
+        with patch.dict(frappe.conf, {"low_stock_alerts_order_trigger": 1}):
+            # WH1 stays OK; WH2 is already LOW and still is
+            frappe.db.set_value("Bin", self.bin1, "projected_qty", 20)
+            save_states([StateChange(self.item.name, self.wh2.name, LOW, 8, True)])
+            self._order_update(self.wh1.name, self.wh2.name)
+            api.enqueue_pending_checks()
+            mock_enqueue.assert_not_called()
+
+            frappe.db.set_value("Bin", self.bin1, "projected_qty", 5)
+            self._order_update(self.wh1.name, self.wh2.name)
+            api.enqueue_pending_checks()
 
         mock_enqueue.assert_called_once()
+        self.assertEqual(mock_enqueue.call_args.kwargs["pairs"], [[self.item.name, self.wh1.name]])
 
-    @patch("frappe.sendmail")
-    def test_check_and_alert_low_stock_sends_email(self, mock_sendmail):
+    @patch("frappe.enqueue")
+    def test_order_trigger_disabled_by_default(self, mock_enqueue):
+        self._order_update(self.wh1.name)
+        api.enqueue_pending_checks()
+        mock_enqueue.assert_not_called()
+
+    @patch("low_stock_alerts.outbox.insert_emails")
+    def test_check_and_alert_low_stock_sends_email(self, mock_insert):
         check_and_alert_low_stock(self.item.name, self.wh1.name)
-        mock_sendmail.assert_called_once()
-        self.assertEqual(mock_sendmail.call_args.kwargs["recipients"], "group@example.com")
+        self.assertEqual(len(sent(mock_insert)), 1)
+        self.assertEqual(sent(mock_insert)[0].recipient, "group@example.com")
 
-    @patch("frappe.sendmail")
-    def test_check_and_alert_no_email_when_above_level(self, mock_sendmail):
+    @patch("low_stock_alerts.outbox.insert_emails")
+    def test_check_and_alert_no_email_when_above_level(self, mock_insert):
         frappe.db.set_value("Bin", self.bin1, "projected_qty", 50)
         check_and_alert_low_stock(self.item.name, self.wh1.name)
-        mock_sendmail.assert_not_called()
+        mock_insert.assert_not_called()
+
+    @patch("low_stock_alerts.outbox.insert_emails")
+    def test_days_of_cover_raises_reorder_level(self, mock_insert):
+        from frappe.utils import add_days, nowdate
+
+        from low_stock_alerts import consumption
+
+        frappe.db.set_value("Bin", self.bin1, "projected_qty", 50)
+        with patch.dict(frappe.conf, {"low_stock_alerts_cover_horizon_days": 14}):
+            for days_ago in range(30, -1, -1):
+                sle = frappe.new_doc("Stock Ledger Entry")
+                sle.docstatus = 1
+                sle.is_cancelled = 0
+                sle.item_code = self.item.name
+                sle.warehouse = self.wh1.name
+                sle.actual_qty = -10
+                sle.posting_date = add_days(nowdate(), -days_ago)
+                on_sle_update(sle, "on_submit")
+            consumption.flush()
+
+            rate = consumption.get_rates([(self.item.name, self.wh1.name)])[(self.item.name, self.wh1.name)]
+            self.assertAlmostEqual(rate, 10, delta=1)
+
+            # 50 units cover five days of consumption, fewer than the horizon
+            check_and_alert_low_stock(self.item.name, self.wh1.name)
+            self.assertEqual(len(sent(mock_insert)), 1)
+
+            # The order hook compares against the same raised level
+            api._clear_pending_checks()
+            frappe.db.delete("Low Stock Alert State")
+            frappe.db.set_value("Bin", self.bin1, "projected_qty", 100)
+            with (
+                patch.dict(frappe.conf, {"low_stock_alerts_order_trigger": 1}),
+                patch("frappe.enqueue") as mock_enqueue,
+            ):
+                self._order_update(self.wh1.name)
+                api.enqueue_pending_checks()
+            mock_enqueue.assert_called_once()
+
+    @patch("low_stock_alerts.outbox.insert_emails")
+    @patch("frappe.enqueue")
+    def test_group_threshold_checks_group_total(self, mock_enqueue, mock_insert):
+        from low_stock_alerts import group_qty
+
+        self.item.reorder_levels[0].warehouse_group = self.group_wh.name
+        self.item.save()
+        group_key = (self.item.name, self.group_wh.name)
+
+        with patch.dict(frappe.conf, {"low_stock_alerts_group_thresholds": 1}):
+            # WH1 holds 5 of its 10, but the group holds 13
+            check_and_alert_low_stock(self.item.name, self.wh1.name)
+            self.assertEqual(sent(mock_insert), [])
+            self.assertNotIn(
+                (self.item.name, self.wh1.name),
+                {(row.item_code, row.warehouse) for row in api.iter_low_stock_rows()},
+            )
 
-    @patch("frappe.sendmail")
-    def test_throttling_prevents_duplicate_emails(self, mock_sendmail):
+            # A delivery against a Sales Order moves actual and reserved qty, not projected qty
+            sle = frappe.new_doc("Stock Ledger Entry")
+            sle.docstatus = 1
+            sle.is_cancelled = 0
+            sle.item_code = self.item.name
+            sle.warehouse = self.wh2.name
+            sle.actual_qty = -3
+            on_sle_update(sle, "on_submit")
+            group_qty.flush()
+            self.assertEqual(group_qty.get_totals([group_key]), {group_key: 13})
+            self.assertNotIn((self.item.name, self.wh1.name), frappe.flags.low_stock_pending_checks)
+
+            # Taking 8 out of WH2 lowers the group total and queues a check of WH1's row
+            frappe.db.set_value("Bin", self.bin2, "projected_qty", 0)
+            sle.actual_qty = -8
+            on_sle_update(sle, "on_submit")
+            group_qty.flush()
+            self.assertEqual(group_qty.get_totals([group_key]), {group_key: 5})
+
+            api.enqueue_pending_checks()
+            self.assertIn([self.item.name, self.wh1.name], mock_enqueue.call_args.kwargs["pairs"])
+
+            check_and_alert_low_stock(self.item.name, self.wh1.name)
+            self.assertEqual(len(sent(mock_insert)), 1)
+
+            # A Sales Order reserving stock has no SLE; the hourly rebuild picks it up
+            frappe.db.set_value("Bin", self.bin1, "projected_qty", 2)
+            group_qty.rebuild_group_totals()
+            self.assertEqual(group_qty.get_totals([group_key]), {group_key: 2})
+            self.assertIn((self.item.name, self.wh1.name), frappe.flags.low_stock_pending_checks)
+        self.assertEqual(len(sent(mock_insert)), 1)
+
+    @patch("low_stock_alerts.outbox.insert_emails")
+    def test_throttling_prevents_duplicate_emails(self, mock_insert):
         check_and_alert_low_stock(self.item.name, self.wh1.name)
         check_and_alert_low_stock(self.item.name, self.wh1.name)
-        mock_sendmail.assert_called_once()
+        self.assertEqual(len(sent(mock_insert)), 1)
 
     def test_get_monitored_warehouses_for_leaf(self):
         monitored = get_monitored_warehouses_for_leaf(self.wh1.name)
         self.assertEqual(monitored, [self.group_wh.name])
 
-    @patch("frappe.sendmail")
-    def test_send_low_stock_email_template(self, mock_sendmail):
+    def test_monitored_warehouses_from_settings(self):
+        api.monitored_warehouses = []
+        settings = frappe.get_single("Low Stock Alert Settings")
+        settings.set("monitored_warehouses", [{"warehouse": self.group_wh.name}])
+        settings.save()
+        self.assertEqual(get_monitored_warehouses_for_leaf(self.wh1.name), [self.group_wh.name])
+
+        # Saving drops the copy loaded by this worker
+        settings.set("monitored_warehouses", [])
+        settings.save()
+        self.assertEqual(get_monitored_warehouses_for_leaf(self.wh1.name), [self.wh1.name])
+
+    @patch("low_stock_alerts.outbox.insert_emails")
+    def test_send_low_stock_email_template(self, mock_insert):
         send_low_stock_email(
             [{"item_code": self.item.name, "item_name": "Test", "warehouse": self.wh1.name, "projected_qty": 5, "reorder_level": 10}],
             "test@example.com",
             self.group_wh.name,
         )
-        mock_sendmail.assert_called_once()
+        self.assertEqual(len(sent(mock_insert)), 1)
 
-    @patch("frappe.sendmail")
-    def test_fallback_scans_all_warehouses(self, mock_sendmail):
+    @patch("low_stock_alerts.outbox.insert_emails")
+    def test_fallback_scans_all_warehouses(self, mock_insert):
         # Clear monitored warehouses to force fallback
         api.monitored_warehouses = []
 
@@ -160,13 +397,361 @@ class TestLowStockAlerts(IntegrationTestCase):
                         low_stock_warehouses.add(wh.name)
 
         # Assert emails were sent exactly to these warehouses
-        self.assertEqual(mock_sendmail.call_count, len(low_stock_warehouses))
+        self.assertEqual(len(sent(mock_insert)), len(low_stock_warehouses))
+
+    @patch("low_stock_alerts.outbox.insert_emails")
+    def test_batch_check_sends_one_email_per_monitored_warehouse(self, mock_insert):
+        frappe.db.set_value("Bin", self.bin2, "projected_qty", 5)
+        api.check_and_alert_low_stock_batch([
+            (self.item.name, self.wh1.name),
+            (self.item.name, self.wh2.name),
+        ])
+
+        self.assertEqual(len(sent(mock_insert)), 1)
+        self.assertEqual(sent(mock_insert)[0].recipient, "group@example.com")
+        self.assertIn(self.wh1.name, sent(mock_insert)[0].message)
+        self.assertIn(self.wh2.name, sent(mock_insert)[0].message)
+
+    @patch("low_stock_alerts.outbox.insert_emails")
+    def test_fallback_chunk_size_does_not_change_emails(self, mock_insert):
+        api.monitored_warehouses = []
+
+        run_low_stock_alerts_fallback()
+        unchunked = [email.recipient for email in sent(mock_insert)]
+
+        mock_insert.reset_mock()
+        frappe.db.delete("Low Stock Alert State")
+        run_low_stock_alerts_fallback(chunk_size=1)
+        chunked = [email.recipient for email in sent(mock_insert)]
+
+        self.assertEqual(chunked, unchunked)
+        self.assertIn("wh1@example.com", chunked)
+        self.assertIn("wh2@example.com", chunked)
+
+    @patch("low_stock_alerts.outbox.insert_emails")
+    def test_dry_run_scan_reports_without_sending_or_saving(self, mock_insert):
+        api.monitored_warehouses = []
+
+        groups = api.scan_low_stock(dry_run=True)
+        self.assertIn(self.wh1.name, [warehouse for warehouse, _email_id, _items in groups])
+        mock_insert.assert_not_called()
+        self.assertFalse(frappe.db.exists("Low Stock Alert State", {"item_code": self.item.name}))
+
+        # The real scan sends what the dry run reported
+        self.assertEqual(api.scan_low_stock(), groups)
+        self.assertIn("wh1@example.com", [email.recipient for email in sent(mock_insert)])
+
+    def test_iter_low_stock_rows_pages_by_key(self):
+        rows = list(api.iter_low_stock_rows(chunk_size=1))
+        keys = [(d.warehouse, d.item_code, d.name) for d in rows]
 
-    @patch("frappe.sendmail")
-    def test_group_aggregation(self, mock_sendmail):
+        self.assertEqual(keys, sorted(keys))
+        self.assertEqual(len(keys), len(set(keys)))
+        self.assertIn((self.wh1.name, self.item.name), [(d.warehouse, d.item_code) for d in rows])
+
+    @patch("low_stock_alerts.outbox.insert_emails")
+    def test_snapshot_follows_checks_and_fallback(self, mock_insert):
+        from low_stock_alerts import snapshot
+
+        check_and_alert_low_stock(self.item.name, self.wh1.name)
+        rows = snapshot.get_rows(item_code=self.item.name)
+        self.assertEqual([(d.warehouse, d.projected_qty, d.state) for d in rows], [(self.wh1.name, 5, "LOW")])
+
+        # A check that finds the pair above its level removes it
+        frappe.db.set_value("Bin", self.bin1, "projected_qty", 50)
+        check_and_alert_low_stock(self.item.name, self.wh1.name)
+        self.assertEqual(snapshot.get_rows(item_code=self.item.name), [])
+
+        # The fallback adds pairs no event reported and sweeps out those that recovered
+        frappe.db.set_value("Bin", self.bin1, "projected_qty", 5)
+        api.monitored_warehouses = []
+        run_low_stock_alerts_fallback()
+        self.assertEqual(
+            [d.warehouse for d in snapshot.get_rows(warehouse=self.group_wh.name)],
+            sorted([self.wh1.name, self.wh2.name]),
+        )
+
+        frappe.db.set_value("Bin", self.bin2, "projected_qty", 50)
+        run_low_stock_alerts_fallback()
+        self.assertEqual([d.warehouse for d in snapshot.get_rows(item_code=self.item.name)], [self.wh1.name])
+
+    def test_snapshot_groups_follow_warehouse_moves(self):
+        from low_stock_alerts import snapshot
+
+        with patch("low_stock_alerts.outbox.insert_emails"):
+            api.check_and_alert_low_stock_batch([(self.item.name, self.wh1.name), (self.item.name, self.wh2.name)])
+
+        other_group = frappe.get_doc({
+            "doctype": "Warehouse",
+            "warehouse_name": f"Test Other Group WH {frappe.generate_hash(length=4)}",
+            "company": self.company,
+            "is_group": 1,
+        }).insert()
+        wh2 = frappe.get_doc("Warehouse", self.wh2.name)
+        wh2.parent_warehouse = other_group.name
+        wh2.save()
+
+        self.assertEqual([d.warehouse for d in snapshot.get_rows(warehouse=self.group_wh.name)], [self.wh1.name])
+        self.assertEqual([d.warehouse for d in snapshot.get_rows(warehouse=other_group.name)], [self.wh2.name])
+        self.assertEqual([d.warehouse for d in snapshot.get_rows(warehouse=self.wh1.name)], [self.wh1.name])
+
+    def test_get_low_stock_pages_by_cursor(self):
+        from low_stock_alerts import snapshot
+
+        with patch("low_stock_alerts.outbox.insert_emails"):
+            api.check_and_alert_low_stock_batch([(self.item.name, self.wh1.name), (self.item.name, self.wh2.name)])
+
+        first = snapshot.get_low_stock(warehouse=self.group_wh.name, limit=1)
+        second = snapshot.get_low_stock(warehouse=self.group_wh.name, limit=1, **first["next"])
+        last = snapshot.get_low_stock(warehouse=self.group_wh.name, limit=1, **second["next"])
+
+        self.assertEqual(
+            [page["rows"][0].warehouse for page in (first, second)], sorted([self.wh1.name, self.wh2.name])
+        )
+        self.assertEqual(last, {"rows": [], "next": None})
+
+    @patch("low_stock_alerts.outbox.insert_emails")
+    def test_low_stock_status_etag_follows_alert_state(self, mock_insert):
+        api.check_and_alert_low_stock_batch([(self.item.name, self.wh1.name), (self.item.name, self.wh2.name)])
+        frappe.db.after_commit.run()
+
+        status = api.get_low_stock_status([self.group_wh.name])
+        self.assertEqual(
+            [(d.warehouse, d.state) for d in status["items"]],
+            sorted([(self.wh1.name, "LOW"), (self.wh2.name, "LOW")]),
+        )
+
+        # A poll with the current ETag is answered without a body
+        try:
+            self.assertIsNone(api.get_low_stock_status(self.group_wh.name, etag=status["etag"]))
+            self.assertEqual(frappe.response.get("http_status_code"), 304)
+        finally:
+            frappe.response.pop("http_status_code", None)
+
+        # Stock moving inside a zone keeps the ETag, a state change replaces it
+        frappe.db.set_value("Bin", self.bin1, "projected_qty", 4)
+        api.check_and_alert_low_stock_batch([(self.item.name, self.wh1.name)])
+        frappe.db.after_commit.run()
+        self.assertEqual(api.get_low_stock_status([self.group_wh.name])["etag"], status["etag"])
+
+        frappe.db.set_value("Bin", self.bin1, "projected_qty", 0)
+        api.check_and_alert_low_stock_batch([(self.item.name, self.wh1.name)])
+        frappe.db.after_commit.run()
+        refreshed = api.get_low_stock_status([self.group_wh.name])
+        self.assertNotEqual(refreshed["etag"], status["etag"])
+        self.assertIn((self.wh1.name, "CRITICAL"), [(d.warehouse, d.state) for d in refreshed["items"]])
+
+    @patch("low_stock_alerts.outbox.insert_emails")
+    def test_low_stock_status_follows_tree_and_user_permissions(self, mock_insert):
+        from low_stock_alerts.warehouse_tree import invalidate_warehouse_tree
+
+        api.check_and_alert_low_stock_batch([(self.item.name, self.wh1.name), (self.item.name, self.wh2.name)])
+        frappe.db.after_commit.run()
+        status = api.get_low_stock_status([self.group_wh.name])
+
+        # Moving a warehouse leaves the states alone but changes what a group covers
+        invalidate_warehouse_tree()
+        frappe.db.after_commit.run()
+        self.assertNotEqual(api.get_low_stock_status([self.group_wh.name])["etag"], status["etag"])
+
+        user = frappe.get_doc({
+            "doctype": "User",
+            "email": f"low-stock-{frappe.generate_hash(length=6)}@example.com",
+            "first_name": "Low Stock",
+            "send_welcome_email": 0,
+            "roles": [{"role": "Stock Manager"}],
+        }).insert()
+        frappe.get_doc({
+            "doctype": "User Permission",
+            "user": user.name,
+            "allow": "Warehouse",
+            "for_value": self.wh1.name,
+        }).insert()
+
+        unrestricted = api.get_low_stock_status([self.wh1.name])
+        try:
+            frappe.set_user(user.name)
+            restricted = api.get_low_stock_status([self.wh1.name])
+            self.assertEqual([d.warehouse for d in restricted["items"]], [self.wh1.name])
+            # Cached and tagged per user
+            self.assertNotEqual(restricted["etag"], unrestricted["etag"])
+            self.assertRaises(frappe.PermissionError, api.get_low_stock_status, [self.group_wh.name])
+        finally:
+            frappe.set_user("Administrator")
+
+    @patch("low_stock_alerts.outbox.insert_emails")
+    def test_incremental_fallback_only_rechecks_touched_pairs(self, mock_insert):
+        from frappe.utils import add_to_date, now_datetime
+
+        frappe.db.set_global(api.FULL_SCAN_KEY, str(now_datetime()))
+        frappe.db.set_global(api.WATERMARK_KEY, str(add_to_date(now_datetime(), minutes=2)))
+        frappe.db.set_value(
+            "Bin", self.bin2, "modified", add_to_date(now_datetime(), minutes=5), update_modified=False
+        )
+
+        with patch.dict(frappe.conf, {"low_stock_alerts_incremental_fallback": 1}):
+            api.run_low_stock_alerts_incremental()
+
+        recipients = [email.recipient for email in sent(mock_insert)]
+        self.assertEqual(recipients, ["wh2@example.com"])
+
+    @patch("low_stock_alerts.outbox.insert_emails")
+    def test_incremental_fallback_disabled_by_default(self, mock_insert):
+        api.run_low_stock_alerts_incremental()
+        mock_insert.assert_not_called()
+
+    @patch("low_stock_alerts.outbox.insert_emails")
+    def test_digest_buffers_alerts_until_window_elapses(self, mock_insert):
+        import time
+
+        from low_stock_alerts.digest import flush_due_digests
+
+        frappe.db.set_value("Bin", self.bin2, "projected_qty", 5)
+        with patch.dict(frappe.conf, {"low_stock_alerts_digest_window": 60}):
+            check_and_alert_low_stock(self.item.name, self.wh1.name)
+            check_and_alert_low_stock(self.item.name, self.wh2.name)
+            flush_due_digests()
+            mock_insert.assert_not_called()
+
+            with patch("low_stock_alerts.digest.time.time", return_value=time.time() + 61):
+                flush_due_digests()
+
+        self.assertEqual(len(sent(mock_insert)), 1)
+        self.assertEqual(sent(mock_insert)[0].recipient, "group@example.com")
+        self.assertIn(self.wh1.name, sent(mock_insert)[0].message)
+        self.assertIn(self.wh2.name, sent(mock_insert)[0].message)
+
+    @patch("low_stock_alerts.outbox.insert_emails")
+    def test_digest_is_put_back_when_the_flush_fails(self, mock_insert):
+        import time
+
+        from low_stock_alerts.digest import flush_due_digests
+
+        with patch.dict(frappe.conf, {"low_stock_alerts_digest_window": 60}):
+            check_and_alert_low_stock(self.item.name, self.wh1.name)
+
+            with patch("low_stock_alerts.digest.time.time", return_value=time.time() + 61):
+                mock_insert.side_effect = frappe.ValidationError
+                self.assertRaises(frappe.ValidationError, flush_due_digests)
+
+                mock_insert.side_effect = None
+                mock_insert.reset_mock()
+                flush_due_digests()
+
+        self.assertEqual(len(sent(mock_insert)), 1)
+        self.assertIn(self.wh1.name, sent(mock_insert)[0].message)
+
+    @patch("low_stock_alerts.outbox.insert_emails")
+    def test_group_aggregation(self, mock_insert):
         frappe.db.set_value("Bin", self.bin2, "projected_qty", 5)
         check_and_alert_low_stock(self.item.name, self.wh1.name)
         check_and_alert_low_stock(self.item.name, self.wh2.name)
 
-        recipients = {c.kwargs["recipients"] for c in mock_sendmail.call_args_list}
+        recipients = {email.recipient for email in sent(mock_insert)}
         self.assertIn("group@example.com", recipients)
+
+    @patch("low_stock_alerts.outbox.insert_emails")
+    def test_sharded_fallback_matches_serial_scan(self, mock_insert):
+        api.monitored_warehouses = []
+
+        run_low_stock_alerts_fallback()
+        serial = {email.recipient for email in sent(mock_insert)}
+
+        def run_now(method, queue=None, **kwargs):
+            frappe.get_attr(method)(**kwargs)
+
+        mock_insert.reset_mock()
+        frappe.db.delete("Low Stock Alert State")
+        with (
+            patch.dict(frappe.conf, {"low_stock_alerts_fallback_shards": 2}),
+            patch("frappe.enqueue", side_effect=run_now) as mock_enqueue,
+        ):
+            run_low_stock_alerts_fallback()
+
+        self.assertTrue(all(c.kwargs["queue"] == "long" for c in mock_enqueue.call_args_list))
+        self.assertEqual({email.recipient for email in sent(mock_insert)}, serial)
+        self.assertIn("wh1@example.com", serial)
+
+    @patch("low_stock_alerts.outbox.insert_emails")
+    def test_failed_shard_still_merges_the_run(self, mock_insert):
+        api.monitored_warehouses = []
+        plan = [frappe.db.get_value("Warehouse", wh.name, ["lft", "rgt"], as_dict=True) for wh in (self.wh1, self.wh2)]
+        scan_shard = shards.scan_shard
+
+        def fail_wh2(shard, chunk_size=None):
+            if shard == plan[1]:
+                scan_shard(shard, chunk_size)
+                raise RuntimeError("shard lost")
+            return scan_shard(shard, chunk_size)
+
+        def run_now(method, queue=None, **kwargs):
+            frappe.get_attr(method)(**kwargs)
+
+        with (
+            patch.dict(frappe.conf, {"low_stock_alerts_fallback_shards": 2}),
+            patch("frappe.enqueue", side_effect=run_now),
+            patch("low_stock_alerts.shards.plan_shards", return_value=plan),
+        ):
+            with patch("low_stock_alerts.shards.scan_shard", side_effect=fail_wh2):
+                run_low_stock_alerts_fallback()
+            self.assertEqual([email.recipient for email in sent(mock_insert)], ["wh1@example.com"])
+
+            # The lock is free and wh2's escalation was never saved, so the next run alerts it
+            mock_insert.reset_mock()
+            run_low_stock_alerts_fallback()
+            self.assertEqual([email.recipient for email in sent(mock_insert)], ["wh2@example.com"])
+
+    @patch("low_stock_alerts.outbox.insert_emails")
+    def test_pair_already_low_does_not_alert_again(self, mock_insert):
+        check_and_alert_low_stock(self.item.name, self.wh1.name)
+        frappe.cache().delete_keys("low_stock_alert:")
+        check_and_alert_low_stock(self.item.name, self.wh1.name)
+        run_low_stock_alerts_fallback()
+
+        recipients = [email.recipient for email in sent(mock_insert)]
+        self.assertEqual(recipients.count("group@example.com"), 1)
+        self.assertNotIn("wh1@example.com", recipients)
+        self.assertEqual(
+            frappe.db.get_value(
+                "Low Stock Alert State", {"item_code": self.item.name, "warehouse": self.wh1.name}, "state"
+            ),
+            "LOW",
+        )
+
+    @patch("low_stock_alerts.outbox.insert_emails")
+    def test_recovered_pair_alerts_again_after_leaving_band(self, mock_insert):
+        state = {"item_code": self.item.name, "warehouse": self.wh1.name}
+        check_and_alert_low_stock(self.item.name, self.wh1.name)
+
+        # Inside the 10% recovery band the pair stays LOW
+        frappe.db.set_value("Bin", self.bin1, "projected_qty", 10.5)
+        check_and_alert_low_stock(self.item.name, self.wh1.name)
+        self.assertEqual(frappe.db.get_value("Low Stock Alert State", state, "state"), "LOW")
+
+        frappe.db.set_value("Bin", self.bin1, "projected_qty", 12)
+        check_and_alert_low_stock(self.item.name, self.wh1.name)
+        self.assertFalse(frappe.db.exists("Low Stock Alert State", state))
+
+        frappe.cache().delete_keys("low_stock_alert:")
+        frappe.db.set_value("Bin", self.bin1, "projected_qty", 4)
+        check_and_alert_low_stock(self.item.name, self.wh1.name)
+        self.assertEqual(len(sent(mock_insert)), 2)
+
+    @patch("low_stock_alerts.outbox.insert_emails")
+    def test_throttled_escalation_keeps_previous_state(self, mock_insert):
+        state = {"item_code": self.item.name, "warehouse": self.wh1.name}
+        check_and_alert_low_stock(self.item.name, self.wh1.name)
+        frappe.db.set_value("Bin", self.bin1, "projected_qty", 12)
+        check_and_alert_low_stock(self.item.name, self.wh1.name)
+
+        # Low again inside the throttle window: no email, and the pair is not stored as LOW
+        frappe.db.set_value("Bin", self.bin1, "projected_qty", 4)
+        check_and_alert_low_stock(self.item.name, self.wh1.name)
+        self.assertEqual(len(sent(mock_insert)), 1)
+        self.assertFalse(frappe.db.exists("Low Stock Alert State", state))
+
+        # Once the window has passed the next check alerts
+        with patch("low_stock_alerts.providers.claim_alerts", side_effect=lambda pairs, monitored: pairs):
+            check_and_alert_low_stock(self.item.name, self.wh1.name)
+        self.assertEqual(len(sent(mock_insert)), 2)
+        self.assertEqual(frappe.db.get_value("Low Stock Alert State", state, "state"), "LOW")
@@ -0,0 +1,42 @@
+from unittest.mock import patch
+
+import frappe
+from frappe.tests import IntegrationTestCase
+
+from low_stock_alerts import metrics
+
+
+class TestAlertMetrics(IntegrationTestCase):
+	def setUp(self):
+		metrics.reset_alert_metrics()
+
+	def test_stage_timings_and_counters_are_flushed_to_redis(self):
+		with metrics.timed("bin_read"):
+			pass
+		with metrics.timed("bin_read"):
+			pass
+		metrics.incr("check:throttled", 3)
+		metrics.incr("check:no_recipient", 0)
+		metrics.flush()
+
+		result = metrics.get_alert_metrics()
+		self.assertEqual(result["stages"]["bin_read"]["calls"], 2)
+		self.assertGreaterEqual(result["stages"]["bin_read"]["total_ms"], 0)
+		self.assertEqual(result["counters"], {"check:throttled": 3})
+
+	def test_discard_drops_collected_metrics(self):
+		metrics.incr("fallback:low_rows", 5)
+		metrics.discard()
+		metrics.flush()
+
+		self.assertEqual(metrics.get_alert_metrics()["counters"], {})
+
+	def test_check_records_early_return_reason(self):
+		from low_stock_alerts.api import check_and_alert_low_stock_batch
+
+		with patch("low_stock_alerts.outbox.insert_emails"):
+			check_and_alert_low_stock_batch([("_Test Item Without Reorder", "_Test Warehouse - _TC")])
+
+		counters = metrics.get_alert_metrics()["counters"]
+		self.assertEqual(counters["check:pairs"], 1)
+		self.assertEqual(counters["check:no_reorder_level"], 1)
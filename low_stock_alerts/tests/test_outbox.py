@@ -0,0 +1,81 @@
+from unittest.mock import patch
+
+import frappe
+from frappe.tests import IntegrationTestCase
+
+from low_stock_alerts import outbox
+
+
+class TestOutbox(IntegrationTestCase):
+	def tearDown(self):
+		frappe.db.rollback()
+
+	def test_collect_writes_email_queue_in_batches(self):
+		recipients = [f"outbox-{frappe.generate_hash(length=6)}@example.com" for _i in range(3)]
+
+		with (
+			patch.dict(frappe.conf, {"low_stock_alerts_email_batch_size": 2}),
+			patch("low_stock_alerts.outbox._bulk_insert", wraps=outbox._bulk_insert) as bulk_insert,
+		):
+			with outbox.collect():
+				for recipient in recipients:
+					outbox.add(recipient, "Low Stock Alert", outbox.render([], "Stores"))
+
+		self.assertEqual(bulk_insert.call_count, 2)
+		queued = frappe.get_all(
+			"Email Queue Recipient",
+			filters={"recipient": ["in", recipients]},
+			fields=["recipient", "status", "parent"],
+		)
+		self.assertEqual(sorted(d.recipient for d in queued), sorted(recipients))
+		self.assertTrue(all(d.status == "Not Sent" for d in queued))
+		self.assertIn("Stores", frappe.db.get_value("Email Queue", queued[0].parent, "message"))
+
+	def test_only_queued_emails_are_counted(self):
+		from low_stock_alerts import metrics
+
+		emails = [outbox.Email(f"count-{i}@example.com", "Low Stock Alert", "") for i in range(3)]
+		metrics.discard()
+		with patch("low_stock_alerts.outbox._bulk_insert", return_value=2):
+			outbox.insert_emails(emails)
+
+		self.assertEqual(metrics._counts["emails_sent"], 2)
+		self.assertEqual(metrics._counts["outbox:no_recipients"], 1)
+		metrics.discard()
+
+	def test_collect_drops_emails_on_error(self):
+		with patch("low_stock_alerts.outbox.insert_emails") as insert_emails:
+			with self.assertRaises(ValueError), outbox.collect():
+				outbox.add("dropped@example.com", "Low Stock Alert", "")
+				raise ValueError
+
+			outbox.flush()
+		insert_emails.assert_not_called()
+
+	def test_failed_batch_is_retried_then_sent_one_by_one(self):
+		emails = [outbox.Email(f"retry-{i}@example.com", "Low Stock Alert", "") for i in range(2)]
+
+		with (
+			patch.dict(frappe.conf, {"low_stock_alerts_email_retries": 2}),
+			patch("low_stock_alerts.outbox.RETRY_DELAY", 0),
+			patch(
+				"low_stock_alerts.outbox._bulk_insert", side_effect=frappe.QueryTimeoutError
+			) as bulk_insert,
+			patch("frappe.sendmail") as sendmail,
+		):
+			outbox.insert_emails(emails)
+
+		self.assertEqual(bulk_insert.call_count, 3)
+		self.assertEqual(
+			[c.kwargs["recipients"] for c in sendmail.call_args_list], [e.recipient for e in emails]
+		)
+
+	def test_template_is_compiled_once(self):
+		outbox._template = None
+		with patch("frappe.get_jenv", wraps=frappe.get_jenv) as get_jenv:
+			outbox.render([{"item_code": "A"}], "Stores")
+			message = outbox.render([{"item_code": "B"}], "Stores")
+
+		get_jenv.assert_called_once()
+		self.assertIn("Stores", message)
+		self.assertIn("B", message)
@@ -0,0 +1,56 @@
+from unittest.mock import patch
+
+import frappe
+from frappe.tests import IntegrationTestCase
+
+from low_stock_alerts import profiling
+
+
+class TestProfiling(IntegrationTestCase):
+	def setUp(self):
+		frappe.db.delete(profiling.DOCTYPE)
+
+	def tearDown(self):
+		frappe.db.rollback()
+
+	def test_sampled_job_logs_stats_and_queries(self):
+		settings = {
+			"low_stock_alerts_profile_sample_rate": 1,
+			"low_stock_alerts_profile_top_n": 5,
+			"low_stock_alerts_profile_log_size": 2,
+		}
+		with patch.dict(frappe.conf, settings):
+			for _i in range(3):
+				with profiling.profile("test_job"):
+					frappe.db.sql("SELECT 1")
+					frappe.db.sql("SELECT 2")
+
+		logs = frappe.get_all(profiling.DOCTYPE, fields=["job", "query_count", "query_ms", "stats"])
+		self.assertEqual(len(logs), 2)
+		self.assertEqual({log.job for log in logs}, {"test_job"})
+		self.assertEqual({log.query_count for log in logs}, {2})
+		self.assertIn("cumulative", logs[0].stats)
+		self.assertNotIn("sql", vars(frappe.db))
+
+	def test_unsampled_and_nested_jobs_are_not_logged(self):
+		with profiling.profile("off"):
+			pass
+		self.assertFalse(frappe.db.count(profiling.DOCTYPE))
+
+		with patch.dict(frappe.conf, {"low_stock_alerts_profile_sample_rate": 1}):
+			with profiling.profile("outer"), profiling.profile("inner"):
+				pass
+		self.assertEqual(frappe.get_all(profiling.DOCTYPE, pluck="job"), ["outer"])
+
+	def test_failed_job_is_logged_after_rollback(self):
+		with patch.dict(frappe.conf, {"low_stock_alerts_profile_sample_rate": 1}):
+			with self.assertRaises(ZeroDivisionError), profiling.profile("failing"):
+				frappe.db.sql("SELECT 1")
+				1 / 0
+			self.assertFalse(frappe.db.count(profiling.DOCTYPE))
+
+			frappe.db.rollback()
+
+		logs = frappe.get_all(profiling.DOCTYPE, fields=["job", "failed", "query_count"])
+		self.assertEqual([(log.job, log.failed, log.query_count) for log in logs], [("failing", 1, 1)])
+		self.assertNotIn("sql", vars(frappe.db))
@@ -0,0 +1,23 @@
+import frappe
+from frappe.tests import UnitTestCase
+
+from low_stock_alerts.shards import split_ranges
+
+
+def _leaf(lft, weight):
+	return frappe._dict(lft=lft, rgt=lft + 1, weight=weight)
+
+
+class TestSplitRanges(UnitTestCase):
+	def test_ranges_are_balanced_by_weight(self):
+		leaves = [_leaf(2, 10), _leaf(4, 10), _leaf(6, 10), _leaf(8, 10)]
+		self.assertEqual(split_ranges(leaves, 2), [{"lft": 2, "rgt": 5}, {"lft": 6, "rgt": 9}])
+
+	def test_heavy_leaf_gets_its_own_range(self):
+		leaves = [_leaf(2, 1), _leaf(4, 100), _leaf(6, 1), _leaf(8, 1)]
+		self.assertEqual(split_ranges(leaves, 2), [{"lft": 2, "rgt": 5}, {"lft": 6, "rgt": 9}])
+
+	def test_never_more_ranges_than_leaves_with_rows(self):
+		leaves = [_leaf(2, 5), _leaf(4, 0), _leaf(6, 5)]
+		self.assertEqual(split_ranges(leaves, 8), [{"lft": 2, "rgt": 3}, {"lft": 6, "rgt": 7}])
+		self.assertEqual(split_ranges([_leaf(2, 0)], 4), [])
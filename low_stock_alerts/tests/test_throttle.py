@@ -0,0 +1,33 @@
+from unittest.mock import patch
+
+import frappe
+from frappe.tests import IntegrationTestCase
+
+from low_stock_alerts.throttle import claim, claim_alerts, get_throttle_window
+
+
+class TestThrottle(IntegrationTestCase):
+	def setUp(self):
+		frappe.cache().flushall()
+
+	def test_claim_is_exclusive(self):
+		self.assertEqual(claim([("lsa-test:a", 60), ("lsa-test:b", 60)]), [True, True])
+		self.assertEqual(claim([("lsa-test:a", 60), ("lsa-test:c", 60)]), [False, True])
+
+	def test_claim_alerts_returns_unthrottled_pairs(self):
+		self.assertEqual(
+			claim_alerts([("ITEM-1", "WH-1"), ("ITEM-2", "WH-1")]), [("ITEM-1", "WH-1"), ("ITEM-2", "WH-1")]
+		)
+		self.assertEqual(claim_alerts([("ITEM-1", "WH-1"), ("ITEM-3", "WH-1")]), [("ITEM-3", "WH-1")])
+
+	def test_window_resolution(self):
+		windows = {"Leaf": 30, "Group A": 120, "Group B": 300}
+		with patch.dict(
+			frappe.conf,
+			{"low_stock_alerts_throttle_windows": windows, "low_stock_alerts_throttle_window": 900},
+		):
+			self.assertEqual(get_throttle_window("Leaf", ["Group A"]), 30)
+			self.assertEqual(get_throttle_window("Other Leaf", ["Group A", "Group B"]), 120)
+			self.assertEqual(get_throttle_window("Other Leaf", ["Group C"]), 900)
+
+		self.assertEqual(get_throttle_window("Other Leaf"), 600)
@@ -0,0 +1,52 @@
+import frappe
+from frappe.tests import IntegrationTestCase, UnitTestCase
+
+from low_stock_alerts.warehouse_tree import WarehouseTreeIndex, get_warehouse_tree, invalidate_warehouse_tree
+
+
+def _wh(name, lft, rgt, is_group=0):
+	return frappe._dict(name=name, lft=lft, rgt=rgt, is_group=is_group)
+
+
+class TestWarehouseTreeIndex(UnitTestCase):
+	def setUp(self):
+		# All > (Region A > (Store 1, Store 2), Region B > Store 3)
+		self.index = WarehouseTreeIndex(
+			[
+				_wh("All", 1, 14, 1),
+				_wh("Region A", 2, 7, 1),
+				_wh("Store 1", 3, 4),
+				_wh("Store 2", 5, 6),
+				_wh("Region B", 8, 13, 1),
+				_wh("Store 3", 9, 10),
+				_wh("Store 4", 11, 12),
+			]
+		)
+
+	def test_nested_groups_cover_leaf(self):
+		self.assertEqual(
+			self.index.get_monitored_for_leaf("Store 2", ["All", "Region A", "Region B"]),
+			["All", "Region A"],
+		)
+
+	def test_sibling_group_does_not_cover_leaf(self):
+		# Region A starts before Store 3 but ends before it; only the ancestor matches
+		self.assertEqual(self.index.get_monitored_for_leaf("Store 3", ["Region A", "All"]), ["All"])
+		self.assertEqual(self.index.get_monitored_for_leaf("Store 3", ["Region A"]), [])
+
+	def test_monitored_leaf_matches_only_itself(self):
+		self.assertEqual(self.index.get_monitored_for_leaf("Store 4", ["Store 3", "Store 4"]), ["Store 4"])
+
+	def test_unknown_leaf(self):
+		self.assertEqual(self.index.get_monitored_for_leaf("Missing", ["All"]), [])
+
+
+class TestWarehouseTreeCache(IntegrationTestCase):
+	def test_index_is_reloaded_after_invalidation(self):
+		first = get_warehouse_tree()
+		self.assertIs(get_warehouse_tree(), first)
+
+		invalidate_warehouse_tree()
+		frappe.db.commit()
+
+		self.assertIsNot(get_warehouse_tree(), first)
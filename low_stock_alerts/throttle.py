@@ -0,0 +1,66 @@
+"""
+Alert throttle backed by atomic Redis SET NX EX.
+
+A key is claimed only if nobody holds it yet, so two workers checking the same pair at
+the same time cannot both send an alert. Batches of keys are claimed in one pipelined
+round trip.
+"""
+
+import frappe
+from frappe.utils import cint, now
+
+from low_stock_alerts.settings import get_setting
+
+DEFAULT_WINDOW = 600
+
+
+def claim(keys_with_ttl):
+	"""
+	Claim each (key, ttl_in_seconds) in one round trip.
+	Returns a list of booleans, True where the key was free and is now held for `ttl`.
+	"""
+	if not keys_with_ttl:
+		return []
+
+	cache = frappe.cache()
+	pipe = cache.pipeline(transaction=False)
+	for key, ttl in keys_with_ttl:
+		pipe.set(cache.make_key(key), now(), nx=True, ex=max(cint(ttl), 1))
+	return [bool(claimed) for claimed in pipe.execute()]
+
+
+def claim_alerts(pairs, monitored_by_leaf=None):
+	"""Return the (item_code, warehouse) pairs that may alert now, claiming their window."""
+	monitored_by_leaf = monitored_by_leaf or {}
+	claimed = claim(
+		[
+			(
+				throttle_key(item_code, warehouse),
+				get_throttle_window(warehouse, monitored_by_leaf.get(warehouse)),
+			)
+			for item_code, warehouse in pairs
+		]
+	)
+	return [pair for pair, ok in zip(pairs, claimed, strict=True) if ok]
+
+
+def get_throttle_window(warehouse, monitored=None):
+	"""
+	Seconds between alerts for a leaf warehouse. `throttle_windows` in Low Stock Alert
+	Settings maps warehouses or groups to a window; the leaf's own entry wins, otherwise
+	the shortest window among the monitored warehouses covering it, otherwise
+	`throttle_window` (default 600).
+	"""
+	windows = get_setting("throttle_windows") or {}
+	if warehouse in windows:
+		return cint(windows[warehouse])
+
+	covering = [cint(windows[name]) for name in monitored or () if name in windows]
+	if covering:
+		return min(covering)
+
+	return cint(get_setting("throttle_window", DEFAULT_WINDOW))
+
+
+def throttle_key(item_code, warehouse):
+	return f"low_stock_alert:{item_code}:{warehouse}"
@@ -0,0 +1,110 @@
+"""
+In-memory nested-set index of the Warehouse tree.
+
+Each worker loads the tree once and keeps it until the version key in Redis changes.
+The version is bumped from the Warehouse on_update/on_trash/after_rename hooks, so a
+change to the hierarchy is picked up by every worker on its next lookup.
+"""
+
+import bisect
+
+import frappe
+
+VERSION_KEY = "low_stock_alerts:warehouse_tree_version"
+
+# (version, WarehouseTreeIndex) of the index loaded by this process
+_loaded = None
+
+
+class WarehouseTreeIndex:
+	def __init__(self, warehouses):
+		self.bounds = {w.name: (w.lft, w.rgt) for w in warehouses}
+		self.groups = {w.name for w in warehouses if w.is_group}
+		self._monitored_lookups = {}
+
+	def get_monitored_for_leaf(self, leaf_warehouse, monitored):
+		"""
+		Return the entries of `monitored` that cover `leaf_warehouse`, in the order given:
+		the leaf itself, or any group whose lft/rgt range contains it.
+		"""
+		monitored = tuple(monitored)
+		lookup = self._monitored_lookups.get(monitored)
+		if lookup is None:
+			lookup = self._monitored_lookups[monitored] = _MonitoredLookup(self, monitored)
+
+		return lookup.covering(leaf_warehouse)
+
+
+class _MonitoredLookup:
+	"""Interval lookup over the monitored groups of one `monitored` configuration."""
+
+	def __init__(self, index, monitored):
+		self.index = index
+		self.position = {name: i for i, name in reversed(list(enumerate(monitored)))}
+		self.leaves = {name for name in monitored if name not in index.groups}
+
+		groups = sorted(
+			(index.bounds[name] + (name,) for name in self.position if name in index.groups),
+		)
+		self.lfts = [lft for lft, _rgt, _name in groups]
+		self.groups = groups
+
+		# Nested sets are laminar, so each group has at most one closest monitored
+		# ancestor; keeping it lets a lookup walk up instead of scanning every group.
+		self.parent = []
+		stack = []
+		for i, (lft, _rgt, _name) in enumerate(groups):
+			while stack and groups[stack[-1]][1] < lft:
+				stack.pop()
+			self.parent.append(stack[-1] if stack else None)
+			stack.append(i)
+
+	def covering(self, leaf_warehouse):
+		result = []
+		if leaf_warehouse in self.leaves:
+			result.append(leaf_warehouse)
+
+		bounds = self.index.bounds.get(leaf_warehouse)
+		if bounds and self.groups:
+			lft, rgt = bounds
+			i = bisect.bisect_right(self.lfts, lft) - 1
+			# The closest group starting at or before the leaf may end before it;
+			# one of its ancestors can still contain the leaf.
+			while i is not None and i >= 0 and self.groups[i][1] < rgt:
+				i = self.parent[i]
+			while i is not None and i >= 0:
+				result.append(self.groups[i][2])
+				i = self.parent[i]
+
+		return sorted(result, key=self.position.__getitem__)
+
+
+def get_warehouse_tree():
+	"""Return the warehouse tree index, reloading it only when the version has changed."""
+	global _loaded
+
+	version = get_tree_version()
+	if _loaded is None or _loaded[0] != version:
+		warehouses = frappe.get_all("Warehouse", fields=["name", "lft", "rgt", "is_group"])
+		_loaded = (version, WarehouseTreeIndex(warehouses))
+
+	return _loaded[1]
+
+
+def get_tree_version():
+	"""Version of the warehouse tree; it changes after every commit that changed a warehouse."""
+	version = frappe.cache().get_value(VERSION_KEY)
+	if version is None:
+		version = _bump_version()
+	return version
+
+
+def invalidate_warehouse_tree(doc=None, method=None):
+	"""Doc event hook: let every worker reload the tree once the change is committed."""
+	frappe.db.after_commit.add(_bump_version)
+
+
+def _bump_version():
+	version = frappe.generate_hash(length=12)
+	frappe.cache().set_value(VERSION_KEY, version)
+	return version